@@ -1,38 +1,125 @@
-from typing import Dict, Optional, List
-import google.generativeai as genai
+import asyncio
+from typing import Callable, Dict, Iterator, Optional, List
 from config import Config
+from gemini_client import get_client
+from structured_output import (
+    SocraticOutput, SolutionTemplateOutput, StructuredOutputError, json_generation_config
+)
+from section_parser import SectionParser
+from chat_session import MentorChatSession
+
+
+SOCRATIC_SECTIONS = SectionParser({
+    'questions': ['GUIDING QUESTIONS:', 'Guiding Questions:'],
+    'reflections': ['REFLECTION PROMPTS:', 'Reflection Prompts:'],
+    'challenges': ['CHALLENGE POINTS:', 'Challenge Points:'],
+    'next_steps': ['NEXT STEPS:', 'Next Steps:']
+})
+
+TEMPLATE_TAIL_SECTIONS = SectionParser({
+    'guide': ['IMPLEMENTATION GUIDE:'],
+    'tips': ['PRACTICAL TIPS:']
+})
+
+# Template name and (section title, what goes in it) for each solution template
+SOLUTION_TEMPLATES = {
+    'swot': ('SWOT Analysis', [
+        ('STRENGTHS', 'Internal positive factors'),
+        ('WEAKNESSES', 'Internal limitations'),
+        ('OPPORTUNITIES', 'External favorable conditions'),
+        ('THREATS', 'External challenges'),
+        ('STRATEGIC INSIGHTS', 'Key takeaways and recommendations')
+    ]),
+    'budget': ('Budget Outline', [
+        ('REVENUE/FUNDING SOURCES', 'Expected income or funding'),
+        ('EXPENSES', 'Personnel, materials, operations and contingency'),
+        ('BUDGET TIMELINE', 'Phased allocation'),
+        ('COST-SAVING OPPORTUNITIES', 'Ideas for efficiency')
+    ]),
+    'action_plan': ('Action Plan', [
+        ('OBJECTIVES', 'Clear, measurable goals'),
+        ('ACTION ITEMS', 'Step-by-step tasks with timeline'),
+        ('RESPONSIBLE PARTIES', 'Who does what'),
+        ('RESOURCES NEEDED', "What's required"),
+        ('SUCCESS METRICS', 'How to measure progress'),
+        ('RISK MITIGATION', 'Potential challenges and solutions')
+    ]),
+    'stakeholder': ('Stakeholder Analysis', [
+        ('KEY STAKEHOLDERS', 'List of involved parties'),
+        ('STAKEHOLDER INTERESTS', 'What each stakeholder cares about'),
+        ('INFLUENCE LEVEL', 'High/Medium/Low for each'),
+        ('ENGAGEMENT STRATEGY', 'How to involve each stakeholder'),
+        ('COMMUNICATION PLAN', 'How and when to communicate')
+    ]),
+    'timeline': ('Project Timeline', [
+        ('PHASES', 'Major project phases'),
+        ('MILESTONES', 'Key achievement points with dates'),
+        ('DEPENDENCIES', 'What depends on what'),
+        ('CRITICAL PATH', 'Most time-sensitive activities'),
+        ('BUFFER TIME', 'Contingency periods')
+    ])
+}
+
+
+class MentorStream:
+    """Iterable of response text chunks; the parsed result dict is set once it is exhausted"""
+    
+    def __init__(self, chunks: Iterator[str], finish: Callable[[str], Dict],
+                 fail: Callable[[Exception], Dict]):
+        self._chunks = chunks
+        self._finish = finish
+        self._fail = fail
+        self.result = None
+    
+    def __iter__(self):
+        parts = []
+        try:
+            for chunk in self._chunks:
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            self.result = self._fail(e)
+            return
+        
+        self.result = self._finish(''.join(parts))
 
 
 class AIMentor:
     """AI Mentor providing guidance through critical thinking and solution templates"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, structured_output: Optional[bool] = None):
         self.api_key = api_key or Config.GEMINI_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(Config.TEXT_MODEL)
-        self.conversation_history = []
+        self.client = get_client(Config.TEXT_MODEL, self.api_key, task='mentor')
+        self.structured_output = (Config.STRUCTURED_OUTPUT if structured_output is None 
+                                  else structured_output)
+        self.chat = MentorChatSession(self.client)
     
     def critical_thinking_mode(self, problem_description: str, 
                               context: Optional[str] = None) -> Dict:
         prompt = self._create_critical_thinking_prompt(problem_description, context)
         
         try:
-            response = self.model.generate_content(prompt)
-            result = response.text
-            
-            # Parse the response
-            parsed = self._parse_socratic_response(result)
+            response = self.client.generate(
+                prompt, generation_config=self._generation_config(SocraticOutput.SCHEMA)
+            )
+            return self._build_critical_thinking_result(problem_description, response.text)
             
+        except Exception as e:
             return {
-                'success': True,
-                'mode': 'Critical Thinking',
-                'problem': problem_description,
-                'guiding_questions': parsed.get('questions', []),
-                'reflection_prompts': parsed.get('reflections', []),
-                'challenge_points': parsed.get('challenges', []),
-                'next_steps': parsed.get('next_steps', []),
-                'full_response': result
+                'success': False,
+                'error': str(e),
+                'mode': 'Critical Thinking'
             }
+    
+    async def critical_thinking_mode_async(self, problem_description: str, 
+                                           context: Optional[str] = None) -> Dict:
+        prompt = self._create_critical_thinking_prompt(problem_description, context)
+        
+        try:
+            response = await self.client.generate_async(
+                prompt, generation_config=self._generation_config(SocraticOutput.SCHEMA)
+            )
+            return self._build_critical_thinking_result(problem_description, response.text)
             
         except Exception as e:
             return {
@@ -44,34 +131,35 @@ class AIMentor:
     def solution_mode(self, problem_description: str, 
                      template_type: str = 'auto',
                      category: Optional[str] = None) -> Dict:
-
-        # Determine best template if auto
-        if template_type == 'auto':
-            template_type = self._determine_template_type(problem_description, category)
-        
-        prompt = self._create_solution_template_prompt(
-            problem_description, 
-            template_type,
-            category
+        template_type, prompt = self._prepare_solution_request(
+            problem_description, template_type, category
         )
         
         try:
-            response = self.model.generate_content(prompt)
-            result = response.text
-            
-            # Parse template response
-            parsed = self._parse_template_response(result, template_type)
+            response = self.client.generate(
+                prompt, generation_config=self._generation_config(SolutionTemplateOutput.SCHEMA)
+            )
+            return self._build_solution_result(problem_description, template_type, response.text)
             
+        except Exception as e:
             return {
-                'success': True,
-                'mode': 'Solution',
-                'template_type': template_type,
-                'problem': problem_description,
-                'template': parsed.get('template', {}),
-                'implementation_guide': parsed.get('guide', ''),
-                'tips': parsed.get('tips', []),
-                'full_response': result
+                'success': False,
+                'error': str(e),
+                'mode': 'Solution'
             }
+    
+    async def solution_mode_async(self, problem_description: str, 
+                                  template_type: str = 'auto',
+                                  category: Optional[str] = None) -> Dict:
+        template_type, prompt = self._prepare_solution_request(
+            problem_description, template_type, category
+        )
+        
+        try:
+            response = await self.client.generate_async(
+                prompt, generation_config=self._generation_config(SolutionTemplateOutput.SCHEMA)
+            )
+            return self._build_solution_result(problem_description, template_type, response.text)
             
         except Exception as e:
             return {
@@ -82,33 +170,35 @@ class AIMentor:
     
     def interactive_mentoring(self, user_message: str, 
                             mode: str = 'critical_thinking') -> Dict:
-
-        # Add user message to history
-        self.conversation_history.append({
-            'role': 'user',
-            'content': user_message
-        })
-        
-        # Create context-aware prompt
-        prompt = self._create_interactive_prompt(user_message, mode)
-        
         try:
-            response = self.model.generate_content(prompt)
-            mentor_response = response.text
-            
-            # Add mentor response to history
-            self.conversation_history.append({
-                'role': 'mentor',
-                'content': mentor_response
-            })
+            contents, instruction = self._prepare_interactive_request(user_message, mode)
+            response = self.client.generate(
+                contents, use_cache=False, system_instruction=instruction
+            )
+            return self._build_interactive_result(
+                user_message, mode, response.text, contents, instruction
+            )
             
+        except Exception as e:
             return {
-                'success': True,
-                'mode': mode,
-                'user_message': user_message,
-                'mentor_response': mentor_response,
-                'conversation_length': len(self.conversation_history)
+                'success': False,
+                'error': str(e),
+                'mode': mode
             }
+    
+    async def interactive_mentoring_async(self, user_message: str, 
+                                          mode: str = 'critical_thinking') -> Dict:
+        try:
+            # Compacting may call the model to summarize, so keep it off the event loop
+            contents, instruction = await asyncio.to_thread(
+                self._prepare_interactive_request, user_message, mode
+            )
+            response = await self.client.generate_async(
+                contents, use_cache=False, system_instruction=instruction
+            )
+            return self._build_interactive_result(
+                user_message, mode, response.text, contents, instruction
+            )
             
         except Exception as e:
             return {
@@ -117,12 +207,137 @@ class AIMentor:
                 'mode': mode
             }
     
+    def critical_thinking_stream(self, problem_description: str, 
+                                 context: Optional[str] = None) -> MentorStream:
+        """Stream critical thinking guidance; structured fields are parsed at the end"""
+        # Headed text renders progressively, unlike partial JSON
+        prompt = self._create_critical_thinking_prompt(problem_description, context, structured=False)
+        
+        return MentorStream(
+            self.client.generate_stream(prompt),
+            finish=lambda text: self._build_critical_thinking_result(problem_description, text),
+            fail=lambda e: {
+                'success': False,
+                'error': str(e),
+                'mode': 'Critical Thinking'
+            }
+        )
+    
+    def solution_stream(self, problem_description: str, 
+                        template_type: str = 'auto',
+                        category: Optional[str] = None) -> MentorStream:
+        """Stream a solution template; structured fields are parsed at the end"""
+        template_type, prompt = self._prepare_solution_request(
+            problem_description, template_type, category, structured=False
+        )
+        
+        return MentorStream(
+            self.client.generate_stream(prompt),
+            finish=lambda text: self._build_solution_result(problem_description, template_type, text),
+            fail=lambda e: {
+                'success': False,
+                'error': str(e),
+                'mode': 'Solution'
+            }
+        )
+    
+    def interactive_stream(self, user_message: str, 
+                           mode: str = 'critical_thinking') -> MentorStream:
+        """Stream the mentor's reply; the turn is added to the history once complete"""
+        contents, instruction = self._prepare_interactive_request(user_message, mode)
+        
+        return MentorStream(
+            self.client.generate_stream(contents, use_cache=False, system_instruction=instruction),
+            finish=lambda text: self._build_interactive_result(
+                user_message, mode, text, contents, instruction
+            ),
+            fail=lambda e: {
+                'success': False,
+                'error': str(e),
+                'mode': mode
+            }
+        )
+    
+    def _build_critical_thinking_result(self, problem_description: str, result: str) -> Dict:
+        """Parse a critical thinking response into the result dict"""
+        parsed = self._parse_socratic_output(result)
+        
+        return {
+            'success': True,
+            'mode': 'Critical Thinking',
+            'problem': problem_description,
+            'guiding_questions': parsed.get('questions', []),
+            'reflection_prompts': parsed.get('reflections', []),
+            'challenge_points': parsed.get('challenges', []),
+            'next_steps': parsed.get('next_steps', []),
+            'full_response': result
+        }
+    
+    def _prepare_solution_request(self, problem_description: str, template_type: str,
+                                  category: Optional[str] = None,
+                                  structured: Optional[bool] = None) -> tuple:
+        """Resolve the template type and build the solution prompt"""
+        # Determine best template if auto
+        if template_type == 'auto':
+            template_type = self._determine_template_type(problem_description, category)
+        
+        prompt = self._create_solution_template_prompt(
+            problem_description, 
+            template_type,
+            category,
+            structured
+        )
+        return template_type, prompt
+    
+    def _build_solution_result(self, problem_description: str, template_type: str,
+                               result: str) -> Dict:
+        """Parse a solution template response into the result dict"""
+        parsed = self._parse_template_output(result, template_type)
+        
+        return {
+            'success': True,
+            'mode': 'Solution',
+            'template_type': template_type,
+            'problem': problem_description,
+            'template': parsed.get('template', {}),
+            'implementation_guide': parsed.get('guide', ''),
+            'tips': parsed.get('tips', []),
+            'full_response': result
+        }
+    
+    def _prepare_interactive_request(self, user_message: str, mode: str) -> tuple:
+        """Build the multi-turn contents and system instruction for this turn"""
+        return self.chat.prepare(user_message), self._interactive_system_instruction(mode)
+    
+    def _build_interactive_result(self, user_message: str, mode: str, mentor_response: str,
+                                  contents: List[Dict], instruction: str) -> Dict:
+        """Record the completed exchange and build the result dict"""
+        self.chat.record(user_message, mentor_response, contents, instruction)
+        
+        return {
+            'success': True,
+            'mode': mode,
+            'user_message': user_message,
+            'mentor_response': mentor_response,
+            'conversation_length': self.chat.total_messages,
+            'tokens_sent': self.chat.turn_stats[-1]['tokens_sent']
+        }
+    
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Recent turns kept verbatim; older ones live in the chat summary"""
+        return self.chat.messages()
+    
+    def chat_stats(self) -> Dict:
+        return self.chat.stats()
+    
     def reset_conversation(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.chat.reset()
     
     def _create_critical_thinking_prompt(self, problem_description: str, 
-                                        context: Optional[str] = None) -> str:
+                                        context: Optional[str] = None,
+                                        structured: Optional[bool] = None) -> str:
         """Create prompt for critical thinking mode"""
         prompt = f"""You are a Socratic mentor who guides learners through critical thinking and reflection.
 Your role is to ask thought-provoking questions rather than give direct answers.
@@ -133,7 +348,16 @@ Problem/Topic: {problem_description}
         if context:
             prompt += f"\nContext: {context}\n"
         
-        prompt += """
+        if self.structured_output if structured is None else structured:
+            prompt += """
+Respond with a single JSON object:
+- "guiding_questions": 3-5 open-ended questions that help the learner explore the problem deeply
+- "reflection_prompts": 2-3 prompts that encourage self-reflection and analysis
+- "challenge_points": 2-3 challenging perspectives or assumptions to examine
+- "next_steps": suggested thinking exercises or exploration activities
+"""
+        else:
+            prompt += """
 Generate Socratic guidance in this format:
 
 GUIDING QUESTIONS:
@@ -147,114 +371,18 @@ CHALLENGE POINTS:
 
 NEXT STEPS:
 [Suggested thinking exercises or exploration activities]
-
-Remember: Ask questions, don't provide solutions. Guide discovery through inquiry.
 """
         
+        prompt += "\nRemember: Ask questions, don't provide solutions. Guide discovery through inquiry.\n"
+        
         return prompt
     
     def _create_solution_template_prompt(self, problem_description: str, 
                                         template_type: str,
-                                        category: Optional[str] = None) -> str:
+                                        category: Optional[str] = None,
+                                        structured: Optional[bool] = None) -> str:
         """Create prompt for solution template generation"""
-        
-        template_instructions = {
-            'swot': """
-Generate a SWOT Analysis template:
-
-STRENGTHS:
-[Internal positive factors]
-
-WEAKNESSES:
-[Internal limitations]
-
-OPPORTUNITIES:
-[External favorable conditions]
-
-THREATS:
-[External challenges]
-
-STRATEGIC INSIGHTS:
-[Key takeaways and recommendations]
-""",
-            'budget': """
-Generate a Budget Outline template:
-
-REVENUE/FUNDING SOURCES:
-[Expected income or funding]
-
-EXPENSES:
-- Personnel
-- Materials
-- Operations
-- Contingency
-
-BUDGET TIMELINE:
-[Phased allocation]
-
-COST-SAVING OPPORTUNITIES:
-[Ideas for efficiency]
-""",
-            'action_plan': """
-Generate an Action Plan template:
-
-OBJECTIVES:
-[Clear, measurable goals]
-
-ACTION ITEMS:
-[Step-by-step tasks with timeline]
-
-RESPONSIBLE PARTIES:
-[Who does what]
-
-RESOURCES NEEDED:
-[What's required]
-
-SUCCESS METRICS:
-[How to measure progress]
-
-RISK MITIGATION:
-[Potential challenges and solutions]
-""",
-            'stakeholder': """
-Generate a Stakeholder Analysis template:
-
-KEY STAKEHOLDERS:
-[List of involved parties]
-
-STAKEHOLDER INTERESTS:
-[What each stakeholder cares about]
-
-INFLUENCE LEVEL:
-[High/Medium/Low for each]
-
-ENGAGEMENT STRATEGY:
-[How to involve each stakeholder]
-
-COMMUNICATION PLAN:
-[How and when to communicate]
-""",
-            'timeline': """
-Generate a Project Timeline template:
-
-PHASES:
-[Major project phases]
-
-MILESTONES:
-[Key achievement points with dates]
-
-DEPENDENCIES:
-[What depends on what]
-
-CRITICAL PATH:
-[Most time-sensitive activities]
-
-BUFFER TIME:
-[Contingency periods]
-"""
-        }
-        
-        instruction = template_instructions.get(template_type, template_instructions['action_plan'])
+        name, sections = SOLUTION_TEMPLATES.get(template_type, SOLUTION_TEMPLATES['action_plan'])
         
         prompt = f"""You are a solution-oriented mentor helping create practical frameworks.
 
@@ -264,47 +392,43 @@ Problem: {problem_description}
         if category:
             prompt += f"Category: {category}\n"
         
-        prompt += f"""
-Template Type: {template_type.upper().replace('_', ' ')}
+        prompt += f"\nTemplate Type: {template_type.upper().replace('_', ' ')}\n"
+        
+        if self.structured_output if structured is None else structured:
+            section_lines = '\n'.join(f"  - {title.title()}: {hint}" for title, hint in sections)
+            prompt += f"""
+Generate a {name} template as a single JSON object:
+- "sections": one entry per section below, each with its "title" and a list of "items"
+{section_lines}
+- "implementation_guide": a step-by-step guide to use this template
+- "tips": 3-5 actionable tips for success
+"""
+        else:
+            section_blocks = '\n\n'.join(f"{title}:\n[{hint}]" for title, hint in sections)
+            prompt += f"""
+Generate a {name} template:
 
-{instruction}
+{section_blocks}
 
 IMPLEMENTATION GUIDE:
 [Step-by-step guide to use this template]
 
 PRACTICAL TIPS:
 [3-5 actionable tips for success]
-
-Tailor all sections specifically to the problem described above.
 """
         
+        prompt += "\nTailor all sections specifically to the problem described above.\n"
+        
         return prompt
     
-    def _create_interactive_prompt(self, user_message: str, mode: str) -> str:
-        """Create prompt for interactive conversation"""
-        
-        history_context = ""
-        if self.conversation_history:
-            history_context = "\nConversation history:\n"
-            for entry in self.conversation_history[-4:]:  # Last 4 messages
-                role = entry['role'].title()
-                history_context += f"{role}: {entry['content']}\n"
-        
+    def _interactive_system_instruction(self, mode: str) -> str:
+        """System role for interactive conversation, sent once per request"""
         if mode == 'critical_thinking':
-            system_role = """You are a Socratic mentor. Continue guiding through questions.
+            return """You are a Socratic mentor. Continue guiding through questions.
 Ask probing questions, encourage reflection, challenge assumptions."""
-        else:
-            system_role = """You are a solution-focused mentor. Provide practical frameworks,
-actionable advice, and concrete next steps."""
-        
-        prompt = f"""{system_role}
-{history_context}
-
-User: {user_message}
-
-Mentor response:"""
         
-        return prompt
+        return """You are a solution-focused mentor. Provide practical frameworks,
+actionable advice, and concrete next steps."""
     
     def _determine_template_type(self, problem_description: str, 
                                  category: Optional[str] = None) -> str:
@@ -323,44 +447,68 @@ Mentor response:"""
         else:
             return 'action_plan'  # Default
     
+    def _generation_config(self, schema: Dict) -> Optional[Dict]:
+        if not self.structured_output:
+            return None
+        return json_generation_config(schema)
+    
+    def _parse_socratic_output(self, response: str) -> Dict:
+        """Validate the JSON response, scraping headers only when that fails"""
+        if self.structured_output:
+            try:
+                output = SocraticOutput.from_json(response)
+                return {
+                    'questions': output.guiding_questions,
+                    'reflections': output.reflection_prompts,
+                    'challenges': output.challenge_points,
+                    'next_steps': output.next_steps
+                }
+            except StructuredOutputError:
+                pass
+        
+        return self._parse_socratic_response(response)
+    
+    def _parse_template_output(self, response: str, template_type: str) -> Dict:
+        """Validate the JSON response, scraping headers only when that fails"""
+        if self.structured_output:
+            try:
+                output = SolutionTemplateOutput.from_json(response)
+                return {
+                    'template': output.sections,
+                    'guide': output.implementation_guide,
+                    'tips': output.tips
+                }
+            except StructuredOutputError:
+                pass
+        
+        return self._parse_template_response(response, template_type)
+    
     def _parse_socratic_response(self, response: str) -> Dict:
         """Parse Socratic questioning response"""
-        parsed = {}
-        
-        sections = {
-            'questions': ['GUIDING QUESTIONS:', 'Guiding Questions:'],
-            'reflections': ['REFLECTION PROMPTS:', 'Reflection Prompts:'],
-            'challenges': ['CHALLENGE POINTS:', 'Challenge Points:'],
-            'next_steps': ['NEXT STEPS:', 'Next Steps:']
+        return {
+            key: self._parse_list_items(content)
+            for key, content in SOCRATIC_SECTIONS.parse(response).items()
         }
-        
-        for key, headers in sections.items():
-            for header in headers:
-                if header in response:
-                    content = self._extract_section_content(response, header, sections)
-                    parsed[key] = self._parse_list_items(content)
-                    break
-        
-        return parsed
     
     def _parse_template_response(self, response: str, template_type: str) -> Dict:
         """Parse template response"""
         parsed = {}
+        spans = TEMPLATE_TAIL_SECTIONS.find_all(response)
+        guide = next((span for span in spans if span.key == 'guide'), None)
         
         # Extract template structure (everything before IMPLEMENTATION GUIDE)
-        if 'IMPLEMENTATION GUIDE:' in response:
-            template_text = response.split('IMPLEMENTATION GUIDE:')[0]
-            guide_and_rest = response.split('IMPLEMENTATION GUIDE:')[1]
+        if guide is not None:
+            parsed['template'] = self._parse_template_structure(
+                response[:guide.header_start], template_type
+            )
             
-            parsed['template'] = self._parse_template_structure(template_text, template_type)
-            
-            if 'PRACTICAL TIPS:' in guide_and_rest:
-                guide = guide_and_rest.split('PRACTICAL TIPS:')[0].strip()
-                tips = guide_and_rest.split('PRACTICAL TIPS:')[1].strip()
-                parsed['guide'] = guide
-                parsed['tips'] = self._parse_list_items(tips)
+            tips = next((span for span in spans 
+                         if span.key == 'tips' and span.header_start > guide.header_start), None)
+            if tips is not None:
+                parsed['guide'] = response[guide.start:tips.header_start].strip()
+                parsed['tips'] = self._parse_list_items(response[tips.start:tips.end])
             else:
-                parsed['guide'] = guide_and_rest.strip()
+                parsed['guide'] = response[guide.start:guide.end].strip()
                 parsed['tips'] = []
         else:
             parsed['template'] = {'raw': response}
@@ -389,22 +537,6 @@ Mentor response:"""
         
         return structure
     
-    def _extract_section_content(self, response: str, header: str, 
-                                 all_sections: Dict) -> str:
-        """Extract content between section headers"""
-        start_idx = response.find(header) + len(header)
-        
-        # Find next section header
-        end_idx = len(response)
-        for section_headers in all_sections.values():
-            for other_header in section_headers:
-                if other_header != header and other_header in response[start_idx:]:
-                    idx = response.find(other_header, start_idx)
-                    if idx < end_idx:
-                        end_idx = idx
-        
-        return response[start_idx:end_idx].strip()
-    
     def _parse_list_items(self, text: str) -> List[str]:
         """Parse text into list items"""
         items = []
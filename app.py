@@ -1,12 +1,18 @@
 import streamlit as st
-from PIL import Image
-import io
 import base64
+import uuid
+from contextlib import contextmanager
 from typing import Optional
 
 from integrated_system import AILearningPlatform
 from ai_mentor import AIMentor
+from call_policy import policy_stats
 from config import Config
+import keyframes
+from keyframes import is_animated, is_video
+from mentor_prefetch import session_scope
+from telemetry import (configure_logging, recent_traces, registry, start_metrics_server,
+                       trace_request)
 
 # Page configuration
 st.set_page_config(
@@ -68,15 +74,32 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def start_telemetry():
+    """Log setup and the optional /metrics endpoint, once per server process"""
+    configure_logging()
+    return start_metrics_server()
+
+
+start_telemetry()
+
+
+@st.cache_resource
+def get_platform():
+    """One platform per server process, shared by every browser session"""
+    return AILearningPlatform()
+
+
 # Initialize session state
 if 'platform' not in st.session_state:
     try:
-        st.session_state.platform = AILearningPlatform()
+        st.session_state.platform = get_platform()
         st.session_state.api_configured = True
     except ValueError as e:
         st.session_state.api_configured = False
         st.session_state.error_message = str(e)
 
+# The mentor holds this visitor's chat history; its Gemini client is shared
 if 'mentor' not in st.session_state:
     try:
         st.session_state.mentor = AIMentor()
@@ -89,6 +112,14 @@ if 'analysis_result' not in st.session_state:
 if 'mentor_conversation' not in st.session_state:
     st.session_state.mentor_conversation = []
 
+# Requests made by this visitor, for the debug panel
+if 'request_ids' not in st.session_state:
+    st.session_state.request_ids = []
+
+# Keeps this visitor's prefetched mentor guidance apart from other sessions' on the shared platform
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 
 def display_header():
     """Display the application header"""
@@ -99,33 +130,169 @@ def display_header():
     )
 
 
-def process_image(image_file, domains):
+def stage_renderer(container):
+    """Draw each pipeline stage into container as soon as the platform reports it"""
+    def on_stage(stage, value):
+        if not isinstance(value, dict) or not value.get('success'):
+            return
+        
+        with container:
+            if stage == 'vision':
+                st.markdown("### Vision Analysis")
+                display_vision_analysis(value['analysis'], value)
+            elif stage == 'classification':
+                display_classification(value)
+            elif stage == 'mission':
+                st.markdown("### Mission Statement")
+                display_mission(value)
+    
+    return on_stage
+
+
+def process_image(image_file, domains, fused=False, tiled=False):
     """Process uploaded image"""
+    live_results = st.empty()
+    
     with st.spinner("Analyzing image..."):
-        # Save uploaded file temporarily
-        image = Image.open(image_file)
-        
-        # Convert to bytes for processing
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format=image.format or 'PNG')
-        img_byte_arr = img_byte_arr.getvalue()
-        
-        # Save temporarily
-        temp_path = "/tmp/uploaded_image.jpg"
-        with open(temp_path, "wb") as f:
-            f.write(img_byte_arr)
+        on_stage = stage_renderer(live_results.container())
         
-        # Process with platform
-        result = st.session_state.platform.process_image(temp_path, domains=domains)
-        
-        return result
+        # Walkthrough videos and animations are analyzed through their distinct keyframes
+        with session_scope(st.session_state.session_id):
+            if is_video(image_file) or is_animated(image_file):
+                result = st.session_state.platform.process_video(
+                    image_file, domains=domains, on_stage=on_stage
+                )
+            else:
+                # The upload is already an in-memory buffer, so hand it over without re-encoding
+                result = st.session_state.platform.process_image(
+                    image_file, domains=domains, fused=fused, tiled=tiled, on_stage=on_stage
+                )
+    
+    # The tabbed view below replaces the partial results
+    live_results.empty()
+    remember_request(result)
+    return result
 
 
 def process_text(problem_description):
     """Process text description"""
-    with st.spinner("Processing description..."):
-        result = st.session_state.platform.process_text_description(problem_description)
-        return result
+    live_results = st.empty()
+    
+    with st.spinner("Processing description..."), session_scope(st.session_state.session_id):
+        result = st.session_state.platform.process_text_description(
+            problem_description, on_stage=stage_renderer(live_results.container())
+        )
+    
+    live_results.empty()
+    remember_request(result)
+    return result
+
+
+def remember_request(result):
+    telemetry = result.get('telemetry')
+    if telemetry:
+        st.session_state.request_ids.append(telemetry['request_id'])
+        del st.session_state.request_ids[:-Config.TELEMETRY_RECENT_REQUESTS]
+
+
+@contextmanager
+def mentor_request(kind):
+    """Trace a mentor request so its model calls show up in the debug panel"""
+    with trace_request(kind) as trace:
+        yield
+    remember_request({'telemetry': trace.summary()})
+
+
+def display_vision_analysis(analysis, details):
+    """Vision analysis text plus the keyframe, dedup and upload notes in details"""
+    st.markdown('<div class="info-box">', unsafe_allow_html=True)
+    st.markdown(analysis)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    keyframes = details.get('keyframes')
+    if keyframes:
+        st.caption(
+            "Analyzed keyframes at " +
+            ", ".join(f"{frame['timestamp']:.1f}s" for frame in keyframes)
+        )
+    
+    duplicate_of = details.get('duplicate_of')
+    if duplicate_of:
+        st.caption("Near-identical to an earlier photo; reused its analysis")
+    
+    if details.get('resolution') == 'coarse':
+        st.caption("Resolved from a low-resolution preview; full resolution was not needed")
+    
+    image_report = details.get('image_report')
+    if image_report:
+        width, height = image_report['sent_size']
+        st.caption(
+            f"Image sent at {width}x{height}, "
+            f"{image_report['sent_bytes'] / 1024:.0f} KB "
+            f"({image_report['bytes_saved'] / 1024:.0f} KB saved)"
+        )
+
+
+def display_classification(classification):
+    """Category, confidence and reasoning"""
+    st.markdown("### Problem Classification")
+    
+    if classification.get('success') is False:
+        st.warning(f"Classification failed: {classification.get('error', 'Unknown error')}")
+        return
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        category = classification.get('category', 'Unknown')
+        emoji_map = {
+            'Environment': '',
+            'Health': '',
+            'Education': ''
+        }
+        st.metric("Category", f"{emoji_map.get(category, '❓')} {category}")
+    
+    with col2:
+        confidence = classification.get('confidence', 'Unknown')
+        st.metric("Confidence", confidence)
+    
+    if classification.get('reasoning'):
+        st.markdown("**Reasoning:**")
+        st.info(classification['reasoning'])
+
+
+def display_mission(mission):
+    """Mission statement with its definition, goal, impact and action steps"""
+    # Image analyses still succeed when only the mission step failed
+    if mission.get('success') is False:
+        st.warning(f"Mission generation failed: {mission.get('error', 'Unknown error')}")
+        return
+    
+    if mission.get('mission_statement'):
+        st.markdown('<div class="success-box">', unsafe_allow_html=True)
+        st.markdown(f"**{mission['mission_statement']}**")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Problem Definition
+    if mission.get('problem_definition'):
+        st.markdown("#### Problem Definition")
+        st.write(mission['problem_definition'])
+    
+    # Goal
+    if mission.get('goal'):
+        st.markdown("#### Goal")
+        st.write(mission['goal'])
+    
+    # Expected Impact
+    if mission.get('expected_impact'):
+        st.markdown("#### Expected Impact")
+        st.write(mission['expected_impact'])
+    
+    # Action Steps
+    if mission.get('action_steps'):
+        st.markdown("#### Action Steps")
+        for i, step in enumerate(mission['action_steps'], 1):
+            st.markdown(f"{i}. {step}")
 
 
 def display_results(result):
@@ -143,66 +310,16 @@ def display_results(result):
         st.markdown("### Vision Analysis" if 'vision_analysis' in result else "### Problem Description")
         
         if 'vision_analysis' in result:
-            st.markdown('<div class="info-box">', unsafe_allow_html=True)
-            st.markdown(result['vision_analysis'])
-            st.markdown('</div>', unsafe_allow_html=True)
+            display_vision_analysis(result['vision_analysis'], result)
         elif 'original_description' in result:
             st.info(f"**Original Description:** {result['original_description']}")
     
     with tab2:
-        st.markdown("### Problem Classification")
-        
-        classification = result.get('classification', {})
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            category = classification.get('category', 'Unknown')
-            emoji_map = {
-                'Environment': '',
-                'Health': '',
-                'Education': ''
-            }
-            st.metric("Category", f"{emoji_map.get(category, '❓')} {category}")
-        
-        with col2:
-            confidence = classification.get('confidence', 'Unknown')
-            st.metric("Confidence", confidence)
-        
-        if classification.get('reasoning'):
-            st.markdown("**Reasoning:**")
-            st.info(classification['reasoning'])
+        display_classification(result.get('classification', {}))
     
     with tab3:
         st.markdown("### Mission Statement")
-        
-        mission = result.get('mission_statement', {})
-        
-        if mission.get('mission_statement'):
-            st.markdown('<div class="success-box">', unsafe_allow_html=True)
-            st.markdown(f"**{mission['mission_statement']}**")
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Problem Definition
-        if mission.get('problem_definition'):
-            st.markdown("#### Problem Definition")
-            st.write(mission['problem_definition'])
-        
-        # Goal
-        if mission.get('goal'):
-            st.markdown("#### Goal")
-            st.write(mission['goal'])
-        
-        # Expected Impact
-        if mission.get('expected_impact'):
-            st.markdown("#### Expected Impact")
-            st.write(mission['expected_impact'])
-        
-        # Action Steps
-        if mission.get('action_steps'):
-            st.markdown("#### Action Steps")
-            for i, step in enumerate(mission['action_steps'], 1):
-                st.markdown(f"{i}. {step}")
+        display_mission(result.get('mission_statement', {}))
     
     # Download results
     st.markdown("---")
@@ -264,6 +381,41 @@ def display_mentor_interface():
         display_interactive_chat()
 
 
+def analyzed_problem():
+    """Problem text of the latest analysis, which the platform may have prefetched guidance for"""
+    result = st.session_state.analysis_result
+    prefetch = result.get('mentor_prefetch') if result else None
+    return prefetch['problem'] if prefetch else ""
+
+
+def prefetched_guidance(problem, mode, template_type='auto'):
+    """Guidance the platform requested in the background for this exact problem, if any"""
+    prefetcher = st.session_state.platform.mentor_prefetch
+    if prefetcher is None:
+        return None
+    
+    with st.spinner("Loading guidance..."), session_scope(st.session_state.session_id):
+        return prefetcher.get(problem, mode, template_type,
+                              timeout=Config.MENTOR_PREFETCH_WAIT_SECONDS)
+
+
+def cancel_previous_prefetch():
+    """A new analysis makes the previous one's prefetched guidance unlikely to be used"""
+    result = st.session_state.analysis_result
+    if result and result.get('mentor_prefetch'):
+        with session_scope(st.session_state.session_id):
+            st.session_state.platform.cancel_mentor_prefetch(result['mentor_prefetch']['problem'])
+
+
+def render_mentor_stream(stream):
+    """Show response text as it streams in, then clear it for the parsed view"""
+    placeholder = st.empty()
+    with placeholder.container():
+        st.write_stream(stream)
+    placeholder.empty()
+    return stream.result
+
+
 def display_critical_thinking_mode():
     """Display Critical Thinking Mode interface"""
     st.markdown("#### Critical Thinking Mode")
@@ -271,6 +423,7 @@ def display_critical_thinking_mode():
     
     problem_input = st.text_area(
         "Describe the problem or topic you want to explore:",
+        value=analyzed_problem(),
         placeholder="Example: How can we reduce plastic waste in our community?",
         height=150,
         key="ct_problem"
@@ -278,44 +431,45 @@ def display_critical_thinking_mode():
     
     if st.button("Get Socratic Guidance", key="ct_button"):
         if problem_input:
-            with st.spinner("Generating thought-provoking questions..."):
-                result = st.session_state.mentor.critical_thinking_mode(
-                    problem_input,
-                    None
-                )
+            with mentor_request('mentor_critical_thinking'):
+                result = prefetched_guidance(problem_input, 'critical_thinking')
+                if result is None:
+                    result = render_mentor_stream(
+                        st.session_state.mentor.critical_thinking_stream(problem_input, None)
+                    )
+            
+            if result.get('success'):
+                st.success("Guidance Generated!")
                 
-                if result.get('success'):
-                    st.success("Guidance Generated!")
-                    
-                    # Display guiding questions
-                    if result.get('guiding_questions'):
-                        st.markdown("##### Guiding Questions")
-                        st.markdown('<div class="info-box">', unsafe_allow_html=True)
-                        for i, question in enumerate(result['guiding_questions'], 1):
-                            st.markdown(f"**{i}.** {question}")
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Display reflection prompts
-                    if result.get('reflection_prompts'):
-                        st.markdown("##### Reflection Prompts")
-                        for prompt in result['reflection_prompts']:
-                            st.info(prompt)
-                    
-                    # Display challenge points
-                    if result.get('challenge_points'):
-                        st.markdown("##### Challenge Points")
-                        st.markdown('<div class="warning-box">', unsafe_allow_html=True)
-                        for point in result['challenge_points']:
-                            st.markdown(f"- {point}")
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Display next steps
-                    if result.get('next_steps'):
-                        st.markdown("##### Suggested Next Steps")
-                        for step in result['next_steps']:
-                            st.markdown(f"- {step}")
-                else:
-                    st.error(f"Error: {result.get('error')}")
+                # Display guiding questions
+                if result.get('guiding_questions'):
+                    st.markdown("##### Guiding Questions")
+                    st.markdown('<div class="info-box">', unsafe_allow_html=True)
+                    for i, question in enumerate(result['guiding_questions'], 1):
+                        st.markdown(f"**{i}.** {question}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+                
+                # Display reflection prompts
+                if result.get('reflection_prompts'):
+                    st.markdown("##### Reflection Prompts")
+                    for prompt in result['reflection_prompts']:
+                        st.info(prompt)
+                
+                # Display challenge points
+                if result.get('challenge_points'):
+                    st.markdown("##### Challenge Points")
+                    st.markdown('<div class="warning-box">', unsafe_allow_html=True)
+                    for point in result['challenge_points']:
+                        st.markdown(f"- {point}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+                
+                # Display next steps
+                if result.get('next_steps'):
+                    st.markdown("##### Suggested Next Steps")
+                    for step in result['next_steps']:
+                        st.markdown(f"- {step}")
+            else:
+                st.error(f"Error: {result.get('error')}")
         else:
             st.warning("Please describe a problem or topic first.")
 
@@ -327,6 +481,7 @@ def display_solution_mode():
     
     problem_input = st.text_area(
         "Describe the problem you want to solve:",
+        value=analyzed_problem(),
         placeholder="Example: We need to improve literacy rates in our community...",
         height=120,
         key="sol_problem"
@@ -341,86 +496,91 @@ def display_solution_mode():
     
     if st.button("Generate Template", key="sol_button"):
         if problem_input:
-            with st.spinner("Creating solution template..."):
-                # Map selections
-                template_map = {
-                    "Auto-detect": "auto",
-                    "SWOT Analysis": "swot",
-                    "Budget Outline": "budget",
-                    "Action Plan": "action_plan",
-                    "Stakeholder Analysis": "stakeholder",
-                    "Project Timeline": "timeline"
-                }
-                
-                result = st.session_state.mentor.solution_mode(
-                    problem_input,
-                    template_map[template_type],
-                    None
-                )
+            # Map selections
+            template_map = {
+                "Auto-detect": "auto",
+                "SWOT Analysis": "swot",
+                "Budget Outline": "budget",
+                "Action Plan": "action_plan",
+                "Stakeholder Analysis": "stakeholder",
+                "Project Timeline": "timeline"
+            }
+            
+            with mentor_request('mentor_solution'):
+                result = prefetched_guidance(problem_input, 'solution',
+                                             template_map[template_type])
+                if result is None:
+                    result = render_mentor_stream(
+                        st.session_state.mentor.solution_stream(
+                            problem_input,
+                            template_map[template_type],
+                            None
+                        )
+                    )
+            
+            if result.get('success'):
+                st.success(f"Template Generated: {result.get('template_type', '').replace('_', ' ').title()}")
                 
-                if result.get('success'):
-                    st.success(f"Template Generated: {result.get('template_type', '').replace('_', ' ').title()}")
-                    
-                    # Display template
-                    template_data = result.get('template', {})
-                    if template_data:
-                        st.markdown("##### Template")
-                        st.markdown('<div class="success-box">', unsafe_allow_html=True)
-                        
-                        for section, items in template_data.items():
-                            st.markdown(f"**{section}**")
-                            if isinstance(items, list):
-                                for item in items:
-                                    st.markdown(f"- {item}")
-                            else:
-                                st.markdown(items)
-                            st.markdown("")
-                        
-                        st.markdown('</div>', unsafe_allow_html=True)
+                # Display template
+                template_data = result.get('template', {})
+                if template_data:
+                    st.markdown("##### Template")
+                    st.markdown('<div class="success-box">', unsafe_allow_html=True)
                     
-                    # Display implementation guide
-                    if result.get('implementation_guide'):
-                        st.markdown("##### Implementation Guide")
-                        st.info(result['implementation_guide'])
-                    
-                    # Display tips
-                    if result.get('tips'):
-                        st.markdown("##### Practical Tips")
-                        for tip in result['tips']:
-                            st.markdown(f"- {tip}")
+                    for section, items in template_data.items():
+                        st.markdown(f"**{section}**")
+                        if isinstance(items, list):
+                            for item in items:
+                                st.markdown(f"- {item}")
+                        else:
+                            st.markdown(items)
+                        st.markdown("")
                     
-                    # Download button
-                    download_content = f"""# {result.get('template_type', '').replace('_', ' ').title()} Template
+                    st.markdown('</div>', unsafe_allow_html=True)
+                
+                # Display implementation guide
+                if result.get('implementation_guide'):
+                    st.markdown("##### Implementation Guide")
+                    st.info(result['implementation_guide'])
+                
+                # Display tips
+                if result.get('tips'):
+                    st.markdown("##### Practical Tips")
+                    for tip in result['tips']:
+                        st.markdown(f"- {tip}")
+                
+                # Download button
+                download_content = f"""# {result.get('template_type', '').replace('_', ' ').title()} Template
 
 Problem: {problem_input}
 
 ## Template
 
 """
-                    for section, items in template_data.items():
-                        download_content += f"\n### {section}\n"
-                        if isinstance(items, list):
-                            for item in items:
-                                download_content += f"- {item}\n"
-                        else:
-                            download_content += f"{items}\n"
-                    
-                    if result.get('implementation_guide'):
-                        download_content += f"\n## Implementation Guide\n{result['implementation_guide']}\n"
-                    
-                    if result.get('tips'):
-                        download_content += "\n## Tips\n"
-                        for tip in result['tips']:
-                            download_content += f"- {tip}\n"
-                    
-                    st.download_button(
-                        label="Download Template",
-                        data=download_content,
-                        file_name=f"{result.get('template_type', 'template')}.txt",
-                        mime="text/plain"
-                    )
-                else:
-                    st.error(f"Error: {result.get('error')}")
+                for section, items in template_data.items():
+                    download_content += f"\n### {section}\n"
+                    if isinstance(items, list):
+                        for item in items:
+                            download_content += f"- {item}\n"
+                    else:
+                        download_content += f"{items}\n"
+                
+                if result.get('implementation_guide'):
+                    download_content += f"\n## Implementation Guide\n{result['implementation_guide']}\n"
+                
+                if result.get('tips'):
+                    download_content += "\n## Tips\n"
+                    for tip in result['tips']:
+                        download_content += f"- {tip}\n"
+                
+                st.download_button(
+                    label="Download Template",
+                    data=download_content,
+                    file_name=f"{result.get('template_type', 'template')}.txt",
+                    mime="text/plain"
+                )
+            else:
+                st.error(f"Error: {result.get('error')}")
         else:
             st.warning("Please describe a problem first.")
 
@@ -447,6 +607,9 @@ def display_interactive_chat():
                 st.markdown(f"**Mentor:** {msg['content']}")
             st.markdown("---")
     
+    # The in-progress reply streams here, below the conversation
+    live_reply = st.container()
+    
     # Chat input
     user_message = st.text_area(
         "Your message:",
@@ -462,21 +625,25 @@ def display_interactive_chat():
             if user_message:
                 mode = "critical_thinking" if chat_mode == "Critical Thinking" else "solution"
                 
-                with st.spinner("Mentor is thinking..."):
-                    result = st.session_state.mentor.interactive_mentoring(user_message, mode)
-                    
-                    if result.get('success'):
-                        st.session_state.mentor_conversation.append({
-                            'role': 'user',
-                            'content': user_message
-                        })
-                        st.session_state.mentor_conversation.append({
-                            'role': 'mentor',
-                            'content': result['mentor_response']
-                        })
-                        st.rerun()
-                    else:
-                        st.error(f"Error: {result.get('error')}")
+                stream = st.session_state.mentor.interactive_stream(user_message, mode)
+                with live_reply, mentor_request('mentor_chat'):
+                    st.markdown(f"**You:** {user_message}")
+                    st.markdown("**Mentor:**")
+                    st.write_stream(stream)
+                result = stream.result
+                
+                if result.get('success'):
+                    st.session_state.mentor_conversation.append({
+                        'role': 'user',
+                        'content': user_message
+                    })
+                    st.session_state.mentor_conversation.append({
+                        'role': 'mentor',
+                        'content': result['mentor_response']
+                    })
+                    st.rerun()
+                else:
+                    st.error(f"Error: {result.get('error')}")
             else:
                 st.warning("Please enter a message.")
     
@@ -488,6 +655,99 @@ def display_interactive_chat():
             st.rerun()
 
 
+def display_debug_panel():
+    """Per-request model calls, tokens, cost and stage timings, plus process-wide metrics"""
+    with st.sidebar.expander("Debug: requests and metrics"):
+        request_ids = set(st.session_state.request_ids)
+        traces = [trace for trace in recent_traces() if trace['request_id'] in request_ids]
+        if traces:
+            choice = st.selectbox(
+                "Request",
+                range(len(traces)),
+                format_func=lambda index: (f"{traces[index]['kind']} "
+                                           f"({traces[index]['wall_seconds']:.2f}s, "
+                                           f"{traces[index]['request_id']})"),
+                key="debug_request"
+            )
+            display_trace(traces[choice])
+        else:
+            st.caption("No requests from this session yet")
+        
+        st.markdown("**Model call latency (all sessions)**")
+        latencies = [
+            {
+                'model': histogram['labels']['model'],
+                'stage': histogram['labels']['stage'],
+                'calls': histogram['count'],
+                'mean_ms': round(histogram['mean'] * 1000),
+                'p95_ms_le': histogram['p95_le'] * 1000
+            }
+            for histogram in registry.snapshot()['histograms']
+            if histogram['name'] == 'model_call_seconds'
+        ]
+        if latencies:
+            st.dataframe(latencies, hide_index=True)
+        
+        policies = policy_stats()
+        if policies:
+            st.markdown("**Call policies**")
+            st.dataframe([
+                {
+                    'task': policy['task'],
+                    'breaker': policy['breaker'],
+                    'failures': policy['consecutive_failures'],
+                    'hedge_after_ms': (round(policy['hedge_delay'] * 1000)
+                                       if policy['hedge_delay'] is not None else None),
+                    'abandoned': policy['abandoned']
+                }
+                for policy in policies
+            ], hide_index=True)
+        
+        port = start_telemetry()
+        if port is not None:
+            st.caption(f"Prometheus metrics are served on port {port} at /metrics")
+
+
+def display_trace(trace):
+    col1, col2 = st.columns(2)
+    col1.metric("Wall time", f"{trace['wall_seconds']:.2f}s")
+    col2.metric("Model calls", trace['model_calls'],
+                help=f"{trace['cache_hits']} cached, {trace['errors']} failed")
+    col1.metric("Tokens in / out",
+                f"{trace['prompt_tokens'] or 0} / {trace['output_tokens'] or 0}")
+    col2.metric("Cost", f"${trace['cost_usd'] or 0:.5f}")
+    
+    if trace['stages']:
+        st.markdown("**Stages**")
+        st.dataframe([
+            {
+                'stage': stage,
+                'start_ms': round(timing['start'] * 1000),
+                'wall_ms': round(timing['seconds'] * 1000),
+                'cpu_ms': (round(timing['cpu_seconds'] * 1000)
+                           if timing.get('cpu_seconds') is not None else None)
+            }
+            for stage, timing in trace['stages'].items()
+        ], hide_index=True)
+    
+    if trace['calls']:
+        st.markdown("**Model calls**")
+        st.dataframe([
+            {
+                'stage': call['stage'],
+                'model': call['model'],
+                'ms': round(call['latency_seconds'] * 1000),
+                'tokens_in': call['prompt_tokens'],
+                'tokens_out': call['output_tokens'],
+                'cached': call['cache_hit'],
+                'attempts': call['attempts'],
+                'hedged': call['hedged'],
+                'error': call['error']
+            }
+            for call in trace['calls']
+        ], hide_index=True)
+
+
 def main():
     """Main application"""
     # Display header
@@ -526,10 +786,18 @@ def main():
             st.markdown("### Upload Community Issue Image")
             st.markdown("Upload a photo showing a community problem (environment, health, or education issue)")
             
+            # Videos are decoded with OpenCV, so they are only offered when it is installed
+            if keyframes.cv2 is not None:
+                upload_types = ['png', 'jpg', 'jpeg', 'gif', 'webp', 'mp4', 'mov', 'webm']
+                upload_help = ("Supported formats: PNG, JPG, JPEG, GIF, WEBP, and MP4, MOV or "
+                               "WEBM walkthrough videos")
+            else:
+                upload_types = ['png', 'jpg', 'jpeg', 'gif', 'webp']
+                upload_help = "Supported formats: PNG, JPG, JPEG, GIF, WEBP"
             uploaded_file = st.file_uploader(
                 "Choose an image...",
-                type=['png', 'jpg', 'jpeg', 'gif', 'webp'],
-                help="Supported formats: PNG, JPG, JPEG, GIF, WEBP"
+                type=upload_types,
+                help=upload_help
             )
             
             col1, col2 = st.columns([2, 1])
@@ -537,14 +805,28 @@ def main():
             with col1:
                 if uploaded_file is not None:
                     # Display uploaded image
-                    image = Image.open(uploaded_file)
-                    st.image(image, caption="Uploaded Image", use_container_width=True)
+                    if is_video(uploaded_file):
+                        st.video(uploaded_file)
+                    else:
+                        st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
             
             # Analyze button
             if uploaded_file is not None:
+                fused = st.checkbox(
+                    "Fast mode (single AI call)",
+                    key="fused_mode",
+                    help="Detect, classify and draft the mission in one request instead of three"
+                )
+                tiled = st.checkbox(
+                    "High-detail mode (analyze in tiles)",
+                    key="tiled_mode",
+                    help="Split wide, high-resolution shots into overlapping tiles to catch small "
+                         "details. Uses several vision calls and takes precedence over fast mode"
+                )
                 if st.button("Analyze Image", key="analyze_image"):
                     domains = st.session_state.get('selected_domains', Config.CATEGORIES)
-                    result = process_image(uploaded_file, domains)
+                    cancel_previous_prefetch()
+                    result = process_image(uploaded_file, domains, fused=fused, tiled=tiled)
                     st.session_state.analysis_result = result
         
         else:  # Text description
@@ -562,6 +844,7 @@ def main():
             # Analyze button
             if problem_description:
                 if st.button("Analyze Description", key="analyze_text"):
+                    cancel_previous_prefetch()
                     result = process_text(problem_description)
                     st.session_state.analysis_result = result
         
@@ -573,6 +856,8 @@ def main():
     
     with main_tab2:
         display_mentor_interface()
+    
+    display_debug_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,60 @@
+"""Compare wall-clock time of the 3-call image pipeline against fused mode.
+
+Usage:
+    python benchmarks/bench_fused_pipeline.py photo1.jpg photo2.jpg --repeat 3
+
+Runs against the live Gemini API with the response cache disabled so every
+iteration pays for real round trips.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from integrated_system import AILearningPlatform
+
+
+def time_pipeline(platform, image_path, fused):
+    start = time.perf_counter()
+    result = platform.process_image(image_path, fused=fused)
+    return time.perf_counter() - start, result.get('success', False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', nargs='+', help='Image files to analyze')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per image and mode')
+    args = parser.parse_args()
+
+    Config.CACHE_ENABLED = False
+    platform = AILearningPlatform()
+
+    timings = {False: [], True: []}
+    failures = {False: 0, True: 0}
+
+    for image_path in args.images:
+        for _ in range(args.repeat):
+            # Alternate modes so drift in API latency affects both equally
+            for fused in (False, True):
+                elapsed, ok = time_pipeline(platform, image_path, fused)
+                timings[fused].append(elapsed)
+                if not ok:
+                    failures[fused] += 1
+
+    print(f"\n{'mode':<10}{'runs':>6}{'failed':>8}{'mean s':>10}{'median s':>10}{'min s':>10}")
+    for fused, label in ((False, '3-call'), (True, 'fused')):
+        samples = timings[fused]
+        print(f"{label:<10}{len(samples):>6}{failures[fused]:>8}"
+              f"{statistics.mean(samples):>10.2f}{statistics.median(samples):>10.2f}"
+              f"{min(samples):>10.2f}")
+
+    speedup = statistics.median(timings[False]) / statistics.median(timings[True])
+    print(f"\nMedian speedup of fused mode: {speedup:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Query speed of the multi-index perceptual-hash table against a linear scan.
+
+Usage:
+    python benchmarks/bench_image_hash_index.py [--sizes 1000 10000 100000] [--queries 200]
+
+Builds indexes of random 64-bit hashes, with a tenth of them near-duplicates
+of earlier ones like photo bursts, then times near-duplicate lookups at the
+configured Hamming distance and checks both methods return the same matches.
+No API calls are made.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from perceptual_hash import HASH_BITS, MultiIndexHash, hamming_distance
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(HASH_BITS), count):
+        value ^= 1 << bit
+    return value
+
+
+def make_hashes(size, max_distance, rng):
+    hashes = []
+    for _ in range(size):
+        if hashes and rng.random() < 0.1:
+            hashes.append(flip_bits(rng.choice(hashes), rng.randint(1, max_distance), rng))
+        else:
+            hashes.append(rng.getrandbits(HASH_BITS))
+    return hashes
+
+
+def linear_search(hashes, query, max_distance):
+    return [index for index, value in enumerate(hashes) if hamming_distance(value, query) <= max_distance]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--distance', type=int, default=Config.IMAGE_DEDUP_MAX_DISTANCE)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"Max distance: {args.distance}")
+    print(f"{'images':>8}{'build s':>10}{'linear ms':>12}{'indexed ms':>12}{'speedup':>10}")
+
+    for size in args.sizes:
+        hashes = make_hashes(size, args.distance, rng)
+
+        start = time.perf_counter()
+        index = MultiIndexHash()
+        for position, value in enumerate(hashes):
+            index.add(value, position)
+        build = time.perf_counter() - start
+
+        # Half the queries are fresh photos, half are retakes of indexed ones
+        queries = [
+            flip_bits(rng.choice(hashes), rng.randint(0, args.distance), rng) if i % 2
+            else rng.getrandbits(HASH_BITS)
+            for i in range(args.queries)
+        ]
+
+        start = time.perf_counter()
+        expected = [linear_search(hashes, query, args.distance) for query in queries]
+        linear = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        found = [index.search(query, args.distance) for query in queries]
+        indexed = (time.perf_counter() - start) / len(queries)
+
+        for want, got in zip(expected, found):
+            if sorted(want) != sorted(position for _, position in got):
+                print(f"Index and linear scan disagree at {size} images")
+                sys.exit(1)
+
+        print(f"{size:>8}{build:>10.2f}{linear * 1e3:>12.3f}{indexed * 1e3:>12.3f}"
+              f"{linear / indexed:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
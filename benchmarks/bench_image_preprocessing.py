@@ -0,0 +1,102 @@
+"""How request size and vision latency change with the max long edge sent to Gemini.
+
+Usage:
+    python benchmarks/bench_image_preprocessing.py [photo.jpg ...] [--edges 512 1024 1536 0]
+    python benchmarks/bench_image_preprocessing.py photo.jpg --live --repeat 3
+
+For every long edge (0 means the original upload), reports preprocessing time
+and the bytes that would be sent. Without image arguments a synthetic 12 MP
+photo-like JPEG is used. With --live each variant is also sent to the vision
+model with the response cache disabled and the median detect_issues latency
+is reported.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from config import Config
+from image_preprocessing import ImagePreprocessor
+
+
+def synthetic_photo(width=4000, height=3000):
+    """Noisy gradients compress roughly like a phone photo"""
+    channels = [
+        Image.linear_gradient('L').resize((width, height)),
+        Image.effect_noise((width, height), 48),
+        Image.radial_gradient('L').resize((width, height))
+    ]
+    buffer = io.BytesIO()
+    Image.merge('RGB', channels).save(buffer, format='JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def time_preprocessing(data, long_edge, repeat):
+    if long_edge == 0:
+        return 0.0, len(data), Image.open(io.BytesIO(data)).size
+
+    preprocessor = ImagePreprocessor(max_long_edge=long_edge)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, report = preprocessor.process(data)
+        best = min(best, time.perf_counter() - start)
+    return best, report['sent_bytes'], report['sent_size']
+
+
+def time_detection(data, long_edge, repeat):
+    from vision_detector import CommunityIssueDetector
+
+    detector = CommunityIssueDetector(preprocess=long_edge != 0)
+    if detector.preprocessor is not None:
+        detector.preprocessor = ImagePreprocessor(max_long_edge=long_edge)
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = detector.detect_issues(data)
+        samples.append(time.perf_counter() - start)
+        if not result['success']:
+            print(f"  detect_issues failed at edge {long_edge}: {result['error']}")
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', nargs='*', help='Image files (default: synthetic 12 MP photo)')
+    parser.add_argument('--edges', type=int, nargs='+', default=[512, 768, 1024, 1536, 2048, 0],
+                        help='Max long edges in pixels; 0 sends the original')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--live', action='store_true', help='Also time real vision calls')
+    args = parser.parse_args()
+
+    if args.live:
+        Config.CACHE_ENABLED = False
+
+    sources = [(path, open(path, 'rb').read()) for path in args.images]
+    if not sources:
+        sources = [('synthetic 4000x3000', synthetic_photo())]
+
+    for name, data in sources:
+        print(f"\n{name}: {len(data) / 1024:.0f} KB")
+        header = f"{'long edge':>10}{'sent size':>14}{'KB sent':>10}{'saved':>8}{'prep ms':>10}"
+        print(header + (f"{'detect s':>10}" if args.live else ''))
+
+        for long_edge in args.edges:
+            prep_seconds, sent_bytes, size = time_preprocessing(data, long_edge, args.repeat)
+            line = (f"{long_edge or 'original':>10}{f'{size[0]}x{size[1]}':>14}"
+                    f"{sent_bytes / 1024:>10.0f}{1 - sent_bytes / len(data):>8.0%}"
+                    f"{prep_seconds * 1e3:>10.1f}")
+            if args.live:
+                line += f"{time_detection(data, long_edge, args.repeat):>10.2f}"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""Latency, throughput, CPU and memory of every pipeline against a simulated backend.
+
+Usage:
+    python benchmarks/bench_pipelines.py [--scenarios text image ...] [--requests 40]
+        [--concurrency 8] [--latency-ms 400] [--jitter-ms 150] [--error-rate 0]
+        [--output results.json] [--compare baseline.json] [--tolerance 0.1]
+
+Every model call goes to the offline fake backend behind the fault injector,
+so runs are repeatable, free and need no API key. Each scenario sends its
+requests through a thread pool and reports p50/p95/p99 latency, requests/s,
+process CPU time per request, per-stage wall and CPU time for the staged
+pipelines, peak RSS and, from a separate traced pass, allocated memory.
+
+Results are written as JSON, by default to .cache/benchmarks/ where git
+ignores them. With --compare the run is checked against an
+earlier results file and the script exits with status 1 when any scenario's
+p95 latency, requests/s or CPU time regressed by more than the tolerance.
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import platform as platform_info
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from PIL import Image
+
+from config import Config
+from gemini_client import set_backend
+from model_backends import FakeBackend, FaultInjectingBackend
+
+PROBLEMS = [
+    "Plastic bottles and food waste pile up along the river bank every weekend",
+    "The village clinic has one nurse for hundreds of patients and no gloves",
+    "Our school roof leaks and thirty pupils share five textbooks",
+    "Storm drains on the main road are blocked and the street floods when it rains",
+    "People burn household rubbish next to the playground",
+    "The health post has no clean water and patients wait outside in the sun",
+]
+
+
+def synthetic_photo(index, size=(1600, 1200)):
+    """A distinct JPEG per request so neither the response cache nor dedup can short-circuit"""
+    tint = Image.new('RGB', size, ((index * 37) % 256, (index * 91) % 256, (index * 53) % 256))
+    noise = Image.effect_noise(size, 40).convert('RGB')
+    buffer = io.BytesIO()
+    Image.blend(tint, noise, 0.4).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def problem(index):
+    return f"{PROBLEMS[index % len(PROBLEMS)]} (report {index})"
+
+
+def build_scenarios(args):
+    """Map scenario name to a function performing request number i"""
+    from ai_mentor import AIMentor
+    from integrated_system import AILearningPlatform
+
+    platform = AILearningPlatform()
+    mentor = AIMentor()
+    photo_count = args.requests + args.warmup + 2
+    photos = [synthetic_photo(index) for index in range(photo_count)]
+    large_photos = [synthetic_photo(index, (3200, 2400)) for index in range(4)]
+
+    def batch(items, index):
+        return [items[(index * args.batch_size + offset) % len(items)]
+                for offset in range(args.batch_size)]
+
+    return {
+        'text': lambda i: platform.process_text_description(problem(i)),
+        'image': lambda i: platform.process_image(photos[i % photo_count]),
+        'image_fused': lambda i: platform.process_image(photos[i % photo_count], fused=True),
+        'image_tiled': lambda i: platform.process_image(large_photos[i % len(large_photos)],
+                                                        tiled=True),
+        'batch_classify': lambda i: platform.problem_classifier.classify_batch(
+            [problem(i * args.batch_size + offset) for offset in range(args.batch_size)]
+        ),
+        'batch_classify_packed': lambda i: platform.problem_classifier.classify_batch(
+            [problem(i * args.batch_size + offset) for offset in range(args.batch_size)],
+            packed=True
+        ),
+        'batch_missions': lambda i: platform.mission_generator.generate_batch_missions(
+            [problem(i * args.batch_size + offset) for offset in range(args.batch_size)]
+        ),
+        'batch_images': lambda i: platform.process_multiple_images(batch(photos, i)),
+        'batch_images_packed': lambda i: platform.process_multiple_images(batch(photos, i),
+                                                                          packed=True),
+        'mentor_critical': lambda i: mentor.critical_thinking_mode(problem(i)),
+        'mentor_solution': lambda i: mentor.solution_mode(problem(i)),
+        # Chat history belongs to one visitor, so each simulated visitor gets a mentor
+        'mentor_chat': lambda i: AIMentor().interactive_mentoring(problem(i)),
+        'mentor_stream': lambda i: consume_stream(mentor.critical_thinking_stream(problem(i))),
+    }
+
+
+def consume_stream(stream):
+    for _ in stream:
+        pass
+    return stream.result
+
+
+def succeeded(result):
+    if isinstance(result, list):
+        return all(item.get('success') for item in result)
+    return bool(result.get('success'))
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of sorted samples"""
+    if not samples:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(samples)))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(func, requests, concurrency, warmup):
+    for index in range(warmup):
+        func(-1 - index)
+
+    def timed(index):
+        start = time.perf_counter()
+        try:
+            result = func(index)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        return time.perf_counter() - start, result
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, range(requests)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    stages = defaultdict(lambda: {'runs': 0, 'seconds': 0.0, 'cpu_seconds': 0.0})
+    for _, result in outcomes:
+        for item in result if isinstance(result, list) else [result]:
+            for name, timing in ((item.get('timings') or {}).get('stages') or {}).items():
+                stages[name]['runs'] += 1
+                stages[name]['seconds'] += timing['seconds']
+                stages[name]['cpu_seconds'] += timing.get('cpu_seconds', 0.0)
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'failures': sum(1 for _, result in outcomes if not succeeded(result)),
+        'wall_seconds': wall,
+        'requests_per_second': requests / wall if wall else 0.0,
+        'latency_ms': {
+            'mean': sum(latencies) / len(latencies) * 1e3,
+            'p50': percentile(latencies, 0.50) * 1e3,
+            'p95': percentile(latencies, 0.95) * 1e3,
+            'p99': percentile(latencies, 0.99) * 1e3,
+            'max': latencies[-1] * 1e3
+        },
+        'cpu_ms_per_request': cpu / requests * 1e3,
+        'stages': {
+            name: {
+                'mean_ms': totals['seconds'] / totals['runs'] * 1e3,
+                'mean_cpu_ms': totals['cpu_seconds'] / totals['runs'] * 1e3
+            }
+            for name, totals in stages.items()
+        },
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def measure_allocations(func, requests):
+    """Traced sequential pass, kept apart because tracemalloc slows everything down"""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for index in range(requests):
+            func(10_000 + index)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'traced_requests': requests,
+        'peak_kb': (peak - before) / 1024,
+        'retained_kb': (after - before) / 1024
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print changes against a baseline run; return the scenarios that regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\nAgainst {baseline_path} (revision {baseline['meta'].get('revision')}):")
+    print(f"{'scenario':<24}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>10}{'cpu':>10}")
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+
+        def change(key, *path):
+            old, new = previous, current
+            for part in (key,) + path:
+                old, new = old[part], new[part]
+            return (new - old) / old if old else 0.0
+
+        changes = {
+            'p50': change('latency_ms', 'p50'),
+            'p95': change('latency_ms', 'p95'),
+            'p99': change('latency_ms', 'p99'),
+            'rps': change('requests_per_second'),
+            'cpu': change('cpu_ms_per_request')
+        }
+        regressed = (changes['p95'] > tolerance or changes['rps'] < -tolerance
+                     or changes['cpu'] > tolerance)
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<24}" + ''.join(f"{value:>+10.1%}" for value in changes.values())
+              + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', help='Default: all')
+    parser.add_argument('--requests', type=int, default=40, help='Measured requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=6, help='Items per batch request')
+    parser.add_argument('--alloc-requests', type=int, default=3,
+                        help='Requests in the traced allocation pass; 0 skips it')
+    parser.add_argument('--latency-ms', type=float, default=400)
+    parser.add_argument('--jitter-ms', type=float, default=150, help='Mean of the exponential tail')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='.cache/benchmarks/pipelines.json')
+    parser.add_argument('--compare', help='Earlier results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Allowed relative slowdown before a change counts as a regression')
+    args = parser.parse_args()
+
+    # Keep every on-disk store out of the working tree and start each run cold
+    scratch = tempfile.mkdtemp(prefix='bench_pipelines_')
+    Config.CACHE_ENABLED = False
+    Config.IMAGE_DEDUP_ENABLED = False
+    Config.MENTOR_PREFETCH_ENABLED = False
+    Config.FAST_CLASSIFIER_LABELS_PATH = os.path.join(scratch, 'labels.jsonl')
+    Config.IMAGE_HASH_DB_PATH = os.path.join(scratch, 'hashes.sqlite3')
+    Config.MODEL_BACKEND = 'fake'
+
+    backend = FaultInjectingBackend(FakeBackend(seed=args.seed), latency_ms=args.latency_ms,
+                                    jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                                    seed=args.seed)
+    set_backend(backend)
+
+    # Injected failures are logged as warnings, which would swamp the report
+    logging.getLogger().setLevel(logging.ERROR)
+
+    scenarios = build_scenarios(args)
+    names = args.scenarios or list(scenarios)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(scenarios)})")
+
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform_info.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args)
+        },
+        'scenarios': {}
+    }
+
+    print(f"{'scenario':<24}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'cpu ms':>9}{'failed':>8}{'rss MB':>8}{'alloc KB':>10}")
+    for name in names:
+        stats = run_scenario(scenarios[name], args.requests, args.concurrency, args.warmup)
+        if args.alloc_requests:
+            stats['allocations'] = measure_allocations(scenarios[name], args.alloc_requests)
+        results['scenarios'][name] = stats
+
+        latency = stats['latency_ms']
+        alloc = stats.get('allocations', {}).get('peak_kb')
+        print(f"{name:<24}{stats['requests_per_second']:>8.2f}{latency['p50']:>9.0f}"
+              f"{latency['p95']:>9.0f}{latency['p99']:>9.0f}{stats['cpu_ms_per_request']:>9.1f}"
+              f"{stats['failures']:>8}{stats['peak_rss_mb'] or 0:>8.0f}"
+              f"{alloc if alloc is not None else 0:>10.0f}")
+        for stage, timing in stats['stages'].items():
+            print(f"  {stage:<22}{'':>8}{timing['mean_ms']:>9.0f}{'':>18}{timing['mean_cpu_ms']:>9.1f}")
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\nRegressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
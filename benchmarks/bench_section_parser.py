@@ -0,0 +1,92 @@
+"""Micro-benchmark of response section parsing on large synthetic responses.
+
+Usage:
+    python benchmarks/bench_section_parser.py [--sizes 10 25 50 100] [--repeat 20]
+
+Times the single-pass SectionParser used by the mission generator and mentor
+against the previous find()-per-header implementation, on mission-style
+responses padded to the requested sizes in KB. No API calls are made.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mission_generator import MISSION_SECTIONS
+
+
+def legacy_parse(response, sections):
+    """The pre-SectionParser algorithm: rescan the text for every other header"""
+    parsed = {}
+    for key, headers in sections.items():
+        for header in headers:
+            if header in response:
+                start_idx = response.find(header) + len(header)
+                remaining = response[start_idx:]
+                next_header_idx = len(remaining)
+                for other_key, other_headers in sections.items():
+                    if other_key != key:
+                        for other_header in other_headers:
+                            idx = remaining.find(other_header)
+                            if idx != -1 and idx < next_header_idx:
+                                next_header_idx = idx
+                parsed[key] = remaining[:next_header_idx].strip()
+                break
+    return parsed
+
+
+def synthetic_response(size_kb, rng):
+    words = ['community', 'drainage', 'clinic', 'students', 'waste', 'volunteers',
+             'budget', 'impact', 'school', 'health', 'measure', 'improve']
+    headers = ['MISSION STATEMENT:', 'PROBLEM DEFINITION:', 'GOAL:',
+               'EXPECTED IMPACT:', 'ACTION STEPS:']
+    target = size_kb * 1024
+    per_section = target // len(headers)
+
+    parts = []
+    for header in headers:
+        body = []
+        length = 0
+        while length < per_section:
+            line = ' '.join(rng.choice(words) for _ in range(12))
+            body.append(f"- {line}" if header == 'ACTION STEPS:' else line)
+            length += len(line) + 1
+        parts.append(header + '\n' + '\n'.join(body))
+    return '\n\n'.join(parts)
+
+
+def time_call(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 25, 50, 100],
+                        help='Response sizes in KB')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'size KB':>8}{'legacy ms':>12}{'single-pass ms':>16}{'speedup':>10}")
+    for size_kb in args.sizes:
+        response = synthetic_response(size_kb, rng)
+
+        if legacy_parse(response, MISSION_SECTIONS.sections) != MISSION_SECTIONS.parse(response):
+            print(f"Parsers disagree on the {size_kb} KB response")
+            sys.exit(1)
+
+        legacy = time_call(lambda: legacy_parse(response, MISSION_SECTIONS.sections), args.repeat)
+        single = time_call(lambda: MISSION_SECTIONS.parse(response), args.repeat)
+        print(f"{size_kb:>8}{legacy * 1e3:>12.3f}{single * 1e3:>16.3f}{legacy / single:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Per-session start-up time and memory of the platform and mentor objects.
+
+Usage:
+    python benchmarks/bench_session_startup.py [--sessions 20]
+
+Compares what each new Streamlit session used to pay, building its own
+AILearningPlatform and AIMentor with fresh Gemini clients, against the
+shared setup where the platform is a cached resource and every class draws
+its client from the process-wide registry. Only object construction is
+measured; no API calls are made.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Constructing clients needs a key but never contacts the API
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark-placeholder')
+
+from ai_mentor import AIMentor
+from gemini_client import clear_clients
+from integrated_system import AILearningPlatform
+
+
+def per_session_objects():
+    clear_clients()
+    return AILearningPlatform(), AIMentor()
+
+
+def shared_objects(platform):
+    return platform, AIMentor()
+
+
+def measure(build, sessions):
+    """Return (mean seconds per session, bytes retained per session)"""
+    kept = []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for _ in range(sessions):
+        kept.append(build())
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return elapsed / sessions, retained / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    args = parser.parse_args()
+
+    # Warm imports and module-level state so both runs start equal
+    per_session_objects()
+    clear_clients()
+
+    before_time, before_bytes = measure(per_session_objects, args.sessions)
+
+    clear_clients()
+    platform = AILearningPlatform()
+    after_time, after_bytes = measure(lambda: shared_objects(platform), args.sessions)
+
+    print(f"Sessions: {args.sessions}")
+    print(f"{'':>22}{'ms/session':>12}{'KB/session':>12}")
+    print(f"{'per-session objects':>22}{before_time * 1e3:>12.2f}{before_bytes / 1024:>12.1f}")
+    print(f"{'shared platform':>22}{after_time * 1e3:>12.2f}{after_bytes / 1024:>12.1f}")
+    print(f"Start-up speedup: {before_time / after_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
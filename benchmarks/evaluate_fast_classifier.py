@@ -0,0 +1,82 @@
+"""Offline accuracy of the local fast-path classifier against recorded LLM labels.
+
+Usage:
+    python benchmarks/evaluate_fast_classifier.py [--labels .cache/classifier_labels.jsonl]
+
+Uses the JSONL labels that ProblemClassifier records from confident Gemini
+answers (one {"text": ..., "category": ...} per line). Each fold trains on
+the seed phrases plus the remaining labels, then reports agreement with the
+LLM, coverage and accuracy at several confidence thresholds, and latency.
+No API calls are made.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from fast_classifier import FastProblemClassifier, LabelStore, seed_examples
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95)
+
+
+def evaluate(labels, folds, seed):
+    categories = Config.CATEGORIES
+    seeds = seed_examples(categories)
+    labels = [example for example in labels if example[1] in categories]
+    random.Random(seed).shuffle(labels)
+
+    predictions = []
+    latencies = []
+    for fold in range(folds):
+        test = labels[fold::folds]
+        train = seeds + [example for index, example in enumerate(labels) if index % folds != fold]
+
+        model = FastProblemClassifier(categories)
+        model.fit([text for text, _ in train], [label for _, label in train])
+
+        for text, expected in test:
+            start = time.perf_counter()
+            predicted, probability = model.predict(text)
+            latencies.append(time.perf_counter() - start)
+            predictions.append((predicted == expected, probability))
+
+    return predictions, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--labels', default=Config.FAST_CLASSIFIER_LABELS_PATH,
+                        help='JSONL file of LLM labels')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    labels = LabelStore(args.labels).load()
+    if len(labels) < args.folds:
+        print(f"Need at least {args.folds} labelled examples in {args.labels}, found {len(labels)}.")
+        print("Run some classifications with the fast path enabled to collect LLM labels.")
+        return
+
+    predictions, latencies = evaluate(labels, args.folds, args.seed)
+    total = len(predictions)
+    overall = sum(correct for correct, _ in predictions) / total
+
+    print(f"Examples: {total}  Folds: {args.folds}")
+    print(f"Agreement with LLM (all items): {overall:.1%}")
+    print(f"Mean prediction latency: {sum(latencies) / total * 1e6:.1f} us\n")
+
+    print(f"{'threshold':>10}{'coverage':>10}{'accuracy':>10}")
+    for threshold in THRESHOLDS:
+        covered = [correct for correct, probability in predictions if probability >= threshold]
+        coverage = len(covered) / total
+        accuracy = sum(covered) / len(covered) if covered else float('nan')
+        marker = '  <- configured' if threshold == Config.FAST_CLASSIFIER_THRESHOLD else ''
+        print(f"{threshold:>10.2f}{coverage:>10.1%}{accuracy:>10.1%}{marker}")
+
+
+if __name__ == '__main__':
+    main()
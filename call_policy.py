@@ -0,0 +1,481 @@
+import asyncio
+import contextvars
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from queue import Empty, Queue
+from typing import Callable, Dict, Iterator, Optional
+from config import Config
+from telemetry import registry
+
+# HTTP statuses worth another attempt: timeouts, rate limits and server-side failures
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Observed latencies needed before a p95 hedge delay is trusted
+HEDGE_MIN_SAMPLES = 20
+
+registry.describe('model_retries_total', 'Model call attempts repeated after a retryable error')
+registry.describe('model_hedges_total', 'Duplicate requests sent after the hedge delay, by winner')
+registry.describe('model_circuit_rejections_total', 'Calls failed fast by an open circuit breaker')
+registry.describe('model_abandoned_calls_total',
+                  'Requests given up on while still running: hedge losers and missed deadlines')
+
+
+class CallTimeoutError(TimeoutError):
+    """A model call attempt ran past its deadline"""
+
+
+class CircuitOpenError(RuntimeError):
+    """A task's circuit breaker is open, so calls fail without reaching the API"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection failures and 408/429/5xx responses; everything else is final"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # google.api_core errors carry the HTTP status as code; others lead with it in the message
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    match = re.match(r'\s*(\d{3})\b', str(error))
+    return match is not None and int(match.group(1)) in RETRYABLE_STATUS
+
+
+class CallStats:
+    """How a single call went, filled in even when it fails"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.hedged = False
+
+
+class CircuitBreaker:
+    """Opens after consecutive retryable failures and lets one trial call through after a pause"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def check(self, task: str):
+        """Raise CircuitOpenError unless a call may go ahead"""
+        with self._lock:
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            wait_seconds = max(0.0, self.reset_seconds - (self._clock() - self.opened_at))
+
+        registry.inc('model_circuit_rejections_total', {'task': task})
+        raise CircuitOpenError(
+            f"Model service unavailable for {task} after repeated failures; "
+            f"retrying in {wait_seconds:.0f}s"
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+            self._trial_running = False
+
+    def release(self):
+        """End a trial call whose outcome says nothing about the service"""
+        with self._lock:
+            self._trial_running = False
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _submit(func: Callable, *args, **kwargs) -> Future:
+    """Run func on the shared model-call pool, keeping the caller's stage and trace"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.CALL_POLICY_MAX_WORKERS,
+                                           thread_name_prefix='model-call')
+    context = contextvars.copy_context()
+    return _executor.submit(context.run, func, *args, **kwargs)
+
+
+class CallPolicy:
+    """Deadlines, retries, hedging and circuit breaking for one task's model calls
+
+    All attempts together get deadline seconds. With pass_timeout, each request
+    is also told to give up after timeout seconds, so the API call itself ends
+    when its attempt does. A request that has not answered is never repeated:
+    the policy keeps waiting on it until the deadline, and only errors that
+    came back are retried, with full-jitter exponential backoff. With
+    hedge_after set, a duplicate request is sent when an attempt has not
+    answered after that many seconds ('p95' uses the task's observed p95
+    latency) and whichever answers first wins. Requests still running when the
+    policy gives up on them are counted as abandoned.
+    """
+
+    def __init__(self, task: str, timeout: Optional[float] = None,
+                 deadline: Optional[float] = None, max_attempts: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, hedge_after=None,
+                 breaker_failures: int = 5, breaker_reset: float = 30.0,
+                 sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic, seed: Optional[int] = None):
+        self.task = task
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset, clock)
+        self.abandoned = 0
+        self._latencies = deque(maxlen=200)
+        self._sleep = sleep
+        self._clock = clock
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedge_after != 'p95':
+            return self.hedge_after
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _remaining(self, started: float) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - (self._clock() - started)
+
+    def _attempt_timeout(self, started: float) -> Optional[float]:
+        remaining = self._remaining(started)
+        if remaining is None:
+            return self.timeout
+        return remaining if self.timeout is None else min(self.timeout, remaining)
+
+    def _backoff(self, attempt: int, started: float) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None when no attempt is left"""
+        if attempt >= self.max_attempts:
+            return None
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        with self._lock:
+            delay = self._rng.uniform(0, ceiling)
+        if self.deadline is not None and self._clock() - started + delay >= self.deadline:
+            return None
+        return delay
+
+    def _succeeded(self, seconds: float):
+        self.breaker.record_success()
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _failed(self, error: Exception) -> bool:
+        """Update the breaker; True when the error is worth another attempt"""
+        if is_retryable(error):
+            self.breaker.record_failure()
+            return True
+        self.breaker.release()
+        return False
+
+    def _abandon(self, futures):
+        """Drop requests not yet sent and count those left running"""
+        left_running = sum(1 for future in futures if not future.cancel())
+        if left_running:
+            with self._lock:
+                self.abandoned += left_running
+            registry.inc('model_abandoned_calls_total', {'task': self.task}, left_running)
+
+    def _kwargs(self, started: float, pass_timeout: bool) -> Dict:
+        timeout = self._attempt_timeout(started)
+        if timeout is not None and timeout <= 0:
+            raise CallTimeoutError(f"{self.task} call deadline exceeded")
+        return {'timeout': timeout} if pass_timeout and timeout is not None else {}
+
+    def call(self, func: Callable, *args, stats: Optional[CallStats] = None,
+             pass_timeout: bool = False):
+        """Call func(*args) under this policy; with pass_timeout func also gets timeout="""
+        stats = stats or CallStats()
+        started = self._clock()
+        while True:
+            self.breaker.check(self.task)
+            stats.attempts += 1
+            attempt_started = self._clock()
+            try:
+                result = self._attempt(func, args, started, stats, pass_timeout)
+            except Exception as e:
+                delay = self._backoff(stats.attempts, started) if self._failed(e) else None
+                if delay is None:
+                    raise
+                registry.inc('model_retries_total', {'task': self.task})
+                self._sleep(delay)
+                continue
+            self._succeeded(self._clock() - attempt_started)
+            return result
+
+    def _attempt(self, func: Callable, args, started: float, stats: CallStats,
+                 pass_timeout: bool):
+        kwargs = self._kwargs(started, pass_timeout)
+        hedge_after = self._hedge_delay()
+        if self.deadline is None and hedge_after is None:
+            return func(*args, **kwargs)
+
+        attempt_started = self._clock()
+        original = _submit(func, *args, **kwargs)
+        running = [original]
+        errors = []
+        hedged = False
+        try:
+            while running:
+                remaining = self._remaining(started)
+                elapsed = self._clock() - attempt_started
+                waits = []
+                if remaining is not None:
+                    waits.append(max(0.0, remaining))
+                if hedge_after is not None and not hedged:
+                    waits.append(max(0.0, hedge_after - elapsed))
+                done, _ = wait(running, timeout=min(waits) if waits else None,
+                               return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    running.remove(future)
+                    if future.exception() is None:
+                        if hedged:
+                            winner = 'original' if future is original else 'hedge'
+                            registry.inc('model_hedges_total',
+                                         {'task': self.task, 'winner': winner})
+                        return future.result()
+                    errors.append(future.exception())
+
+                remaining = self._remaining(started)
+                if running and remaining is not None and remaining <= 0:
+                    raise CallTimeoutError(
+                        f"{self.task} call deadline of {self.deadline:.1f}s exceeded"
+                    )
+                # A failure is left to the retry loop; only a slow answer is hedged
+                elapsed = self._clock() - attempt_started
+                if not done and hedge_after is not None and not hedged and elapsed >= hedge_after:
+                    hedged = stats.hedged = True
+                    running.append(_submit(func, *args, **self._kwargs(started, pass_timeout)))
+            raise errors[0]
+        finally:
+            self._abandon(running)
+
+    async def call_async(self, func: Callable, *args, stats: Optional[CallStats] = None,
+                         pass_timeout: bool = False):
+        """Await func(*args) under this policy; with pass_timeout func also gets timeout="""
+        stats = stats or CallStats()
+        started = self._clock()
+        while True:
+            self.breaker.check(self.task)
+            stats.attempts += 1
+            attempt_started = self._clock()
+            try:
+                result = await self._attempt_async(func, args, started, stats, pass_timeout)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                delay = self._backoff(stats.attempts, started) if self._failed(e) else None
+                if delay is None:
+                    raise
+                registry.inc('model_retries_total', {'task': self.task})
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded(self._clock() - attempt_started)
+            return result
+
+    async def _attempt_async(self, func: Callable, args, started: float, stats: CallStats,
+                             pass_timeout: bool):
+        # Unlike threads, coroutines can be cancelled, so a timed-out attempt
+        # is stopped before the next one starts and never runs alongside it
+        timeout = self._attempt_timeout(started)
+        kwargs = self._kwargs(started, pass_timeout)
+        hedge_after = self._hedge_delay()
+
+        attempt_started = self._clock()
+        original = asyncio.ensure_future(func(*args, **kwargs))
+        running = {original}
+        errors = []
+        hedged = False
+        try:
+            while running:
+                elapsed = self._clock() - attempt_started
+                waits = []
+                if timeout is not None:
+                    waits.append(max(0.0, timeout - elapsed))
+                if hedge_after is not None and not hedged:
+                    waits.append(max(0.0, hedge_after - elapsed))
+                done, running = await asyncio.wait(running, timeout=min(waits) if waits else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        if hedged:
+                            winner = 'original' if task is original else 'hedge'
+                            registry.inc('model_hedges_total', {'task': self.task, 'winner': winner})
+                        return task.result()
+                    errors.append(task.exception())
+
+                elapsed = self._clock() - attempt_started
+                if running and timeout is not None and elapsed >= timeout:
+                    raise CallTimeoutError(f"{self.task} call timed out after {timeout:.1f}s")
+                if not done and hedge_after is not None and not hedged and elapsed >= hedge_after:
+                    hedged = stats.hedged = True
+                    running.add(asyncio.ensure_future(
+                        func(*args, **self._kwargs(started, pass_timeout))
+                    ))
+            raise errors[0]
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stream(self, func: Callable, *args, stats: Optional[CallStats] = None,
+               pass_timeout: bool = False) -> Iterator[str]:
+        """Yield func(*args)'s chunks; retried only until the first chunk arrives
+
+        The first chunk is awaited until the deadline and every later chunk
+        for at most the per-attempt timeout. Streams are never hedged, since
+        both copies would be shown.
+        """
+        stats = stats or CallStats()
+        started = self._clock()
+        while True:
+            self.breaker.check(self.task)
+            stats.attempts += 1
+            attempt_started = self._clock()
+            chunks = self._stream_attempt(func, args, started, pass_timeout)
+            try:
+                first = next(chunks, None)
+            except Exception as e:
+                delay = self._backoff(stats.attempts, started) if self._failed(e) else None
+                if delay is None:
+                    raise
+                registry.inc('model_retries_total', {'task': self.task})
+                self._sleep(delay)
+                continue
+            break
+
+        self._succeeded(self._clock() - attempt_started)
+        if first is not None:
+            yield first
+            yield from chunks
+
+    def _stream_attempt(self, func: Callable, args, started: float,
+                        pass_timeout: bool) -> Iterator[str]:
+        kwargs = self._kwargs(started, pass_timeout)
+        if self.deadline is None and self.timeout is None:
+            yield from func(*args, **kwargs)
+            return
+
+        # A producer on the shared pool fills the queue so a stalled stream can be abandoned
+        queue = Queue()
+        stopped = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in func(*args, **kwargs):
+                    if stopped.is_set():
+                        return
+                    queue.put((chunk, None))
+                queue.put((done, None))
+            except Exception as e:
+                queue.put((None, e))
+
+        future = _submit(produce)
+        finished = False
+        first = True
+        try:
+            while True:
+                remaining = self._remaining(started)
+                limit = remaining if first and remaining is not None else self.timeout
+                try:
+                    chunk, error = queue.get(timeout=None if limit is None else max(0.0, limit))
+                except Empty:
+                    raise CallTimeoutError(
+                        f"{self.task} stream stalled for more than {limit:.1f}s"
+                    ) from None
+                if error is not None:
+                    finished = True
+                    raise error
+                if chunk is done:
+                    finished = True
+                    return
+                first = False
+                yield chunk
+        finally:
+            stopped.set()
+            if not finished:
+                self._abandon([future])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            samples = len(self._latencies)
+            abandoned = self.abandoned
+        return {
+            'task': self.task,
+            'breaker': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'hedge_delay': self._hedge_delay(),
+            'latency_samples': samples,
+            'abandoned': abandoned
+        }
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def policy_settings(task: str) -> Dict:
+    """Config.CALL_POLICIES['default'] overridden by the task's own entry"""
+    settings = {**Config.CALL_POLICIES['default'], **Config.CALL_POLICIES.get(task, {})}
+    if not Config.CALL_HEDGING_ENABLED:
+        settings['hedge_after'] = None
+    return settings
+
+
+def get_policy(task: str = 'default') -> CallPolicy:
+    """Return the process-wide policy for a task; its breaker is shared by every client"""
+    with _policies_lock:
+        policy = _policies.get(task)
+        if policy is None:
+            policy = CallPolicy(task, **policy_settings(task))
+            _policies[task] = policy
+        return policy
+
+
+def policy_stats():
+    with _policies_lock:
+        policies = list(_policies.values())
+    return [policy.stats() for policy in policies]
+
+
+def clear_policies():
+    """Drop all policies, resetting breakers and latency history"""
+    with _policies_lock:
+        _policies.clear()
@@ -0,0 +1,164 @@
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+from config import Config
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def _message(role: str, text: str) -> Dict:
+    return {'role': role, 'parts': [text]}
+
+
+class MentorChatSession:
+    """Multi-turn conversation with a bounded history and a rolling summary of older turns"""
+
+    def __init__(self, client, token_budget: Optional[int] = None,
+                 max_messages: Optional[int] = None):
+        self.client = client
+        self.token_budget = token_budget or Config.CHAT_TOKEN_BUDGET
+        self.max_messages = max_messages or Config.CHAT_MAX_HISTORY_MESSAGES
+        self.history = deque()
+        self.summary = ''
+        self.total_messages = 0
+        self.turn_stats = deque(maxlen=100)
+        self._full_history_tokens = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, user_message: str) -> List[Dict]:
+        """Fit the history into the token budget and return the contents to send"""
+        incoming_tokens = estimate_tokens(user_message)
+        while True:
+            with self._lock:
+                dropped, summary = self._overflow(incoming_tokens), self.summary
+                if not dropped:
+                    break
+
+            # Summarizing is a model call, so it runs without the lock; the
+            # result is applied only if no other turn changed the history meanwhile
+            new_summary = self._summarize(summary, dropped)
+            with self._lock:
+                if self.summary == summary and self._starts_with(dropped):
+                    for _ in dropped:
+                        self.history.popleft()
+                    self.summary = new_summary
+                    break
+
+        with self._lock:
+            contents = self._summary_messages() + list(self.history)
+        return contents + [_message('user', user_message)]
+
+    def record(self, user_message: str, reply: str, contents: List[Dict],
+               system_instruction: str = ''):
+        """Append a completed exchange and account for the tokens it sent"""
+        sent_tokens = estimate_tokens(system_instruction) + sum(
+            estimate_tokens(part) for message in contents for part in message['parts']
+        )
+
+        with self._lock:
+            # What re-sending the whole conversation verbatim would have cost
+            self._full_history_tokens += estimate_tokens(user_message)
+            full_tokens = estimate_tokens(system_instruction) + self._full_history_tokens
+            self._full_history_tokens += estimate_tokens(reply)
+
+            self.history.append(_message('user', user_message))
+            self.history.append(_message('model', reply))
+            self.total_messages += 2
+            self.turn_stats.append({
+                'turn': self.total_messages // 2,
+                'tokens_sent': sent_tokens,
+                'tokens_unbounded': full_tokens,
+                'history_messages': len(contents) - 1,
+                'summarized': bool(self.summary)
+            })
+
+    def reset(self):
+        with self._lock:
+            self.history.clear()
+            self.summary = ''
+            self.total_messages = 0
+            self.turn_stats.clear()
+            self._full_history_tokens = 0
+
+    def messages(self) -> List[Dict]:
+        """Kept history as {'role', 'content'} dicts, using 'mentor' for model turns"""
+        with self._lock:
+            return [
+                {'role': 'mentor' if message['role'] == 'model' else 'user',
+                 'content': message['parts'][0]}
+                for message in self.history
+            ]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sent = sum(turn['tokens_sent'] for turn in self.turn_stats)
+            unbounded = sum(turn['tokens_unbounded'] for turn in self.turn_stats)
+            return {
+                'turns': self.total_messages // 2,
+                'history_messages': len(self.history),
+                'has_summary': bool(self.summary),
+                'token_budget': self.token_budget,
+                'last_turn_tokens': self.turn_stats[-1]['tokens_sent'] if self.turn_stats else 0,
+                'tokens_sent': sent,
+                'tokens_unbounded': unbounded,
+                'tokens_saved': unbounded - sent,
+                'per_turn': list(self.turn_stats)
+            }
+
+    def _summary_messages(self) -> List[Dict]:
+        if not self.summary:
+            return []
+        return [
+            _message('user', f"Summary of our conversation so far:\n{self.summary}"),
+            _message('model', "Understood, I'll keep that context in mind.")
+        ]
+
+    def _history_tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(
+            estimate_tokens(message['parts'][0]) for message in self.history
+        )
+
+    def _overflow(self, incoming_tokens: int) -> List[Dict]:
+        """The oldest exchanges to fold into the summary so the next turn fits"""
+        history = list(self.history)
+        tokens = self._history_tokens()
+        count = 0
+        while count < len(history) and (
+            len(history) - count + 2 > self.max_messages
+            or tokens + incoming_tokens > self.token_budget
+        ):
+            # Drop whole user/model exchanges so roles keep alternating
+            for message in history[count:count + 2]:
+                tokens -= estimate_tokens(message['parts'][0])
+            count = min(count + 2, len(history))
+        return history[:count]
+
+    def _starts_with(self, messages: List[Dict]) -> bool:
+        return (len(self.history) >= len(messages)
+                and all(kept is message for kept, message in zip(self.history, messages)))
+
+    def _summarize(self, summary: str, dropped: List[Dict]) -> str:
+        transcript = '\n'.join(
+            f"{'Mentor' if message['role'] == 'model' else 'User'}: {message['parts'][0]}"
+            for message in dropped
+        )
+        prompt = f"""Update the running summary of a mentoring conversation.
+
+Current summary:
+{summary or '(none)'}
+
+Earlier messages to fold in:
+{transcript}
+
+Write the updated summary in at most {Config.CHAT_SUMMARY_WORDS} words. Keep the learner's
+problem, key ideas discussed, decisions made and open questions."""
+
+        try:
+            return self.client.generate(prompt).text.strip()
+        except Exception:
+            # Keep the most recent context rather than failing the user's turn
+            combined = f"{summary}\n{transcript}".strip()
+            return combined[-Config.CHAT_SUMMARY_WORDS * 6:]
@@ -0,0 +1,54 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from config import Config
+
+
+def run_concurrently(func: Callable[[Any], Dict], items: Sequence,
+                     max_workers: Optional[int] = None,
+                     on_result: Optional[Callable[[int, Dict], None]] = None,
+                     error_result: Optional[Callable[[Any, Exception], Dict]] = None) -> List[Dict]:
+    """Apply func to every item with at most max_workers calls in flight.
+
+    Results are returned in input order. An exception raised for one item is
+    turned into an error result instead of cancelling the rest, and on_result
+    is called with (index, result) as soon as each item finishes.
+    """
+    items = list(items)
+    max_workers = max_workers or Config.MAX_CONCURRENT_REQUESTS
+    error_result = error_result or _default_error_result
+    results = [None] * len(items)
+
+    def run_one(item):
+        try:
+            return func(item)
+        except Exception as e:
+            return error_result(item, e)
+
+    def finish(index, result):
+        results[index] = result
+        if on_result is not None:
+            on_result(index, result)
+
+    if max_workers <= 1 or len(items) <= 1:
+        for index, item in enumerate(items):
+            finish(index, run_one(item))
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        # Each item runs in a copy of the caller's context, keeping its request trace
+        futures = {
+            executor.submit(contextvars.copy_context().run, run_one, item): index
+            for index, item in enumerate(items)
+        }
+        for future in as_completed(futures):
+            finish(futures[future], future.result())
+
+    return results
+
+
+def _default_error_result(item, error: Exception) -> Dict:
+    return {
+        'success': False,
+        'error': str(error)
+    }
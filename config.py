@@ -48,9 +48,123 @@ class Config:
     # Image upload settings
     MAX_IMAGE_SIZE = 20 * 1024 * 1024  # 20MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'webm', 'mkv'}  # Needs opencv-python-headless
+    
+    # Image preprocessing before vision calls
+    IMAGE_PREPROCESS_ENABLED = os.getenv('IMAGE_PREPROCESS_ENABLED', 'true').lower() == 'true'
+    IMAGE_MAX_LONG_EDGE = int(os.getenv('IMAGE_MAX_LONG_EDGE', '1536'))  # Pixels
+    IMAGE_OUTPUT_FORMAT = os.getenv('IMAGE_OUTPUT_FORMAT', 'JPEG')  # JPEG or WEBP
+    IMAGE_QUALITY = 85
+    
+    # Near-duplicate image detection; the index is shared by every session, so it is opt-in
+    IMAGE_DEDUP_ENABLED = os.getenv('IMAGE_DEDUP_ENABLED', 'false').lower() == 'true'
+    IMAGE_HASH_METHOD = 'dhash'  # dhash or phash
+    IMAGE_DEDUP_MAX_DISTANCE = 6  # Hamming distance out of 64 bits
+    IMAGE_HASH_DB_PATH = '.cache/image_hashes.sqlite3'
+    
+    # Coarse-to-fine detection: a low-resolution pass first, full resolution only when needed
+    COARSE_TO_FINE_ENABLED = os.getenv('COARSE_TO_FINE_ENABLED', 'false').lower() == 'true'
+    COARSE_LONG_EDGE = int(os.getenv('COARSE_LONG_EDGE', '512'))  # Pixels
+    
+    # Tiled high-resolution analysis
+    TILE_SIZE = 1024  # Source pixels covered by one tile edge
+    TILE_OVERLAP = 0.2  # Fraction of a tile shared with its neighbour
+    TILED_MAX_TILES = 9  # Tiles grow until the grid fits under this cap
+    TILED_MAX_CONCURRENCY = 4
+    
+    # Keyframe sampling for videos and animated images
+    KEYFRAME_SAMPLE_FPS = 2.0  # Frames scored per second of footage
+    KEYFRAME_SCENE_THRESHOLD = 0.12  # Mean absolute difference from the last keyframe, 0-1
+    KEYFRAME_MAX = 8  # Vision calls per video
+    
+    # Model backend: gemini (live), fake (offline), record (live, saved to disk) or replay
+    MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'gemini')
+    BACKEND_RECORDING_PATH = os.getenv('BACKEND_RECORDING_PATH', '.cache/recorded_responses.jsonl')
+    BACKEND_SEED = int(os.getenv('BACKEND_SEED', '0'))
+    # Fault injection in front of any backend
+    BACKEND_LATENCY_MS = float(os.getenv('BACKEND_LATENCY_MS', '0'))
+    BACKEND_JITTER_MS = float(os.getenv('BACKEND_JITTER_MS', '0'))  # Mean of the exponential tail
+    BACKEND_ERROR_RATE = float(os.getenv('BACKEND_ERROR_RATE', '0'))  # 0-1
+    
+    # Response cache settings
+    CACHE_ENABLED = os.getenv('GEMINI_CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_DB_PATH = os.getenv('GEMINI_CACHE_PATH', '.cache/gemini_responses.sqlite3')
+    CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # 1 week
+    CACHE_MEMORY_ENTRIES = 256
+    CACHE_DISK_MAX_BYTES = 200 * 1024 * 1024  # 200MB
+    
+    # Batch processing settings
+    MAX_CONCURRENT_REQUESTS = int(os.getenv('GEMINI_MAX_CONCURRENT_REQUESTS', '8'))
+    
+    # Pipeline settings: draft the mission from a local category guess while classification runs
+    SPECULATIVE_MISSION = os.getenv('SPECULATIVE_MISSION', 'false').lower() == 'true'
+    
+    # Local fast-path classifier settings
+    FAST_CLASSIFIER_ENABLED = os.getenv('FAST_CLASSIFIER_ENABLED', 'true').lower() == 'true'
+    FAST_CLASSIFIER_THRESHOLD = float(os.getenv('FAST_CLASSIFIER_THRESHOLD', '0.85'))
+    FAST_CLASSIFIER_LABELS_PATH = '.cache/classifier_labels.jsonl'
+    FAST_CLASSIFIER_MAX_LABELS = 5000  # Most recent LLM labels kept for training
+    
+    # Packed batch classification settings
+    PACKED_PROMPT_TOKEN_BUDGET = 4000  # Estimated input tokens per packed request
+    PACKED_MAX_ITEMS = 40  # Bounds the response length of a single pack
+    PACKED_MAX_RETRIES = 2
+    PACKED_MAX_IMAGES = 6  # Images per packed vision request
+    PACKED_IMAGE_BYTE_BUDGET = 8 * 1024 * 1024  # Inline image bytes per packed request
+    
+    # Request schema-constrained JSON and fall back to header parsing only on failure
+    STRUCTURED_OUTPUT = os.getenv('GEMINI_STRUCTURED_OUTPUT', 'true').lower() == 'true'
+    
+    # Background mentor prefetch after an analysis
+    MENTOR_PREFETCH_ENABLED = os.getenv('MENTOR_PREFETCH_ENABLED', 'false').lower() == 'true'
+    # API calls per session
+    MENTOR_PREFETCH_BUDGET_PER_HOUR = int(os.getenv('MENTOR_PREFETCH_BUDGET_PER_HOUR', '60'))
+    MENTOR_PREFETCH_MAX_WORKERS = 2
+    MENTOR_PREFETCH_MAX_ENTRIES = 32  # Analyses per session whose prefetched guidance is kept
+    MENTOR_PREFETCH_MAX_SESSIONS = 64  # Sessions tracked; the least recently active is dropped
+    MENTOR_PREFETCH_WAIT_SECONDS = 30  # How long the mentor tab waits on an in-flight prefetch
+    
+    # Model call policy per task. timeout is passed to each request and deadline bounds
+    # all attempts, in seconds. A request still running is waited on rather than resent;
+    # retryable errors back off exponentially with jitter. hedge_after sends
+    # a duplicate request when an attempt is slower than that many seconds, or than the
+    # task's observed p95 with 'p95'. The breaker opens after breaker_failures retryable
+    # failures in a row and lets a trial call through after breaker_reset seconds.
+    CALL_HEDGING_ENABLED = os.getenv('CALL_HEDGING_ENABLED', 'false').lower() == 'true'
+    CALL_POLICIES = {
+        'default': {'timeout': 60, 'deadline': 120, 'max_attempts': 3, 'backoff_base': 0.5,
+                    'backoff_max': 8, 'hedge_after': None, 'breaker_failures': 5,
+                    'breaker_reset': 30},
+        # Large image uploads are slow and costly to duplicate, so vision is never hedged
+        'vision': {'timeout': 90, 'deadline': 180},
+        'classification': {'timeout': 30, 'deadline': 60, 'max_attempts': 4,
+                           'hedge_after': 'p95'},
+        'mission': {'timeout': 45, 'deadline': 90, 'hedge_after': 'p95'},
+        'mentor': {'timeout': 60, 'deadline': 90, 'hedge_after': 'p95'}
+    }
+    CALL_POLICY_MAX_WORKERS = int(os.getenv('CALL_POLICY_MAX_WORKERS', '32'))  # Shared by all tasks
+    
+    # Telemetry: structured logs, in-process metrics and an optional Prometheus endpoint
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text or json
+    METRICS_PORT = int(os.getenv('METRICS_PORT')) if os.getenv('METRICS_PORT') else None
+    # Local only by default; set 0.0.0.0 to let a Prometheus server on another host scrape it
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    TELEMETRY_RECENT_REQUESTS = 50  # Request traces kept for the debug panel
+    MODEL_PRICES = {  # USD per million (input, output) tokens
+        'gemini-2.5-flash': (0.30, 2.50)
+    }
+    
+    # Interactive mentor chat settings
+    CHAT_TOKEN_BUDGET = 3000  # Estimated tokens of summary + history sent per turn
+    CHAT_MAX_HISTORY_MESSAGES = 20
+    CHAT_SUMMARY_WORDS = 150
     
     @staticmethod
     def validate():
         """Validate that required configuration is present"""
+        # The offline backends never call Gemini
+        if Config.MODEL_BACKEND.lower() in ('fake', 'replay'):
+            return
         if not Config.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
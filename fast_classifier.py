@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import Config
+
+
+# Extra seed phrases on top of Config.DOMAIN_ISSUES so common wording is covered
+SEED_PHRASES = {
+    'Environment': [
+        'overflowing garbage', 'trash piled on the street', 'rubbish dump',
+        'plastic waste everywhere', 'blocked drainage channel', 'clogged drains and gutters',
+        'flooded street after rain', 'stagnant water in the drainage', 'burning of waste',
+        'smoke and air pollution', 'cutting down trees', 'dirty river full of plastic',
+        'sewage flowing in the open', 'litter in the park', 'illegal dumpsite near homes'
+    ],
+    'Health': [
+        'long queues at the clinic', 'hospital has no medicine', 'no doctors or nurses',
+        'patients sleeping on the floor', 'workers without masks or gloves',
+        'no protective equipment', 'dirty public toilets', 'no clean drinking water',
+        'cholera outbreak', 'malaria cases rising', 'used syringes on the ground',
+        'open defecation', 'no handwashing facilities', 'mosquitoes breeding',
+        'health centre is too far away'
+    ],
+    'Education': [
+        'too many pupils in one classroom', 'students sitting on the floor',
+        'no desks or chairs in school', 'leaking school roof', 'broken classroom windows',
+        'no textbooks for learners', 'shortage of teachers', 'school has no library',
+        'children not attending school', 'no electricity in the school',
+        'school latrines collapsed', 'learners share one book', 'unsafe school building',
+        'no computers for students', 'school fence is broken'
+    ]
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z]+")
+_STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in',
+    'is', 'it', 'no', 'not', 'of', 'on', 'one', 'or', 'our', 'the', 'their', 'there',
+    'this', 'to', 'too', 'very', 'was', 'we', 'were', 'with'
+}
+
+
+class FastProblemClassifier:
+    """Local hashed TF-IDF classifier with a softmax linear model"""
+
+    def __init__(self, categories: Optional[List[str]] = None, n_features: int = 2 ** 15):
+        self.categories = list(categories or Config.CATEGORIES)
+        self.n_features = n_features
+        self.idf = {}
+        self.weights = [dict() for _ in self.categories]
+        self.biases = [0.0] * len(self.categories)
+
+    def _tokens(self, text: str) -> List[str]:
+        words = [word for word in _TOKEN_PATTERN.findall(text.lower()) if word not in _STOP_WORDS]
+        bigrams = [f"{first} {second}" for first, second in zip(words, words[1:])]
+        return words + bigrams
+
+    def _hash(self, token: str) -> int:
+        # crc32 is stable across processes, unlike the builtin hash()
+        return zlib.crc32(token.encode('utf-8')) % self.n_features
+
+    def _term_counts(self, text: str) -> Dict[int, int]:
+        counts = {}
+        for token in self._tokens(text):
+            index = self._hash(token)
+            counts[index] = counts.get(index, 0) + 1
+        return counts
+
+    def _vectorize(self, text: str) -> Dict[int, float]:
+        vector = {}
+        for index, count in self._term_counts(text).items():
+            idf = self.idf.get(index)
+            if idf is None:
+                # Features never seen in training carry no signal
+                continue
+            vector[index] = (1.0 + math.log(count)) * idf
+
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm:
+            vector = {index: value / norm for index, value in vector.items()}
+        return vector
+
+    def _probabilities(self, vector: Dict[int, float]) -> List[float]:
+        scores = [
+            bias + sum(weights.get(index, 0.0) * value for index, value in vector.items())
+            for weights, bias in zip(self.weights, self.biases)
+        ]
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def fit(self, texts: List[str], labels: List[str], epochs: int = 40,
+            learning_rate: float = 0.5, l2: float = 1e-4):
+        """Fit IDF statistics and the softmax weights with plain SGD"""
+        documents = len(texts)
+        doc_freq = {}
+        for text in texts:
+            for index in self._term_counts(text):
+                doc_freq[index] = doc_freq.get(index, 0) + 1
+        self.idf = {
+            index: math.log((1 + documents) / (1 + freq)) + 1.0
+            for index, freq in doc_freq.items()
+        }
+
+        vectors = [self._vectorize(text) for text in texts]
+        targets = [self.categories.index(label) for label in labels]
+        self.weights = [dict() for _ in self.categories]
+        self.biases = [0.0] * len(self.categories)
+
+        for _ in range(epochs):
+            for vector, target in zip(vectors, targets):
+                probabilities = self._probabilities(vector)
+                for class_index, probability in enumerate(probabilities):
+                    gradient = probability - (1.0 if class_index == target else 0.0)
+                    weights = self.weights[class_index]
+                    for index, value in vector.items():
+                        current = weights.get(index, 0.0)
+                        weights[index] = current - learning_rate * (gradient * value + l2 * current)
+                    self.biases[class_index] -= learning_rate * gradient
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return the most likely category and its probability"""
+        probabilities = self._probabilities(self._vectorize(text))
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.categories[best], probabilities[best]
+
+
+class LabelStore:
+    """Append-only JSONL file of (description, category) pairs labelled by the LLM"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Tuple[str, str]]:
+        if not self.path or not os.path.exists(self.path):
+            return []
+
+        examples = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                examples.append((record['text'], record['category']))
+        return examples
+
+    def append(self, text: str, category: str):
+        if not self.path:
+            return
+
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'text': text, 'category': category}) + '\n')
+
+
+def seed_examples(categories: Iterable[str]) -> List[Tuple[str, str]]:
+    examples = []
+    for category in categories:
+        for phrase in Config.DOMAIN_ISSUES.get(category, []) + SEED_PHRASES.get(category, []):
+            examples.append((phrase, category))
+    return examples
+
+
+class FastPathRouter:
+    """Answers obvious classifications locally and learns from LLM labels over time"""
+
+    def __init__(self, categories: Optional[List[str]] = None,
+                 threshold: Optional[float] = None,
+                 labels_path: Optional[str] = None,
+                 refit_every: int = 25,
+                 max_labels: Optional[int] = None):
+        self.categories = list(categories or Config.CATEGORIES)
+        self.threshold = Config.FAST_CLASSIFIER_THRESHOLD if threshold is None else threshold
+        self.store = LabelStore(labels_path if labels_path is not None
+                                else Config.FAST_CLASSIFIER_LABELS_PATH)
+        self.refit_every = refit_every
+        self.fast_path_hits = 0
+        self.llm_fallbacks = 0
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._refit_thread = None
+
+        self.seeds = seed_examples(self.categories)
+        # Only the most recent labels are kept, so memory and refit time stay bounded
+        self.labels = deque(
+            ((text, category) for text, category in self.store.load()
+             if category in self.categories),
+            maxlen=Config.FAST_CLASSIFIER_MAX_LABELS if max_labels is None else max_labels
+        )
+        self._seen = {text for text, _ in self.seeds} | {text for text, _ in self.labels}
+        self.model = self._train(self.seeds + list(self.labels))
+
+    def _train(self, examples: List[Tuple[str, str]]) -> FastProblemClassifier:
+        model = FastProblemClassifier(self.categories)
+        model.fit([text for text, _ in examples], [label for _, label in examples])
+        return model
+
+    def route(self, text: str) -> Optional[Tuple[str, float]]:
+        """Return (category, probability) when confident enough, else None"""
+        category, probability = self.model.predict(text)
+        with self._lock:
+            if probability >= self.threshold:
+                self.fast_path_hits += 1
+                return category, probability
+            self.llm_fallbacks += 1
+        return None
+
+    def record_label(self, text: str, category: str):
+        """Keep an LLM label for future training, refitting in the background every few labels"""
+        with self._lock:
+            if category not in self.categories or text in self._seen:
+                return
+            if len(self.labels) == self.labels.maxlen:
+                self._seen.discard(self.labels[0][0])
+            self._seen.add(text)
+            self.labels.append((text, category))
+            self._pending += 1
+            if self._pending >= self.refit_every and self._refit_thread is None:
+                self._refit_thread = threading.Thread(target=self._refit, daemon=True)
+                self._refit_thread.start()
+
+        self.store.append(text, category)
+
+    def _refit(self):
+        """Refit until no full batch of labels arrived meanwhile; predictions use the old model"""
+        try:
+            while True:
+                with self._lock:
+                    self._pending = 0
+                    examples = self.seeds + list(self.labels)
+                model = self._train(examples)
+                with self._lock:
+                    self.model = model
+                    if self._pending < self.refit_every:
+                        self._refit_thread = None
+                        return
+        except Exception:
+            with self._lock:
+                self._refit_thread = None
+            raise
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.fast_path_hits + self.llm_fallbacks
+            return {
+                'threshold': self.threshold,
+                'fast_path': self.fast_path_hits,
+                'llm_fallback': self.llm_fallbacks,
+                'fast_path_rate': self.fast_path_hits / total if total else 0.0,
+                'training_examples': len(self.seeds) + len(self.labels)
+            }
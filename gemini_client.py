@@ -0,0 +1,201 @@
+import threading
+import time
+from typing import Dict, Iterator, Optional
+from call_policy import CallStats, clear_policies, get_policy
+from config import Config
+from model_backends import create_backend
+from response_cache import ResponseCache, get_default_cache, make_cache_key
+from telemetry import record_call
+
+
+class CachedResponse:
+    """Stand-in for a Gemini response served from the response cache"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.cached = True
+        self.usage_metadata = None
+
+
+class GeminiClient:
+    """Single wrapper through which all modules call Gemini
+
+    Requests go to a backend: live Gemini by default, or an offline fake,
+    a record/replay file or a fault-injecting wrapper (see model_backends).
+    Backend calls follow the task's call policy (deadlines, retries, hedging
+    and a circuit breaker; see call_policy). Every call, cached or not, is
+    recorded with its latency and token usage.
+    """
+
+    def __init__(self, model_name: str, api_key: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, backend=None, task: str = 'default'):
+        self.model_name = model_name
+        self.api_key = api_key or Config.GEMINI_API_KEY
+        self.backend = backend if backend is not None else get_default_backend(self.api_key)
+        # Offline and recording backends never share the response cache with live Gemini
+        if cache is None and getattr(self.backend, 'cacheable', True):
+            cache = get_default_cache()
+        self.cache = cache
+        self.task = task
+        self.policy = get_policy(task)
+
+    @property
+    def live(self) -> bool:
+        """True when responses come from the real model rather than a fake or a replay"""
+        return getattr(self.backend, 'live', True)
+
+    def _lookup(self, use_cache: bool, contents, generation_config: Optional[Dict],
+                system_instruction: Optional[str]):
+        """Return (cache key, cached text); both None when the cache is bypassed"""
+        if not use_cache or self.cache is None:
+            return None, None
+
+        parts = [system_instruction, contents] if system_instruction else contents
+        key = make_cache_key(self.model_name, parts, generation_config)
+        return key, self.cache.get(key)
+
+    def generate(self, contents, generation_config: Optional[Dict] = None,
+                 use_cache: bool = True, system_instruction: Optional[str] = None):
+        started = time.perf_counter()
+        key, cached = self._lookup(use_cache, contents, generation_config, system_instruction)
+        if cached is not None:
+            record_call(self.model_name, 'generate', started, cache_hit=True)
+            return CachedResponse(cached)
+
+        stats = CallStats()
+        try:
+            response = self.policy.call(
+                self.backend.generate,
+                self.model_name, contents, generation_config, system_instruction,
+                stats=stats, pass_timeout=True
+            )
+        except Exception as e:
+            record_call(self.model_name, 'generate', started, error=e,
+                        attempts=stats.attempts, hedged=stats.hedged)
+            raise
+        record_call(self.model_name, 'generate', started, response,
+                    attempts=stats.attempts, hedged=stats.hedged)
+
+        if key is not None:
+            self.cache.set(key, response.text)
+
+        return response
+
+    async def generate_async(self, contents, generation_config: Optional[Dict] = None,
+                             use_cache: bool = True, system_instruction: Optional[str] = None):
+        started = time.perf_counter()
+        key, cached = self._lookup(use_cache, contents, generation_config, system_instruction)
+        if cached is not None:
+            record_call(self.model_name, 'generate_async', started, cache_hit=True)
+            return CachedResponse(cached)
+
+        stats = CallStats()
+        try:
+            response = await self.policy.call_async(
+                self.backend.generate_async,
+                self.model_name, contents, generation_config, system_instruction,
+                stats=stats, pass_timeout=True
+            )
+        except Exception as e:
+            record_call(self.model_name, 'generate_async', started, error=e,
+                        attempts=stats.attempts, hedged=stats.hedged)
+            raise
+        record_call(self.model_name, 'generate_async', started, response,
+                    attempts=stats.attempts, hedged=stats.hedged)
+
+        if key is not None:
+            self.cache.set(key, response.text)
+
+        return response
+
+    def generate_stream(self, contents, generation_config: Optional[Dict] = None,
+                        use_cache: bool = True,
+                        system_instruction: Optional[str] = None) -> Iterator[str]:
+        """Yield response text chunks as they arrive, caching the full text at the end
+
+        Streams carry no usage metadata, so their calls are recorded without tokens.
+        """
+        started = time.perf_counter()
+        key, cached = self._lookup(use_cache, contents, generation_config, system_instruction)
+        if cached is not None:
+            record_call(self.model_name, 'generate_stream', started, cache_hit=True)
+            yield cached
+            return
+
+        parts = []
+        stats = CallStats()
+        try:
+            for text in self.policy.stream(
+                self.backend.generate_stream,
+                self.model_name, contents, generation_config, system_instruction,
+                stats=stats, pass_timeout=True
+            ):
+                parts.append(text)
+                yield text
+        except Exception as e:
+            record_call(self.model_name, 'generate_stream', started, error=e,
+                        attempts=stats.attempts)
+            raise
+        record_call(self.model_name, 'generate_stream', started, attempts=stats.attempts)
+
+        if key is not None:
+            self.cache.set(key, ''.join(parts))
+
+    def cache_stats(self) -> Dict:
+        if self.cache is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.cache.stats()}
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_backends = {}
+_backends_lock = threading.Lock()
+_backend_override = None
+
+
+def get_default_backend(api_key: Optional[str] = None):
+    """Return the process-wide backend selected by Config.MODEL_BACKEND"""
+    api_key = api_key or Config.GEMINI_API_KEY
+
+    # Called while get_client holds _clients_lock, so backends have their own lock
+    with _backends_lock:
+        if _backend_override is not None:
+            return _backend_override
+        backend = _backends.get(api_key)
+        if backend is None:
+            backend = create_backend(api_key=api_key)
+            _backends[api_key] = backend
+        return backend
+
+
+def set_backend(backend):
+    """Route every client through backend, or back to the configured one when None"""
+    global _backend_override
+
+    with _backends_lock:
+        _backend_override = backend
+    with _clients_lock:
+        _clients.clear()
+
+
+def get_client(model_name: str, api_key: Optional[str] = None,
+               task: str = 'default') -> GeminiClient:
+    """Return the process-wide client for a model and task, creating it on first use"""
+    api_key = api_key or Config.GEMINI_API_KEY
+
+    with _clients_lock:
+        client = _clients.get((model_name, api_key, task))
+        if client is None:
+            client = GeminiClient(model_name, api_key, task=task)
+            _clients[(model_name, api_key, task)] = client
+        return client
+
+
+def clear_clients():
+    """Drop all shared clients so the next get_client call builds fresh ones"""
+    with _clients_lock:
+        _clients.clear()
+    with _backends_lock:
+        _backends.clear()
+    clear_policies()
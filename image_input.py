@@ -0,0 +1,83 @@
+import os
+from typing import BinaryIO, Optional, Union
+
+# Formats Gemini accepts as raw inline data; anything else is decoded and re-encoded by the SDK
+_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+]
+
+# Paths, encoded bytes, file-like objects (e.g. Streamlit uploads) or PIL images
+ImageSource = Union[str, os.PathLike, bytes, BinaryIO, 'Image.Image']
+
+
+def sniff_mime_type(data) -> Optional[str]:
+    """Return the MIME type of encoded image data Gemini accepts as-is, or None"""
+    header = bytes(data[:12])
+    for signature, mime_type in _SIGNATURES:
+        if header.startswith(signature):
+            return mime_type
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    if header[4:12] in (b'ftypheic', b'ftypheix', b'ftypmif1'):
+        return 'image/heic'
+    return None
+
+
+def is_pil_image(source) -> bool:
+    return hasattr(source, 'mode') and hasattr(source, 'size') and hasattr(source, 'tobytes')
+
+
+def read_image_bytes(source: ImageSource):
+    """Return the encoded bytes of a path, bytes-like or file-like source"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as image_file:
+            return image_file.read()
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+
+    # Streamlit's UploadedFile is a BytesIO: getvalue() returns its buffer without seeking
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+
+    if hasattr(source, 'read'):
+        position = source.tell() if hasattr(source, 'seek') else None
+        data = source.read()
+        if position is not None:
+            source.seek(position)
+        return data
+
+    raise TypeError(f"Unsupported image source: {type(source).__name__}")
+
+
+def image_part(source: ImageSource):
+    """Build the request part for an image without a temp file or an extra codec pass
+
+    JPEG, PNG, WEBP and HEIC bytes are sent as inline data exactly as uploaded.
+    Other formats are decoded once with PIL and left to the SDK to encode.
+    """
+    if is_pil_image(source):
+        return source
+
+    data = read_image_bytes(source)
+    mime_type = sniff_mime_type(data)
+    if mime_type is not None:
+        # The request proto needs bytes; bytes objects pass through without a copy
+        return {'mime_type': mime_type, 'data': data if isinstance(data, bytes) else bytes(data)}
+
+    import io
+    from PIL import Image
+    return Image.open(io.BytesIO(data))
+
+
+def describe_source(source: ImageSource) -> str:
+    """Readable label for results and logs: the path or file name when there is one"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    name = getattr(source, 'name', None) or getattr(source, 'filename', None)
+    if isinstance(name, str) and name:
+        return name
+    if is_pil_image(source):
+        return '<image>'
+    return '<image bytes>'
@@ -0,0 +1,97 @@
+import io
+import threading
+from typing import Dict, Optional, Tuple
+from config import Config
+from image_input import ImageSource, image_part, is_pil_image, read_image_bytes, sniff_mime_type
+
+_EXIF_ORIENTATION = 0x0112
+_METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+_MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+
+class ImagePreprocessor:
+    """Downscales, orients and re-encodes images before they are sent to the vision model"""
+
+    def __init__(self, max_long_edge: Optional[int] = None, quality: Optional[int] = None,
+                 output_format: Optional[str] = None):
+        self.max_long_edge = max_long_edge or Config.IMAGE_MAX_LONG_EDGE
+        self.quality = quality or Config.IMAGE_QUALITY
+        self.output_format = (output_format or Config.IMAGE_OUTPUT_FORMAT).upper()
+        if self.output_format not in _MIME_TYPES:
+            raise ValueError(f"Unsupported output format: {self.output_format}")
+
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    def process(self, source: ImageSource) -> Tuple[object, Dict]:
+        """Return (request part, report) for one image"""
+        from PIL import Image, ImageOps
+
+        if is_pil_image(source):
+            data = None
+            img = source
+        else:
+            data = read_image_bytes(source)
+            img = Image.open(io.BytesIO(data))
+
+        original_size = img.size
+        orientation = img.getexif().get(_EXIF_ORIENTATION, 1)
+        has_metadata = any(key in img.info for key in _METADATA_KEYS)
+        needs_resize = max(original_size) > self.max_long_edge
+
+        # Small, upright, metadata-free uploads go out untouched to avoid a lossy re-encode
+        if (data is not None and not needs_resize and orientation == 1 and not has_metadata
+                and sniff_mime_type(data) is not None):
+            return image_part(data), self._report(original_size, original_size, len(data),
+                                                  len(data), resized=False, re_encoded=False)
+
+        if needs_resize and img.format == 'JPEG':
+            # Let the JPEG decoder scale by 1/2, 1/4 or 1/8 instead of decoding every pixel
+            scale = self.max_long_edge / max(original_size)
+            img.draft('RGB', (int(original_size[0] * scale), int(original_size[1] * scale)))
+
+        img = ImageOps.exif_transpose(img)
+        if max(img.size) > self.max_long_edge:
+            img.thumbnail((self.max_long_edge, self.max_long_edge), Image.LANCZOS)
+
+        keep_alpha = self.output_format == 'WEBP' and img.mode in ('RGBA', 'LA', 'P')
+        img = img.convert('RGBA' if keep_alpha else 'RGB')
+
+        # Saving without exif/icc arguments drops all metadata
+        buffer = io.BytesIO()
+        img.save(buffer, format=self.output_format, quality=self.quality)
+        encoded = buffer.getvalue()
+
+        part = {'mime_type': _MIME_TYPES[self.output_format], 'data': encoded}
+        bytes_in = len(data) if data is not None else len(encoded)
+        # An EXIF rotation swaps width and height without resizing
+        return part, self._report(original_size, img.size, bytes_in, len(encoded),
+                                  resized=max(img.size) != max(original_size), re_encoded=True)
+
+    def _report(self, original_size, sent_size, bytes_in: int, bytes_out: int,
+                resized: bool, re_encoded: bool) -> Dict:
+        with self._lock:
+            self.images += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+        return {
+            'original_size': original_size,
+            'sent_size': sent_size,
+            'original_bytes': bytes_in,
+            'sent_bytes': bytes_out,
+            'bytes_saved': bytes_in - bytes_out,
+            'resized': resized,
+            're_encoded': re_encoded
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'images': self.images,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out
+            }
@@ -1,97 +1,494 @@
-from typing import Dict, Optional, List
+import logging
+import threading
+from typing import Callable, Dict, Optional, List
 from vision_detector import CommunityIssueDetector
 from mission_generator import MissionStatementGenerator
 from problem_classifier import ProblemClassifier
 from config import Config
+from concurrency import run_concurrently
+from section_parser import SectionParser
+from image_input import ImageSource, describe_source
+from ai_mentor import AIMentor
+from mentor_prefetch import MentorPrefetcher
+from stage_graph import Stage, StageCallback, StageGraph, StageRun
+from telemetry import RequestTrace, record_stages, stage_scope, trace_request
+
+logger = logging.getLogger(__name__)
+
+
+DETECTION_SECTIONS = SectionParser({
+    'detected_issues': ['DETECTED ISSUES:'],
+    'visual_evidence': ['VISUAL EVIDENCE:'],
+    'recommendations': ['RECOMMENDATIONS:']
+})
+
+# Result 'step' reported when a pipeline stage fails
+STAGE_STEPS = {
+    'vision': 'vision_detection',
+    'classification': 'classification',
+    'mission': 'mission_generation'
+}
+
+HIT, MISS = 'hits', 'misses'
 
 
 class AILearningPlatform:
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, speculative: Optional[bool] = None,
+                 prefetch_mentor: Optional[bool] = None):
         Config.validate()
         
         self.vision_detector = CommunityIssueDetector(api_key)
         self.mission_generator = MissionStatementGenerator(api_key)
         self.problem_classifier = ProblemClassifier(api_key)
+        
+        # Draft the mission alongside classification instead of after it
+        self.speculative = Config.SPECULATIVE_MISSION if speculative is None else speculative
+        self.speculation = {HIT: 0, MISS: 0}
+        self._speculation_lock = threading.Lock()
+        
+        # Warm up the mentor tab for the problem that was just analyzed
+        use_prefetch = Config.MENTOR_PREFETCH_ENABLED if prefetch_mentor is None else prefetch_mentor
+        self.mentor_prefetch = MentorPrefetcher(AIMentor(api_key)) if use_prefetch else None
+    
+    def process_image(self, image: ImageSource, 
+                     domains: Optional[List[str]] = None,
+                     fused: bool = False,
+                     tiled: bool = False,
+                     on_stage: Optional[StageCallback] = None) -> Dict:
+        """Analyze an image; on_stage receives each stage's result as soon as it is ready"""
+        with trace_request('image') as trace:
+            return self._with_trace(
+                self._process_image(image, domains, fused, tiled, on_stage), trace
+            )
+    
+    def _process_image(self, image: ImageSource, domains: Optional[List[str]], fused: bool,
+                       tiled: bool, on_stage: Optional[StageCallback]) -> Dict:
+        if fused and not tiled:
+            return self._process_image_fused(image, domains, on_stage)
+        
+        logger.info("Analyzing image for community issues...")
+        
+        def detect(image):
+            # Step 1: Detect issues in the image, tile by tile for high-detail analysis
+            if tiled:
+                vision_result = self.vision_detector.detect_issues_tiled(image, domains)
+            else:
+                vision_result = self.vision_detector.detect_issues(image, domains)
+            
+            if vision_result['success']:
+                logger.info("Issues detected in image")
+                if vision_result.get('tiles'):
+                    logger.info(f"Merged {len(vision_result['issues'])} issues "
+                                f"from {vision_result['tiles']} tiles")
+                self._log_image_details(vision_result)
+            return vision_result
+        
+        run = self._image_graph(detect).run({'image': image}, on_stage=on_stage)
+        return self._build_image_run_result(image, run)
+    
+    def process_video(self, source: ImageSource, domains: Optional[List[str]] = None,
+                      on_stage: Optional[StageCallback] = None) -> Dict:
+        """Analyze a video walkthrough or animated image through its distinct keyframes"""
+        with trace_request('video') as trace:
+            return self._with_trace(self._process_video(source, domains, on_stage), trace)
     
-    def process_image(self, image_path: str, 
-                     domains: Optional[List[str]] = None) -> Dict:
-        print("Analyzing image for community issues...")
+    def _process_video(self, source: ImageSource, domains: Optional[List[str]],
+                       on_stage: Optional[StageCallback]) -> Dict:
+        logger.info("Extracting keyframes...")
         
-        # Step 1: Detect issues in the image
-        vision_result = self.vision_detector.detect_issues(image_path, domains)
+        def detect(image):
+            vision_result = self.vision_detector.detect_issues_in_video(image, domains)
+            if vision_result['success']:
+                logger.info(f"Analyzed {len(vision_result['keyframes'])} keyframes "
+                            f"out of {vision_result['frames_scanned']} sampled frames")
+            return vision_result
         
-        if not vision_result['success']:
+        run = self._image_graph(detect).run({'image': source}, on_stage=on_stage)
+        return self._build_image_run_result(source, run)
+    
+    def _complete_image_analysis(self, image: ImageSource, vision_result: Dict) -> Dict:
+        """Classify the detected issues and generate the mission statement"""
+        run = self._image_graph().run({'vision': vision_result})
+        return self._build_image_run_result(image, run)
+    
+    def _image_graph(self, detect: Optional[Callable[[ImageSource], Dict]] = None) -> StageGraph:
+        """Vision detection, then classification and mission generation side by side
+        
+        Without detect the graph starts from an existing vision result.
+        """
+        graph = StageGraph(inputs=['image'] if detect else ['vision'])
+        if detect is not None:
+            graph.add(Stage('vision', detect, ['image']))
+        
+        def classify(vision):
+            logger.info("Classifying the detected problems...")
+            classification = self.problem_classifier.classify_with_vision_analysis(
+                vision['analysis']
+            )
+            logger.info(f"Classified as: {classification.get('category', 'Unknown')}")
+            return classification
+        
+        def generate(vision, category):
+            # Extract the key problem description for mission generation
+            logger.info("Generating mission statement...")
+            mission = self.mission_generator.generate_mission_statement(
+                self._extract_problem_description(vision['analysis']),
+                context=self._mission_context(category, visual=True)
+            )
+            logger.info("Mission statement generated")
+            return mission
+        
+        def draft_mission(vision):
+            category = self.problem_classifier.guess_category(vision['analysis'])
+            return {'category': category, 'mission': generate(vision, category)}
+        
+        def mission(vision, classification, mission_draft=None):
+            draft = self._accept_draft(mission_draft, classification)
+            return draft if draft is not None else generate(vision, classification.get('category'))
+        
+        # As before the graph, a failed classification or mission is reported in the result
+        graph.add(Stage('classification', classify, ['vision'], optional=True))
+        self._add_mission_stages(graph, 'vision', draft_mission, mission, optional=True)
+        self._add_prefetch_stage(graph, 'vision', self._vision_mentor_problem)
+        return graph
+    
+    async def process_image_async(self, image: ImageSource, 
+                                  domains: Optional[List[str]] = None,
+                                  fused: bool = False,
+                                  tiled: bool = False,
+                                  on_stage: Optional[StageCallback] = None) -> Dict:
+        with trace_request('image') as trace:
+            return self._with_trace(
+                await self._process_image_async(image, domains, fused, tiled, on_stage), trace
+            )
+    
+    async def _process_image_async(self, image: ImageSource, domains: Optional[List[str]],
+                                   fused: bool, tiled: bool,
+                                   on_stage: Optional[StageCallback]) -> Dict:
+        if fused and not tiled:
+            with stage_scope('fused'):
+                fused_result = await self.vision_detector.detect_issues_fused_async(image, domains)
+            if fused_result.get('invalid_response'):
+                self._log_fused_fallback(fused_result)
+                return await self._process_image_async(image, domains, False, False, on_stage)
+            self._emit_fused_stages(fused_result, on_stage)
+            return self._build_fused_image_result(image, fused_result)
+        
+        async def detect(image):
+            if tiled:
+                return await self.vision_detector.detect_issues_tiled_async(image, domains)
+            return await self.vision_detector.detect_issues_async(image, domains)
+        
+        run = await self._image_graph_async(detect).run_async({'image': image}, on_stage=on_stage)
+        return self._build_image_run_result(image, run)
+    
+    async def process_video_async(self, source: ImageSource,
+                                  domains: Optional[List[str]] = None,
+                                  on_stage: Optional[StageCallback] = None) -> Dict:
+        async def detect(image):
+            return await self.vision_detector.detect_issues_in_video_async(image, domains)
+        
+        with trace_request('video') as trace:
+            run = await self._image_graph_async(detect).run_async({'image': source},
+                                                                  on_stage=on_stage)
+            return self._with_trace(self._build_image_run_result(source, run), trace)
+    
+    async def _complete_image_analysis_async(self, image: ImageSource, vision_result: Dict) -> Dict:
+        run = await self._image_graph_async().run_async({'vision': vision_result})
+        return self._build_image_run_result(image, run)
+    
+    def _image_graph_async(self, detect: Optional[Callable] = None) -> StageGraph:
+        graph = StageGraph(inputs=['image'] if detect else ['vision'])
+        if detect is not None:
+            graph.add(Stage('vision', detect, ['image']))
+        
+        async def classify(vision):
+            return await self.problem_classifier.classify_with_vision_analysis_async(
+                vision['analysis']
+            )
+        
+        async def generate(vision, category):
+            return await self.mission_generator.generate_mission_statement_async(
+                self._extract_problem_description(vision['analysis']),
+                context=self._mission_context(category, visual=True)
+            )
+        
+        async def draft_mission(vision):
+            category = self.problem_classifier.guess_category(vision['analysis'])
+            return {'category': category, 'mission': await generate(vision, category)}
+        
+        async def mission(vision, classification, mission_draft=None):
+            draft = self._accept_draft(mission_draft, classification)
+            if draft is not None:
+                return draft
+            return await generate(vision, classification.get('category'))
+        
+        graph.add(Stage('classification', classify, ['vision'], optional=True))
+        self._add_mission_stages(graph, 'vision', draft_mission, mission, optional=True)
+        self._add_prefetch_stage(graph, 'vision', self._vision_mentor_problem)
+        return graph
+    
+    def _add_mission_stages(self, graph: StageGraph, source: str,
+                            draft_mission: Callable, mission: Callable, optional: bool = False):
+        """Declare mission generation, speculatively drafted alongside classification if enabled"""
+        if self.speculative:
+            graph.add(Stage('mission_draft', draft_mission, [source]))
+            graph.add(Stage('mission', mission, [source, 'classification', 'mission_draft'],
+                            optional=optional))
+        else:
+            graph.add(Stage('mission', mission, [source, 'classification'], optional=optional))
+    
+    def _add_prefetch_stage(self, graph: StageGraph, source: str,
+                            problem_for: Callable[[Dict, Dict], str]):
+        """Queue mentor requests for the analyzed problem without holding up the result"""
+        if self.mentor_prefetch is None:
+            return
+        
+        def prefetch(mission, **sources):
+            problem = problem_for(sources[source], mission)
             return {
-                'success': False,
-                'error': vision_result.get('error', 'Vision detection failed'),
-                'step': 'vision_detection'
+                'success': True,
+                'problem': problem,
+                'started': self.mentor_prefetch.prefetch(problem)
             }
         
-        print("Issues detected in image")
-        print("\nClassifying the detected problems...")
+        graph.add(Stage('mentor_prefetch', prefetch, ['mission', source], optional=True))
+    
+    def _vision_mentor_problem(self, vision: Dict, mission: Dict) -> str:
+        return (mission.get('problem_definition')
+                or self._extract_problem_description(vision['analysis']))
+    
+    def cancel_mentor_prefetch(self, problem_description: str) -> bool:
+        if self.mentor_prefetch is None:
+            return False
+        return self.mentor_prefetch.cancel(problem_description)
+    
+    def _mission_context(self, category: Optional[str], visual: bool = False) -> Optional[str]:
+        parts = ["Based on visual analysis."] if visual else []
+        if category:
+            parts.append(f"Category: {category}")
+        return ' '.join(parts) or None
+    
+    def _accept_draft(self, mission_draft: Optional[Dict], classification: Dict) -> Optional[Dict]:
+        """Return the speculative mission when it was written for the category that won"""
+        if mission_draft is None:
+            return None
         
-        # Step 2: Classify the detected issues
-        classification = self.problem_classifier.classify_with_vision_analysis(
-            vision_result['analysis']
+        # Without a local guess the draft carries no category, so any category matches it
+        hit = (mission_draft['mission']['success']
+               and mission_draft['category'] in (None, classification.get('category')))
+        with self._speculation_lock:
+            self.speculation[HIT if hit else MISS] += 1
+        return mission_draft['mission'] if hit else None
+    
+    def speculation_stats(self) -> Dict:
+        with self._speculation_lock:
+            total = self.speculation[HIT] + self.speculation[MISS]
+            return {
+                'enabled': self.speculative,
+                **self.speculation,
+                'hit_rate': self.speculation[HIT] / total if total else 0.0
+            }
+    
+    def _build_image_run_result(self, image: ImageSource, run: StageRun) -> Dict:
+        if not run.success:
+            return self._build_run_error(run)
+        
+        result = self._build_image_result(
+            image, run.results['vision'], self._stage_result(run, 'classification'),
+            self._stage_result(run, 'mission')
         )
+        result['timings'] = self._stage_timings(run)
+        result['mentor_prefetch'] = run.results.get('mentor_prefetch')
+        return result
+    
+    def _with_trace(self, result: Dict, trace: RequestTrace) -> Dict:
+        """Attach the request's model calls, tokens and cost for the debug panel"""
+        result['telemetry'] = trace.summary()
+        return result
+    
+    def _build_run_error(self, run: StageRun) -> Dict:
+        stage = run.failed_stage
+        result = {
+            'success': False,
+            'error': run.errors[stage],
+            'step': STAGE_STEPS.get(stage, stage),
+            'timings': self._stage_timings(run)
+        }
+        if stage == 'mission':
+            result['classification'] = self._stage_result(run, 'classification')
+        return result
+    
+    def _stage_result(self, run: StageRun, stage: str) -> Dict:
+        """A stage's result, or a failure when it raised or was skipped"""
+        if stage in run.results:
+            return run.results[stage]
+        return {
+            'success': False,
+            'error': run.errors.get(stage, "Skipped because an earlier step failed")
+        }
+    
+    def _stage_timings(self, run: StageRun) -> Dict:
+        record_stages(run.timings)
+        return {
+            'wall_seconds': run.wall_seconds,
+            'stages': run.timings
+        }
+    
+    def _process_image_fused(self, image: ImageSource, 
+                             domains: Optional[List[str]] = None,
+                             on_stage: Optional[StageCallback] = None) -> Dict:
+        logger.info("Analyzing image in fused mode (single vision call)...")
         
-        print(f"Classified as: {classification.get('category', 'Unknown')}")
+        with stage_scope('fused'):
+            fused_result = self.vision_detector.detect_issues_fused(image, domains)
+        if fused_result.get('invalid_response'):
+            self._log_fused_fallback(fused_result)
+            return self._process_image(image, domains, False, False, on_stage)
+        self._log_image_details(fused_result)
         
-        # Step 3: Extract key problem description for mission generation
-        problem_desc = self._extract_problem_description(vision_result['analysis'])
-
-        print("\nGenerating mission statement...")
+        logger.info("Classified as: "
+                    f"{fused_result.get('classification', {}).get('category', 'Unknown')}")
+        
+        self._emit_fused_stages(fused_result, on_stage)
+        return self._build_fused_image_result(image, fused_result)
+    
+    def _log_fused_fallback(self, fused_result: Dict):
+        logger.warning(f"{fused_result['error']}; falling back to separate vision, "
+                       "classification and mission calls")
+    
+    def _emit_fused_stages(self, fused_result: Dict, on_stage: Optional[StageCallback]):
+        """Report a fused result as the same stage events the staged pipeline produces"""
+        if on_stage is None:
+            return
+        
+        on_stage('vision', fused_result)
+        if fused_result['success']:
+            on_stage('classification', fused_result['classification'])
+            on_stage('mission', fused_result['mission'])
+    
+    def _build_fused_image_result(self, image: ImageSource, fused_result: Dict) -> Dict:
+        if not fused_result['success']:
+            return {
+                'success': False,
+                'error': fused_result.get('error', 'Fused vision analysis failed'),
+                'step': 'vision_detection'
+            }
         
-        # Step 4: Generate mission statement
-        mission = self.mission_generator.generate_mission_statement(
-            problem_desc,
-            context=f"Based on visual analysis. Category: {classification.get('category')}"
+        return self._build_image_result(
+            image,
+            fused_result,
+            fused_result['classification'],
+            fused_result['mission']
         )
-
-        print("Mission statement generated")
-
+    
+    def _build_image_result(self, image: ImageSource, vision_result: Dict,
+                            classification: Dict, mission: Dict) -> Dict:
         return {
             'success': True,
-            'image_path': image_path,
+            'image_path': describe_source(image),
+            'image_report': vision_result.get('image_report'),
+            'duplicate_of': vision_result.get('duplicate_of'),
+            'resolution': vision_result.get('resolution'),
+            'keyframes': vision_result.get('keyframes'),
             'vision_analysis': vision_result['analysis'],
             'classification': classification,
             'mission_statement': mission,
             'summary': self._create_summary(vision_result, classification, mission)
         }
     
-    def process_text_description(self, problem_description: str) -> Dict:
-        print("Processing problem description...")
+    def process_text_description(self, problem_description: str,
+                                 on_stage: Optional[StageCallback] = None) -> Dict:
+        logger.info("Processing problem description...")
         
-        # Step 1: Classify the problem
-        classification = self.problem_classifier.classify_problem(problem_description)
+        with trace_request('text') as trace:
+            run = self._text_graph().run({'problem_description': problem_description},
+                                         on_stage=on_stage)
+            return self._with_trace(self._build_text_run_result(problem_description, run), trace)
+    
+    async def process_text_description_async(self, problem_description: str,
+                                             on_stage: Optional[StageCallback] = None) -> Dict:
+        with trace_request('text') as trace:
+            run = await self._text_graph_async().run_async(
+                {'problem_description': problem_description}, on_stage=on_stage
+            )
+            return self._with_trace(self._build_text_run_result(problem_description, run), trace)
+    
+    def _text_graph(self) -> StageGraph:
+        graph = StageGraph(inputs=['problem_description'])
         
-        if not classification['success']:
-            return {
-                'success': False,
-                'error': classification.get('error', 'Classification failed'),
-                'step': 'classification'
-            }
+        def classify(problem_description):
+            # Step 1: Classify the problem
+            classification = self.problem_classifier.classify_problem(problem_description)
+            if classification['success']:
+                logger.info(f"Classified as: {classification['category']}")
+            return classification
         
-        print(f"Classified as: {classification['category']}")
-        print("\nGenerating mission statement...")
+        def generate(problem_description, category):
+            # Step 2: Generate mission statement
+            logger.info("Generating mission statement...")
+            mission = self.mission_generator.generate_mission_statement(
+                problem_description,
+                context=self._mission_context(category)
+            )
+            if mission['success']:
+                logger.info("Mission statement generated")
+            return mission
         
-        # Step 2: Generate mission statement
-        mission = self.mission_generator.generate_mission_statement(
-            problem_description,
-            context=f"Category: {classification['category']}"
-        )
+        def draft_mission(problem_description):
+            category = self.problem_classifier.guess_category(problem_description)
+            return {'category': category, 'mission': generate(problem_description, category)}
         
-        if not mission['success']:
-            return {
-                'success': False,
-                'error': mission.get('error', 'Mission generation failed'),
-                'step': 'mission_generation',
-                'classification': classification
-            }
+        def mission(problem_description, classification, mission_draft=None):
+            draft = self._accept_draft(mission_draft, classification)
+            if draft is not None:
+                return draft
+            return generate(problem_description, classification['category'])
+        
+        graph.add(Stage('classification', classify, ['problem_description']))
+        self._add_mission_stages(graph, 'problem_description', draft_mission, mission)
+        self._add_prefetch_stage(graph, 'problem_description', lambda source, mission: source)
+        return graph
+    
+    def _text_graph_async(self) -> StageGraph:
+        graph = StageGraph(inputs=['problem_description'])
+        
+        async def generate(problem_description, category):
+            return await self.mission_generator.generate_mission_statement_async(
+                problem_description,
+                context=self._mission_context(category)
+            )
+        
+        async def draft_mission(problem_description):
+            category = self.problem_classifier.guess_category(problem_description)
+            return {'category': category, 'mission': await generate(problem_description, category)}
         
-        print("Mission statement generated")
+        async def mission(problem_description, classification, mission_draft=None):
+            draft = self._accept_draft(mission_draft, classification)
+            if draft is not None:
+                return draft
+            return await generate(problem_description, classification['category'])
         
+        graph.add(Stage('classification', self.problem_classifier.classify_problem_async,
+                        ['problem_description']))
+        self._add_mission_stages(graph, 'problem_description', draft_mission, mission)
+        self._add_prefetch_stage(graph, 'problem_description', lambda source, mission: source)
+        return graph
+    
+    def _build_text_run_result(self, problem_description: str, run: StageRun) -> Dict:
+        if not run.success:
+            return self._build_run_error(run)
+        
+        result = self._build_text_result(
+            problem_description, run.results['classification'], run.results['mission']
+        )
+        result['timings'] = self._stage_timings(run)
+        result['mentor_prefetch'] = run.results.get('mentor_prefetch')
+        return result
+    
+    def _build_text_result(self, problem_description: str, classification: Dict,
+                           mission: Dict) -> Dict:
         return {
             'success': True,
             'original_description': problem_description,
@@ -100,32 +497,84 @@ class AILearningPlatform:
             'summary': self._create_text_summary(problem_description, classification, mission)
         }
     
-    def process_multiple_images(self, image_paths: List[str]) -> List[Dict]:
-        results = []
-        for i, image_path in enumerate(image_paths, 1):
-            print(f"\n{'='*60}")
-            print(f"Processing Image {i}/{len(image_paths)}")
-            print(f"{'='*60}")
-            
-            result = self.process_image(image_path)
-            results.append(result)
+    def process_multiple_images(self, images: List[ImageSource],
+                                max_workers: Optional[int] = None,
+                                on_result: Optional[Callable[[int, Dict], None]] = None,
+                                packed: bool = False) -> List[Dict]:
+        completed = []
+        
+        def report(index, result):
+            completed.append(index)
+            logger.info(f"Finished image {len(completed)}/{len(images)}: "
+                        f"{describe_source(images[index])}")
+            if on_result is not None:
+                on_result(index, result)
         
-        return results
+        def error_result(image, e):
+            return {
+                'success': False,
+                'error': str(e),
+                'image_path': describe_source(image),
+                'step': 'vision_detection'
+            }
+        
+        if not packed:
+            return run_concurrently(self.process_image, images, max_workers=max_workers,
+                                    on_result=report, error_result=error_result)
+        
+        # Step 1 for every image in as few vision requests as possible
+        with trace_request('packed_vision'):
+            vision_results = self.vision_detector.detect_multiple_images(
+                images, max_workers=max_workers, packed=True
+            )
+        
+        def complete(index):
+            vision_result = vision_results[index]
+            if not vision_result['success']:
+                return {
+                    'success': False,
+                    'error': vision_result.get('error', 'Vision detection failed'),
+                    'image_path': describe_source(images[index]),
+                    'step': 'vision_detection'
+                }
+            self._log_image_details(vision_result)
+            with trace_request('image') as trace:
+                return self._with_trace(
+                    self._complete_image_analysis(images[index], vision_result), trace
+                )
+        
+        return run_concurrently(
+            complete,
+            range(len(images)),
+            max_workers=max_workers,
+            on_result=report,
+            error_result=lambda index, e: error_result(images[index], e)
+        )
+    
+    def _log_image_details(self, vision_result: Dict):
+        duplicate_of = vision_result.get('duplicate_of')
+        if duplicate_of:
+            logger.info(f"Near-duplicate of {duplicate_of['image_path']} "
+                        f"(distance {duplicate_of['distance']}), reusing its analysis")
+        
+        if vision_result.get('resolution') == 'coarse':
+            logger.info("Resolved from the low-resolution preview")
+        elif vision_result.get('escalation_reason'):
+            logger.info(f"Re-analyzed at full resolution ({vision_result['escalation_reason']})")
+        
+        image_report = vision_result.get('image_report')
+        if image_report:
+            logger.info(f"Image sent at "
+                        f"{image_report['sent_size'][0]}x{image_report['sent_size'][1]}: "
+                        f"{image_report['original_bytes'] / 1024:.0f} KB -> "
+                        f"{image_report['sent_bytes'] / 1024:.0f} KB")
     
     def _extract_problem_description(self, vision_analysis: str) -> str:
         # Look for detected issues section
-        if "DETECTED ISSUES:" in vision_analysis:
-            start = vision_analysis.find("DETECTED ISSUES:")
-            end = vision_analysis.find("VISUAL EVIDENCE:", start)
-            if end == -1:
-                end = vision_analysis.find("RECOMMENDATIONS:", start)
-            if end == -1:
-                end = len(vision_analysis)
-            
-            issues_section = vision_analysis[start:end].strip()
+        issues_section = DETECTION_SECTIONS.parse(vision_analysis).get('detected_issues')
+        if issues_section is not None:
             # Take first few lines as description
-            lines = [line.strip() for line in issues_section.split('\n') 
-                    if line.strip() and not line.strip().startswith('DETECTED')]
+            lines = [line.strip() for line in issues_section.split('\n') if line.strip()]
             return ' '.join(lines[:3]) if lines else vision_analysis[:200]
         
         # Fallback: use first 200 characters
@@ -0,0 +1,144 @@
+import io
+import os
+import tempfile
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from config import Config
+from image_input import ImageSource, describe_source, is_pil_image, read_image_bytes
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Downsampled size used only for scene-change scoring
+_THUMBNAIL_SIZE = (64, 36)
+
+
+class Keyframe(NamedTuple):
+    frame_index: int
+    timestamp: float  # Seconds from the start
+    score: float  # Difference from the previous keyframe, 0 to 1
+    image: object  # PIL image at full resolution
+
+
+def is_video(source: ImageSource) -> bool:
+    name = describe_source(source)
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    return extension in Config.VIDEO_EXTENSIONS
+
+
+def is_animated(source: ImageSource) -> bool:
+    """True for GIF, WebP or PNG images with more than one frame"""
+    from PIL import Image
+
+    if is_pil_image(source):
+        return getattr(source, 'n_frames', 1) > 1
+    try:
+        with Image.open(io.BytesIO(read_image_bytes(source))) as img:
+            return getattr(img, 'n_frames', 1) > 1
+    except Exception:
+        return False
+
+
+def _thumbnail(frame) -> np.ndarray:
+    """Downsampled copy of a PIL frame as floats in [0, 1]
+
+    Colour is kept: scenes with similar brightness but different hues still register.
+    """
+    from PIL import Image
+
+    small = frame.convert('RGB').resize(_THUMBNAIL_SIZE, Image.BILINEAR)
+    return np.asarray(small, dtype=np.float32) / 255.0
+
+
+def _animated_frames(source: ImageSource, sample_fps: float) -> Iterator[Tuple[int, float, object]]:
+    from PIL import Image, ImageSequence
+
+    img = source if is_pil_image(source) else Image.open(io.BytesIO(read_image_bytes(source)))
+    elapsed = 0.0
+    next_sample = 0.0
+    for index, frame in enumerate(ImageSequence.Iterator(img)):
+        if elapsed >= next_sample:
+            yield index, elapsed, frame.convert('RGB')
+            next_sample = elapsed + 1.0 / sample_fps
+        elapsed += frame.info.get('duration', 100) / 1000.0
+
+
+def _video_frames(source: ImageSource, sample_fps: float) -> Iterator[Tuple[int, float, object]]:
+    from PIL import Image
+
+    if cv2 is None:
+        raise RuntimeError("Video ingestion requires OpenCV: pip install opencv-python-headless")
+
+    temp_path = None
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+    else:
+        # OpenCV only decodes from a file, so in-memory uploads get a private temp copy
+        suffix = os.path.splitext(describe_source(source))[1] or '.mp4'
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+            temp_file.write(read_image_bytes(source))
+            temp_path = path = temp_file.name
+
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video: {describe_source(source)}")
+
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, round(fps / sample_fps))
+        index = 0
+        while True:
+            # grab() advances without converting the frame; only sampled frames are retrieved
+            if not capture.grab():
+                break
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                yield index, index / fps, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            index += 1
+    finally:
+        capture.release()
+        if temp_path is not None:
+            os.remove(temp_path)
+
+
+class KeyframeExtractor:
+    """Samples frames from videos or animated images and keeps only distinct scenes"""
+
+    def __init__(self, sample_fps: Optional[float] = None, threshold: Optional[float] = None,
+                 max_keyframes: Optional[int] = None):
+        self.sample_fps = sample_fps or Config.KEYFRAME_SAMPLE_FPS
+        self.threshold = Config.KEYFRAME_SCENE_THRESHOLD if threshold is None else threshold
+        self.max_keyframes = max_keyframes or Config.KEYFRAME_MAX
+
+    def frames(self, source: ImageSource) -> Iterator[Tuple[int, float, object]]:
+        if is_video(source):
+            return _video_frames(source, self.sample_fps)
+        return _animated_frames(source, self.sample_fps)
+
+    def extract(self, source: ImageSource) -> Tuple[List[Keyframe], int]:
+        """Return (keyframes in time order, number of frames scanned)"""
+        keyframes = []
+        reference = None
+        scanned = 0
+
+        for frame_index, timestamp, frame in self.frames(source):
+            scanned += 1
+            thumbnail = _thumbnail(frame)
+            # Compare with the last kept keyframe, not the previous frame, so slow pans
+            # still add a keyframe once they have moved far enough
+            score = 1.0 if reference is None else float(np.abs(thumbnail - reference).mean())
+            if score >= self.threshold:
+                keyframes.append(Keyframe(frame_index, timestamp, score, frame))
+                reference = thumbnail
+
+            if len(keyframes) > self.max_keyframes:
+                # Keep the opening frame and the sharpest scene changes, dropping the weakest
+                # as we go so long videos never hold more than max_keyframes full frames
+                weakest = min(range(1, len(keyframes)), key=lambda index: keyframes[index].score)
+                del keyframes[weakest]
+
+        return keyframes, scanned
@@ -0,0 +1,205 @@
+import contextlib
+import contextvars
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError
+from typing import Dict, Iterator, Optional
+from config import Config
+from ai_mentor import AIMentor
+from telemetry import stage_scope
+
+CRITICAL_THINKING = 'critical_thinking'
+SOLUTION = 'solution'
+
+_current_session = contextvars.ContextVar('mentor_prefetch_session', default='')
+
+
+@contextlib.contextmanager
+def session_scope(session_id: str) -> Iterator[None]:
+    """Attribute prefetches started, read or cancelled in this block to one user session"""
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def prefetch_key(problem_description: str) -> str:
+    """Analyses are identified by the problem text the mentor will be asked about"""
+    return hashlib.sha256(problem_description.strip().encode('utf-8')).hexdigest()
+
+
+class MentorPrefetcher:
+    """Requests likely mentor guidance in the background once an analysis is done
+
+    Each analysis prefetches critical thinking guidance and the auto-selected
+    solution template. Results are kept per analysis so the mentor tab can show
+    them without a new request. Analyses belong to the session set with
+    session_scope: each session has its own rolling hourly call budget and its
+    own most recent analyses, and only sees and cancels its own prefetches.
+    A prefetch can be cancelled while it is queued or in flight.
+    """
+
+    def __init__(self, mentor: Optional[AIMentor] = None, max_workers: Optional[int] = None,
+                 budget_per_hour: Optional[int] = None, max_entries: Optional[int] = None,
+                 max_sessions: Optional[int] = None):
+        self.mentor = mentor or AIMentor()
+        self.budget_per_hour = budget_per_hour or Config.MENTOR_PREFETCH_BUDGET_PER_HOUR
+        self.max_entries = max_entries or Config.MENTOR_PREFETCH_MAX_ENTRIES
+        self.max_sessions = max_sessions or Config.MENTOR_PREFETCH_MAX_SESSIONS
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.MENTOR_PREFETCH_MAX_WORKERS,
+            thread_name_prefix='mentor-prefetch'
+        )
+
+        # Session ID -> {'entries': analyses by prefetch key, 'spent': call times}
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.over_budget = 0
+        self.cancelled = 0
+
+    def _session(self, create: bool = False) -> Optional[Dict]:
+        session_id = _current_session.get()
+        session = self._sessions.get(session_id)
+        if session is None and create:
+            session = {'entries': OrderedDict(), 'spent': deque()}
+            self._sessions[session_id] = session
+            # Forget the least recently active sessions along with their queued work
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                for entry in evicted['entries'].values():
+                    self._cancel(entry)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _take_budget(self, session: Dict, calls: int) -> bool:
+        now = time.time()
+        spent = session['spent']
+        while spent and now - spent[0] > 3600:
+            spent.popleft()
+        if len(spent) + calls > self.budget_per_hour:
+            return False
+        spent.extend([now] * calls)
+        return True
+
+    def prefetch(self, problem_description: str) -> bool:
+        """Start both mentor requests for a problem; False when skipped or over budget"""
+        key = prefetch_key(problem_description)
+        template_type = self.mentor._determine_template_type(problem_description)
+
+        with self._lock:
+            session = self._session(create=True)
+            entries = session['entries']
+            if key in entries:
+                entries.move_to_end(key)
+                return True
+            if not self._take_budget(session, 2):
+                self.over_budget += 1
+                return False
+
+            entry = {'cancelled': threading.Event(), 'futures': {}}
+            entry['futures'][CRITICAL_THINKING] = self._submit(
+                entry, self.mentor.critical_thinking_mode, problem_description
+            )
+            entry['futures'][(SOLUTION, template_type)] = self._submit(
+                entry, self.mentor.solution_mode, problem_description, template_type
+            )
+            entries[key] = entry
+            self.started += 1
+
+            # Forget the session's oldest analyses, cancelling any of their work still queued
+            while len(entries) > self.max_entries:
+                _, evicted = entries.popitem(last=False)
+                self._cancel(evicted)
+
+        return True
+
+    def _submit(self, entry: Dict, func, *args):
+        # Each call runs in its own copy of the caller's context, keeping its request trace
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._run, entry, func, *args)
+
+    def _run(self, entry: Dict, func, *args) -> Optional[Dict]:
+        # Queued work for a cancelled analysis never reaches the API
+        if entry['cancelled'].is_set():
+            return None
+        with stage_scope('mentor_prefetch'):
+            return func(*args)
+
+    def get(self, problem_description: str, mode: str, template_type: str = 'auto',
+            timeout: Optional[float] = None) -> Optional[Dict]:
+        """Return the prefetched result for this request, or None when there is none
+
+        A prefetch still in flight is waited on for up to timeout seconds, since it
+        has a head start on any new request.
+        """
+        if mode == SOLUTION:
+            if template_type == 'auto':
+                template_type = self.mentor._determine_template_type(problem_description)
+            request = (SOLUTION, template_type)
+        else:
+            request = CRITICAL_THINKING
+
+        with self._lock:
+            session = self._session()
+            entry = session['entries'].get(prefetch_key(problem_description)) if session else None
+            future = entry['futures'].get(request) if entry is not None else None
+        if future is None or entry['cancelled'].is_set():
+            return None
+
+        try:
+            result = future.result(timeout=timeout)
+        except (CancelledError, TimeoutError):
+            return None
+
+        if not result or not result.get('success'):
+            return None
+        with self._lock:
+            self.hits += 1
+        return {**result, 'prefetched': True}
+
+    def cancel(self, problem_description: str) -> bool:
+        """Drop the prefetch for an analysis; running calls finish but their results are discarded"""
+        with self._lock:
+            session = self._session()
+            if session is None:
+                return False
+            entry = session['entries'].pop(prefetch_key(problem_description), None)
+            if entry is None:
+                return False
+            self._cancel(entry)
+        return True
+
+    def _cancel(self, entry: Dict):
+        entry['cancelled'].set()
+        for future in entry['futures'].values():
+            future.cancel()
+        self.cancelled += 1
+
+    def cancel_all(self):
+        """Cancel every session's prefetches"""
+        with self._lock:
+            for session in self._sessions.values():
+                while session['entries']:
+                    _, entry = session['entries'].popitem(last=False)
+                    self._cancel(entry)
+
+    def stats(self) -> Dict:
+        """Totals across sessions, with the budget of the current session"""
+        with self._lock:
+            current = self._sessions.get(_current_session.get())
+            return {
+                'sessions': len(self._sessions),
+                'analyses': sum(len(session['entries']) for session in self._sessions.values()),
+                'started': self.started,
+                'hits': self.hits,
+                'over_budget': self.over_budget,
+                'cancelled': self.cancelled,
+                'budget_per_hour': self.budget_per_hour,
+                'budget_used': len(current['spent']) if current else 0
+            }
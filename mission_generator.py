@@ -1,37 +1,53 @@
-from typing import Optional, Dict
-import google.generativeai as genai
+from typing import Callable, Optional, Dict
 from config import Config
+from gemini_client import get_client
+from concurrency import run_concurrently
+from structured_output import MissionOutput, StructuredOutputError, json_generation_config
+from section_parser import SectionParser
+
+
+MISSION_SECTIONS = SectionParser({
+    'mission_statement': ['MISSION STATEMENT:', 'Mission Statement:'],
+    'problem_definition': ['PROBLEM DEFINITION:', 'Problem Definition:'],
+    'goal': ['GOAL:', 'Goal:'],
+    'expected_impact': ['EXPECTED IMPACT:', 'Expected Impact:'],
+    'action_steps': ['ACTION STEPS:', 'Action Steps:']
+})
 
 
 class MissionStatementGenerator:
     """Converts user problem descriptions into formalized mission statements"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, structured_output: Optional[bool] = None):
         self.api_key = api_key or Config.GEMINI_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(Config.TEXT_MODEL)
+        self.client = get_client(Config.TEXT_MODEL, self.api_key, task='mission')
+        self.structured_output = (Config.STRUCTURED_OUTPUT if structured_output is None 
+                                  else structured_output)
     
     def generate_mission_statement(self, problem_description: str, 
                                    context: Optional[str] = None) -> Dict:
         prompt = self._create_mission_prompt(problem_description, context)
         
         try:
-            response = self.model.generate_content(prompt)
-            result = response.text
-            
-            # Parse the structured response
-            parsed = self._parse_mission_response(result)
+            response = self.client.generate(prompt, generation_config=self._generation_config())
+            return self._build_mission_result(problem_description, response.text)
             
+        except Exception as e:
             return {
-                'success': True,
-                'original_description': problem_description,
-                'mission_statement': parsed.get('mission_statement', result),
-                'problem_definition': parsed.get('problem_definition', ''),
-                'goal': parsed.get('goal', ''),
-                'expected_impact': parsed.get('expected_impact', ''),
-                'action_steps': parsed.get('action_steps', []),
-                'full_response': result
+                'success': False,
+                'error': str(e),
+                'original_description': problem_description
             }
+    
+    async def generate_mission_statement_async(self, problem_description: str, 
+                                               context: Optional[str] = None) -> Dict:
+        prompt = self._create_mission_prompt(problem_description, context)
+        
+        try:
+            response = await self.client.generate_async(
+                prompt, generation_config=self._generation_config()
+            )
+            return self._build_mission_result(problem_description, response.text)
             
         except Exception as e:
             return {
@@ -40,6 +56,21 @@ class MissionStatementGenerator:
                 'original_description': problem_description
             }
     
+    def _build_mission_result(self, problem_description: str, result: str) -> Dict:
+        # Parse the structured response
+        parsed = self._parse_mission_output(result)
+        
+        return {
+            'success': True,
+            'original_description': problem_description,
+            'mission_statement': parsed.get('mission_statement', result),
+            'problem_definition': parsed.get('problem_definition', ''),
+            'goal': parsed.get('goal', ''),
+            'expected_impact': parsed.get('expected_impact', ''),
+            'action_steps': parsed.get('action_steps', []),
+            'full_response': result
+        }
+    
     def _create_mission_prompt(self, problem_description: str, 
                               context: Optional[str] = None) -> str:
         base_prompt = f"""You are an expert at converting community problems into actionable, 
@@ -54,7 +85,18 @@ Problem Description: "{problem_description}"
         if context:
             base_prompt += f"\nAdditional Context: {context}\n"
         
-        base_prompt += """
+        if self.structured_output:
+            base_prompt += """
+Respond with a single JSON object:
+- "mission_statement": a clear, inspiring statement (2-3 sentences) that defines the core
+  problem, states the goal/objective and highlights the expected community impact
+- "problem_definition": a precise definition of the issue (1-2 sentences)
+- "goal": the specific, measurable outcome we're working toward
+- "expected_impact": how this will benefit the community
+- "action_steps": 3-5 key steps to address this problem
+"""
+        else:
+            base_prompt += """
 Please provide:
 
 1. MISSION STATEMENT: A clear, inspiring statement (2-3 sentences) that:
@@ -74,53 +116,57 @@ Format your response clearly with these headers."""
         
         return base_prompt
     
+    def _generation_config(self) -> Optional[Dict]:
+        if not self.structured_output:
+            return None
+        return json_generation_config(MissionOutput.SCHEMA)
+    
+    def _parse_mission_output(self, response: str) -> Dict:
+        """Validate the JSON response, scraping headers only when that fails"""
+        if self.structured_output:
+            try:
+                output = MissionOutput.from_json(response)
+                return {
+                    'mission_statement': output.mission_statement,
+                    'problem_definition': output.problem_definition,
+                    'goal': output.goal,
+                    'expected_impact': output.expected_impact,
+                    'action_steps': output.action_steps
+                }
+            except StructuredOutputError:
+                pass
+        
+        return self._parse_mission_response(response)
+    
     def _parse_mission_response(self, response: str) -> Dict:
         parsed = {}
         
-        sections = {
-            'mission_statement': ['MISSION STATEMENT:', 'Mission Statement:'],
-            'problem_definition': ['PROBLEM DEFINITION:', 'Problem Definition:'],
-            'goal': ['GOAL:', 'Goal:'],
-            'expected_impact': ['EXPECTED IMPACT:', 'Expected Impact:'],
-            'action_steps': ['ACTION STEPS:', 'Action Steps:']
-        }
-        
-        for key, headers in sections.items():
-            for header in headers:
-                if header in response:
-                    # Extract text after this header and before the next section
-                    start_idx = response.find(header) + len(header)
-                    remaining = response[start_idx:]
-                    
-                    # Find the next header
-                    next_header_idx = len(remaining)
-                    for other_key, other_headers in sections.items():
-                        if other_key != key:
-                            for other_header in other_headers:
-                                idx = remaining.find(other_header)
-                                if idx != -1 and idx < next_header_idx:
-                                    next_header_idx = idx
-                    
-                    content = remaining[:next_header_idx].strip()
-                    
-                    # Special handling for action steps (convert to list)
-                    if key == 'action_steps':
-                        steps = [line.strip() for line in content.split('\n') 
-                                if line.strip() and (line.strip()[0].isdigit() or 
-                                line.strip().startswith('-') or line.strip().startswith('•'))]
-                        parsed[key] = steps
-                    else:
-                        parsed[key] = content
-                    break
+        for key, content in MISSION_SECTIONS.parse(response).items():
+            # Special handling for action steps (convert to list)
+            if key == 'action_steps':
+                steps = [line.strip() for line in content.split('\n') 
+                        if line.strip() and (line.strip()[0].isdigit() or 
+                        line.strip().startswith('-') or line.strip().startswith('•'))]
+                parsed[key] = steps
+            else:
+                parsed[key] = content
         
         return parsed
     
-    def generate_batch_missions(self, problem_descriptions: list) -> list:
-        results = []
-        for description in problem_descriptions:
-            result = self.generate_mission_statement(description)
-            results.append(result)
-        return results
+    def generate_batch_missions(self, problem_descriptions: list,
+                                max_workers: Optional[int] = None,
+                                on_result: Optional[Callable[[int, Dict], None]] = None) -> list:
+        return run_concurrently(
+            self.generate_mission_statement,
+            problem_descriptions,
+            max_workers=max_workers,
+            on_result=on_result,
+            error_result=lambda description, e: {
+                'success': False,
+                'error': str(e),
+                'original_description': description
+            }
+        )
 
 
 # Convenience function
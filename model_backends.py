@@ -0,0 +1,516 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from config import Config
+from chat_session import estimate_tokens
+from response_cache import make_cache_key
+
+
+class Usage(NamedTuple):
+    prompt_token_count: int
+    candidates_token_count: int
+
+
+class TextResponse:
+    """Minimal response object for backends that do not talk to Gemini"""
+
+    def __init__(self, text: str, usage_metadata: Optional[Usage] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+# Gemini bills a small image as a fixed number of tokens
+FAKE_IMAGE_TOKENS = 258
+
+
+class InjectedError(RuntimeError):
+    """Raised by FaultInjectingBackend in place of a real API failure"""
+
+
+class ReplayMissError(KeyError):
+    """Raised by ReplayBackend when a request was never recorded"""
+
+
+def _prompt_text(contents, system_instruction: Optional[str] = None) -> str:
+    """All text parts of a request, including multi-turn chat messages"""
+    texts = [system_instruction] if system_instruction else []
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    for part in parts:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict) and 'parts' in part:
+            texts.extend(text for text in part['parts'] if isinstance(text, str))
+    return '\n'.join(texts)
+
+
+def _chunks(text: str, size: int = 40) -> Iterator[str]:
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def _request_options(timeout: Optional[float]) -> Dict:
+    """SDK request timeout, so a request the caller gave up on does not run on"""
+    return {'request_options': {'timeout': timeout}} if timeout else {}
+
+
+class GeminiBackend:
+    """Live Gemini calls through google-generativeai"""
+
+    # live: answers are real model output, fit to learn from and keep
+    # cacheable: answers may be served from the response cache instead of this backend
+    live = True
+    cacheable = True
+
+    def __init__(self, api_key: Optional[str] = None):
+        import google.generativeai as genai
+
+        self._genai = genai
+        genai.configure(api_key=api_key or Config.GEMINI_API_KEY)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model_name: str, system_instruction: Optional[str]):
+        with self._lock:
+            model = self._models.get((model_name, system_instruction))
+            if model is None:
+                if system_instruction:
+                    model = self._genai.GenerativeModel(model_name,
+                                                        system_instruction=system_instruction)
+                else:
+                    model = self._genai.GenerativeModel(model_name)
+                self._models[(model_name, system_instruction)] = model
+            return model
+
+    def generate(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                 system_instruction: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        return self._model(model_name, system_instruction).generate_content(
+            contents, generation_config=generation_config, **_request_options(timeout)
+        )
+
+    async def generate_async(self, model_name: str, contents,
+                             generation_config: Optional[Dict] = None,
+                             system_instruction: Optional[str] = None,
+                             timeout: Optional[float] = None):
+        return await self._model(model_name, system_instruction).generate_content_async(
+            contents, generation_config=generation_config, **_request_options(timeout)
+        )
+
+    def generate_stream(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                        system_instruction: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Iterator[str]:
+        response = self._model(model_name, system_instruction).generate_content(
+            contents, generation_config=generation_config, stream=True,
+            **_request_options(timeout)
+        )
+        for chunk in response:
+            # .text raises on chunks without parts, such as a final safety or finish-reason chunk
+            if chunk.parts and chunk.text:
+                yield chunk.text
+
+
+class FakeBackend:
+    """Deterministic offline stand-in that answers in the shape each prompt asks for
+
+    Schema-constrained requests get JSON built from the schema, prompts that show
+    a JSON example get that example filled in, and prompts that list section
+    headers get every header back with placeholder items. Choices such as the
+    category are picked from a hash of the prompt, so the same request always
+    gets the same answer. Add rules as (substring, text or callable) pairs to
+    override the answer for matching prompts.
+    """
+
+    live = False
+    cacheable = False
+
+    def __init__(self, rules: Optional[List[Tuple[str, object]]] = None, seed: int = 0):
+        self.rules = list(rules or [])
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def respond(self, contents, generation_config: Optional[Dict] = None,
+                system_instruction: Optional[str] = None) -> str:
+        with self._lock:
+            self.calls += 1
+
+        prompt = _prompt_text(contents, system_instruction)
+        for marker, answer in self.rules:
+            if marker in prompt:
+                return answer(prompt) if callable(answer) else answer
+
+        rng = random.Random(f"{self.seed}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}")
+        generation_config = generation_config or {}
+
+        schema = generation_config.get('response_schema')
+        if schema:
+            return json.dumps(self._from_schema(schema, 'response', rng, self._image_ids(contents)))
+        if generation_config.get('response_mime_type') == 'application/json':
+            return json.dumps(self._from_example(prompt, rng))
+        if 'ID | CATEGORY | CONFIDENCE' in prompt:
+            return self._packed_lines(prompt, rng)
+        return self._from_headers(prompt, rng)
+
+    def _image_ids(self, contents) -> List[int]:
+        labels = [part for part in contents if isinstance(part, str)] if isinstance(contents, list) else []
+        return [int(match) for label in labels for match in re.findall(r'^Image \[(\d+)\]:$', label)]
+
+    def _from_schema(self, schema: Dict, name: str, rng: random.Random, image_ids: List[int]):
+        kind = schema.get('type')
+        if kind == 'object':
+            return {key: self._from_schema(value, key, rng, image_ids)
+                    for key, value in schema.get('properties', {}).items()}
+        if kind == 'array':
+            item = schema.get('items', {})
+            if name == 'images' and image_ids:
+                # Packed vision requests expect exactly one entry per labelled image
+                return [{**self._from_schema(item, 'image', rng, image_ids), 'id': image_id}
+                        for image_id in image_ids]
+            return [self._from_schema(item, name, rng, image_ids) for _ in range(3)]
+        if 'enum' in schema:
+            return rng.choice(schema['enum'])
+        if kind == 'integer':
+            return rng.randint(1, 5)
+        if kind in ('number', 'float'):
+            return round(rng.random(), 2)
+        if kind == 'boolean':
+            return rng.random() < 0.5
+        return f"Sample {name.replace('_', ' ')} {rng.randint(1, 99)}"
+
+    def _from_example(self, prompt: str, rng: random.Random) -> Dict:
+        """Fill in the JSON example a prompt shows, choosing among listed options"""
+        start = prompt.find('{')
+        end = prompt.rfind('}')
+        try:
+            example = json.loads(prompt[start:end + 1])
+        except ValueError:
+            return {'response': f"Sample response {rng.randint(1, 99)}"}
+        return self._fill_example(example, 'response', rng)
+
+    def _fill_example(self, value, name: str, rng: random.Random):
+        if isinstance(value, dict):
+            return {key: self._fill_example(item, key, rng) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._fill_example(value[0], name, rng) for _ in range(3)] if value else []
+        options = self._options(str(value))
+        if options:
+            return rng.choice(options)
+        return f"Sample {name.replace('_', ' ')} {rng.randint(1, 99)}"
+
+    def _options(self, text: str) -> List[str]:
+        """Choices offered in text such as 'Low|Medium|High' or 'One of A, B, C'"""
+        text = re.sub(r'^\s*\[?\s*(?:choose:|one of)\s*', '', text.strip(), flags=re.IGNORECASE)
+        text = text.rstrip(']').strip()
+        for separator in ('|', '/', ','):
+            if separator in text:
+                options = [re.sub(r'^or\s+', '', option.strip()) for option in text.split(separator)]
+                if all(option and len(option.split()) == 1 for option in options):
+                    return options
+        return []
+
+    def _packed_lines(self, prompt: str, rng: random.Random) -> str:
+        match = re.search(r'where CATEGORY is one of (.+?) and', prompt)
+        categories = [category.strip() for category in match.group(1).split(',')] if match else Config.CATEGORIES
+        ids = re.findall(r'^\[(\d+)\] "', prompt, re.MULTILINE)
+        return '\n'.join(
+            f"{item_id} | {rng.choice(categories)} | {rng.choice(['High', 'Medium', 'Low'])}"
+            for item_id in ids
+        )
+
+    def _from_headers(self, prompt: str, rng: random.Random) -> str:
+        """Answer every 'HEADER:' line of the prompt, or with a sentence when there are none"""
+        sections = []
+        seen = set()
+        for match in re.finditer(r'^\s*(?:\d+\.\s*)?([A-Z][A-Z /&-]+[A-Z]):(.*)$', prompt, re.MULTILINE):
+            header, hint = match.group(1), match.group(2)
+            if header in seen:
+                continue
+            seen.add(header)
+
+            options = self._options(hint)
+            if options:
+                sections.append(f"{header}: {rng.choice(options)}")
+            else:
+                items = '\n'.join(f"{number}. Sample {header.lower()} point {number}"
+                                  for number in range(1, 4))
+                sections.append(f"{header}:\n{items}")
+
+        if not sections:
+            return f"Sample reply {rng.randint(1, 99)}: what would success look like for you?"
+        return '\n\n'.join(sections)
+
+    def generate(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                 system_instruction: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        text = self.respond(contents, generation_config, system_instruction)
+        return TextResponse(text, self._usage(contents, system_instruction, text))
+
+    def _usage(self, contents, system_instruction: Optional[str], text: str) -> Usage:
+        """Usage as Gemini would report it, so telemetry has tokens to count offline"""
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        images = sum(1 for part in parts
+                     if not isinstance(part, str) and not (isinstance(part, dict) and 'parts' in part))
+        prompt = estimate_tokens(_prompt_text(contents, system_instruction))
+        return Usage(prompt + images * FAKE_IMAGE_TOKENS, estimate_tokens(text))
+
+    async def generate_async(self, model_name: str, contents,
+                             generation_config: Optional[Dict] = None,
+                             system_instruction: Optional[str] = None,
+                             timeout: Optional[float] = None):
+        return self.generate(model_name, contents, generation_config, system_instruction)
+
+    def generate_stream(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                        system_instruction: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Iterator[str]:
+        yield from _chunks(self.respond(contents, generation_config, system_instruction))
+
+
+class ResponseRecording:
+    """Append-only JSONL file of request keys and response texts"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._responses = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry['key']] = entry['text']
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._responses.get(key)
+
+    def add(self, key: str, model_name: str, text: str):
+        with self._lock:
+            if self._responses.get(key) == text:
+                return
+            self._responses[key] = text
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'model': model_name, 'text': text}) + '\n')
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._responses)
+
+
+def _request_key(model_name: str, contents, generation_config: Optional[Dict],
+                 system_instruction: Optional[str]) -> str:
+    parts = [system_instruction, contents] if system_instruction else contents
+    return make_cache_key(model_name, parts, generation_config)
+
+
+class RecordingBackend:
+    """Passes requests to another backend and saves every response for later replay"""
+
+    # A cache hit would never reach the recording, so replay would later miss it
+    cacheable = False
+
+    def __init__(self, inner, path: Optional[str] = None):
+        self.inner = inner
+        self.recording = ResponseRecording(path or Config.BACKEND_RECORDING_PATH)
+
+    @property
+    def live(self) -> bool:
+        return self.inner.live
+
+    def generate(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                 system_instruction: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        response = self.inner.generate(model_name, contents, generation_config, system_instruction,
+                                       timeout)
+        self.recording.add(_request_key(model_name, contents, generation_config, system_instruction),
+                           model_name, response.text)
+        return response
+
+    async def generate_async(self, model_name: str, contents,
+                             generation_config: Optional[Dict] = None,
+                             system_instruction: Optional[str] = None,
+                             timeout: Optional[float] = None):
+        response = await self.inner.generate_async(model_name, contents, generation_config,
+                                                   system_instruction, timeout)
+        self.recording.add(_request_key(model_name, contents, generation_config, system_instruction),
+                           model_name, response.text)
+        return response
+
+    def generate_stream(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                        system_instruction: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Iterator[str]:
+        parts = []
+        for chunk in self.inner.generate_stream(model_name, contents, generation_config,
+                                                system_instruction, timeout):
+            parts.append(chunk)
+            yield chunk
+        self.recording.add(_request_key(model_name, contents, generation_config, system_instruction),
+                           model_name, ''.join(parts))
+
+
+class ReplayBackend:
+    """Serves recorded responses; unrecorded requests fail or go to a fallback backend"""
+
+    live = False
+    cacheable = False
+
+    def __init__(self, path: Optional[str] = None, fallback=None):
+        self.recording = ResponseRecording(path or Config.BACKEND_RECORDING_PATH)
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+
+    def _replay(self, model_name: str, contents, generation_config: Optional[Dict],
+                system_instruction: Optional[str]) -> Optional[str]:
+        text = self.recording.get(
+            _request_key(model_name, contents, generation_config, system_instruction)
+        )
+        if text is not None:
+            self.hits += 1
+            return text
+
+        self.misses += 1
+        if self.fallback is None:
+            raise ReplayMissError(f"No recorded response for this {model_name} request")
+        return None
+
+    def generate(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                 system_instruction: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        text = self._replay(model_name, contents, generation_config, system_instruction)
+        if text is None:
+            return self.fallback.generate(model_name, contents, generation_config,
+                                          system_instruction, timeout)
+        return TextResponse(text)
+
+    async def generate_async(self, model_name: str, contents,
+                             generation_config: Optional[Dict] = None,
+                             system_instruction: Optional[str] = None,
+                             timeout: Optional[float] = None):
+        text = self._replay(model_name, contents, generation_config, system_instruction)
+        if text is None:
+            return await self.fallback.generate_async(model_name, contents, generation_config,
+                                                      system_instruction, timeout)
+        return TextResponse(text)
+
+    def generate_stream(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                        system_instruction: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Iterator[str]:
+        text = self._replay(model_name, contents, generation_config, system_instruction)
+        if text is None:
+            yield from self.fallback.generate_stream(model_name, contents, generation_config,
+                                                     system_instruction, timeout)
+            return
+        yield from _chunks(text)
+
+
+class FaultInjectingBackend:
+    """Adds latency, heavy-tailed jitter and random failures in front of another backend
+
+    Each call waits latency_ms plus an exponentially distributed extra delay
+    with mean jitter_ms, which reproduces the long p99 tail of a real API, and
+    then fails with probability error_rate.
+    """
+
+    def __init__(self, inner, latency_ms: Optional[float] = None,
+                 jitter_ms: Optional[float] = None, error_rate: Optional[float] = None,
+                 seed: Optional[int] = None, sleep: Callable[[float], None] = time.sleep):
+        self.inner = inner
+        self.latency_ms = Config.BACKEND_LATENCY_MS if latency_ms is None else latency_ms
+        self.jitter_ms = Config.BACKEND_JITTER_MS if jitter_ms is None else jitter_ms
+        self.error_rate = Config.BACKEND_ERROR_RATE if error_rate is None else error_rate
+        self._sleep = sleep
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.injected_errors = 0
+
+    @property
+    def live(self) -> bool:
+        return self.inner.live
+
+    @property
+    def cacheable(self) -> bool:
+        return self.inner.cacheable
+
+    def _draw(self) -> Tuple[float, bool]:
+        """Return (delay in seconds, whether this call fails)"""
+        with self._lock:
+            jitter = self._rng.expovariate(1 / self.jitter_ms) if self.jitter_ms > 0 else 0.0
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        return (self.latency_ms + jitter) / 1000, fail
+
+    def _error(self) -> InjectedError:
+        return InjectedError("503 Injected backend error: the service is temporarily unavailable")
+
+    def _outcome(self, timeout: Optional[float]) -> Tuple[float, Optional[InjectedError]]:
+        """Return (seconds to wait, error to raise after waiting) for one call"""
+        delay, fail = self._draw()
+        if timeout is not None and delay > timeout:
+            # Like a real request timeout, the call ends instead of answering late
+            return timeout, InjectedError(f"504 Injected request timeout after {timeout:.1f}s")
+        return delay, self._error() if fail else None
+
+    def generate(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                 system_instruction: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        delay, error = self._outcome(timeout)
+        self._sleep(delay)
+        if error is not None:
+            raise error
+        return self.inner.generate(model_name, contents, generation_config, system_instruction,
+                                   timeout)
+
+    async def generate_async(self, model_name: str, contents,
+                             generation_config: Optional[Dict] = None,
+                             system_instruction: Optional[str] = None,
+                             timeout: Optional[float] = None):
+        delay, error = self._outcome(timeout)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return await self.inner.generate_async(model_name, contents, generation_config,
+                                               system_instruction, timeout)
+
+    def generate_stream(self, model_name: str, contents, generation_config: Optional[Dict] = None,
+                        system_instruction: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Iterator[str]:
+        # The delay models time to first token; later chunks arrive back to back
+        delay, error = self._outcome(timeout)
+        self._sleep(delay)
+        if error is not None:
+            raise error
+        yield from self.inner.generate_stream(model_name, contents, generation_config,
+                                              system_instruction, timeout)
+
+
+BACKENDS = ('gemini', 'fake', 'record', 'replay')
+
+
+def create_backend(name: Optional[str] = None, api_key: Optional[str] = None):
+    """Build the backend named by Config.MODEL_BACKEND, with fault injection when configured"""
+    name = (name or Config.MODEL_BACKEND).lower()
+    if name == 'gemini':
+        backend = GeminiBackend(api_key)
+    elif name == 'fake':
+        backend = FakeBackend(seed=Config.BACKEND_SEED)
+    elif name == 'record':
+        backend = RecordingBackend(GeminiBackend(api_key))
+    elif name == 'replay':
+        backend = ReplayBackend()
+    else:
+        raise ValueError(f"Unknown model backend: {name} (expected one of {', '.join(BACKENDS)})")
+
+    if Config.BACKEND_LATENCY_MS or Config.BACKEND_JITTER_MS or Config.BACKEND_ERROR_RATE:
+        backend = FaultInjectingBackend(backend, seed=Config.BACKEND_SEED)
+    return backend
@@ -0,0 +1,252 @@
+import io
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from config import Config
+from image_input import ImageSource, is_pil_image, read_image_bytes
+
+HASH_BITS = 64
+
+
+def _grayscale(image: ImageSource, size: Tuple[int, int]) -> np.ndarray:
+    from PIL import Image, ImageOps
+
+    if is_pil_image(image):
+        img = image
+    else:
+        img = Image.open(io.BytesIO(read_image_bytes(image)))
+        # JPEG decoders can scale down by up to 8x, far cheaper than a full decode
+        img.draft('L', (size[0] * 8, size[1] * 8))
+
+    # Phones store rotation in EXIF, so the same shot must hash the same either way up
+    img = ImageOps.exif_transpose(img).convert('L').resize(size, Image.LANCZOS)
+    return np.asarray(img, dtype=np.float64)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), 'big')
+
+
+def dhash(image: ImageSource) -> int:
+    """64-bit difference hash: whether each pixel is brighter than its right neighbour"""
+    pixels = _grayscale(image, (9, 8))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def phash(image: ImageSource) -> int:
+    """64-bit DCT hash: low-frequency coefficients compared against their median"""
+    pixels = _grayscale(image, (32, 32))
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8]
+    # The DC term only tracks overall brightness, so leave it out of the median
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+HASH_FUNCTIONS = {'dhash': dhash, 'phash': phash}
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHash:
+    """Multi-index hashing over 64-bit hashes for near-duplicate lookups
+
+    The hash is split into chunks, each with its own exact-match table. Two
+    hashes within distance r differ by at most r // chunks bits in one of
+    their chunks, so only buckets that close to the query are scanned and
+    verified, instead of every stored hash.
+    """
+
+    def __init__(self, chunks: int = 4):
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self._entries = []
+        self._probe_masks = {}
+
+    def _split(self, value: int) -> List[int]:
+        return [(value >> (chunk * self.chunk_bits)) & self._chunk_mask
+                for chunk in range(self.chunks)]
+
+    def _masks(self, radius: int) -> List[int]:
+        """Every chunk-sized XOR mask with at most radius bits set"""
+        masks = self._probe_masks.get(radius)
+        if masks is None:
+            masks = [
+                sum(1 << bit for bit in bits)
+                for flipped in range(radius + 1)
+                for bits in itertools.combinations(range(self.chunk_bits), flipped)
+            ]
+            self._probe_masks[radius] = masks
+        return masks
+
+    def add(self, value: int, item):
+        position = len(self._entries)
+        self._entries.append((value, item))
+        for table, key in zip(self._tables, self._split(value)):
+            table.setdefault(key, []).append(position)
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, object]]:
+        """Return (distance, item) for every stored hash within max_distance, closest first"""
+        masks = self._masks(max_distance // self.chunks)
+
+        candidates = set()
+        for table, key in zip(self._tables, self._split(value)):
+            for mask in masks:
+                bucket = table.get(key ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+
+        found = []
+        for position in candidates:
+            stored, item = self._entries[position]
+            distance = hamming_distance(value, stored)
+            if distance <= max_distance:
+                found.append((distance, item))
+
+        found.sort(key=lambda match: match[0])
+        return found
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def group_near_duplicates(hashes: Sequence[Optional[int]], max_distance: int) -> List[List[int]]:
+    """Group indices whose hashes lie within max_distance of a group's first member"""
+    seen = MultiIndexHash()
+    groups = []
+    for position, value in enumerate(hashes):
+        matches = seen.search(value, max_distance) if value is not None else []
+        if matches:
+            groups[matches[0][1]].append(position)
+        else:
+            if value is not None:
+                seen.add(value, len(groups))
+            groups.append([position])
+    return groups
+
+
+class ImageHashIndex:
+    """Persistent index of analyzed images keyed by perceptual hash"""
+
+    def __init__(self, db_path: Optional[str] = None, max_distance: Optional[int] = None,
+                 method: Optional[str] = None):
+        self.db_path = db_path or Config.IMAGE_HASH_DB_PATH
+        self.max_distance = Config.IMAGE_DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+        self.method = method or Config.IMAGE_HASH_METHOD
+        if self.method not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown hash method: {self.method}")
+
+        self.lookups = 0
+        self.hits = 0
+        self._index = MultiIndexHash()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS images (
+            id INTEGER PRIMARY KEY,
+            method TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            source TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )""")
+        self._conn.commit()
+
+        # Only hashes and scopes live in memory; results are read back on a match
+        rows = self._conn.execute(
+            "SELECT id, hash, scope FROM images WHERE method = ?", (self.method,)
+        ).fetchall()
+        for row_id, value, scope in rows:
+            self._index.add(int(value, 16), (row_id, scope))
+
+    def hash_image(self, image: ImageSource) -> int:
+        return HASH_FUNCTIONS[self.method](image)
+
+    def find(self, image_hash: int, scope: str) -> Optional[Tuple[int, str, Dict]]:
+        """Return (distance, source, result) of the closest analyzed image in scope"""
+        with self._lock:
+            self.lookups += 1
+            matches = [
+                (distance, row_id)
+                for distance, (row_id, row_scope) in self._index.search(image_hash, self.max_distance)
+                if row_scope == scope
+            ]
+            if not matches:
+                return None
+
+            distance, row_id = matches[0]
+            source, result = self._conn.execute(
+                "SELECT source, result FROM images WHERE id = ?", (row_id,)
+            ).fetchone()
+            self.hits += 1
+
+        return distance, source, json.loads(result)
+
+    def add(self, image_hash: int, scope: str, source: str, result: Dict):
+        """Remember a successful result; unserializable values such as raw responses are dropped"""
+        stored = {key: value for key, value in result.items() if key != 'raw_response'}
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO images (method, hash, scope, source, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.method, f"{image_hash:016x}", scope, source,
+                 json.dumps(stored, default=str), time.time())
+            )
+            self._conn.commit()
+            self._index.add(image_hash, (cursor.lastrowid, scope))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'method': self.method,
+                'max_distance': self.max_distance,
+                'images': len(self._index),
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_hash_index() -> Optional[ImageHashIndex]:
+    """Return the process-wide index built from Config, or None when deduplication is disabled"""
+    global _default_index
+
+    if not Config.IMAGE_DEDUP_ENABLED:
+        return None
+
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = ImageHashIndex()
+        return _default_index
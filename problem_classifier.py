@@ -1,37 +1,66 @@
-from typing import Dict, Optional, List
-import google.generativeai as genai
+import re
+from typing import Callable, Dict, Optional, List, Tuple
 from config import Config
+from gemini_client import get_client
+from concurrency import run_concurrently
+from fast_classifier import FastPathRouter
+from structured_output import ClassificationOutput, StructuredOutputError, json_generation_config
+from section_parser import SectionParser
+
+
+CLASSIFICATION_SECTIONS = SectionParser({
+    'category': ['PRIMARY CATEGORY:', 'Primary Category:', 'CATEGORY:', 'Category:'],
+    'confidence': ['CONFIDENCE:', 'Confidence:'],
+    'reasoning': ['REASONING:', 'Reasoning:']
+})
 
 
 class ProblemClassifier:
     """Classifies community problems into predefined categories"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, fast_path: Optional[bool] = None,
+                 structured_output: Optional[bool] = None):
         self.api_key = api_key or Config.GEMINI_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(Config.TEXT_MODEL)
+        self.client = get_client(Config.TEXT_MODEL, self.api_key, task='classification')
         self.categories = Config.CATEGORIES
+        self.structured_output = (Config.STRUCTURED_OUTPUT if structured_output is None 
+                                  else structured_output)
+        
+        use_fast_path = Config.FAST_CLASSIFIER_ENABLED if fast_path is None else fast_path
+        self.fast_path = FastPathRouter(self.categories) if use_fast_path else None
     
     def classify_problem(self, problem_description: str, 
                         use_reasoning: bool = True) -> Dict:
+        fast_result = self._classify_fast_path(problem_description)
+        if fast_result is not None:
+            return fast_result
+        
         prompt = self._create_classification_prompt(problem_description, use_reasoning)
         
         try:
-            response = self.model.generate_content(prompt)
-            result = response.text
-            
-            # Parse the classification
-            category, confidence, reasoning = self._parse_classification(result)
+            response = self.client.generate(prompt, generation_config=self._generation_config())
+            return self._build_classification_result(problem_description, response.text)
             
+        except Exception as e:
             return {
-                'success': True,
-                'problem_description': problem_description,
-                'category': category,
-                'confidence': confidence,
-                'reasoning': reasoning,
-                'all_categories': self.categories,
-                'full_response': result
+                'success': False,
+                'error': str(e),
+                'problem_description': problem_description
             }
+    
+    async def classify_problem_async(self, problem_description: str, 
+                                     use_reasoning: bool = True) -> Dict:
+        fast_result = self._classify_fast_path(problem_description)
+        if fast_result is not None:
+            return fast_result
+        
+        prompt = self._create_classification_prompt(problem_description, use_reasoning)
+        
+        try:
+            response = await self.client.generate_async(
+                prompt, generation_config=self._generation_config()
+            )
+            return self._build_classification_result(problem_description, response.text)
             
         except Exception as e:
             return {
@@ -40,7 +69,103 @@ class ProblemClassifier:
                 'problem_description': problem_description
             }
     
+    def _record_label(self, problem_description: str, category: str, confidence: str):
+        # Fake or replayed answers must never train the fast path
+        if self.fast_path is not None and confidence == 'High' and self.client.live:
+            self.fast_path.record_label(problem_description, category)
+    
+    def _build_classification_result(self, problem_description: str, result: str) -> Dict:
+        # Parse the classification
+        category, confidence, reasoning = self._parse_classification_output(result)
+        
+        # Confident LLM labels become training data for the local fast path
+        self._record_label(problem_description, category, confidence)
+        
+        return {
+            'success': True,
+            'problem_description': problem_description,
+            'category': category,
+            'confidence': confidence,
+            'reasoning': reasoning,
+            'all_categories': self.categories,
+            'full_response': result,
+            'source': 'llm'
+        }
+    
+    def _classify_fast_path(self, problem_description: str) -> Optional[Dict]:
+        """Answer locally when the fast classifier clears its confidence threshold"""
+        if self.fast_path is None:
+            return None
+        
+        routed = self.fast_path.route(problem_description)
+        if routed is None:
+            return None
+        
+        category, probability = routed
+        return {
+            'success': True,
+            'problem_description': problem_description,
+            'category': category,
+            'confidence': 'High' if probability >= 0.95 else 'Medium',
+            'reasoning': f"Matched {category} keywords in the local classifier "
+                         f"(probability {probability:.2f}).",
+            'all_categories': self.categories,
+            'full_response': '',
+            'source': 'fast_path',
+            'probability': probability
+        }
+    
+    def fast_path_stats(self) -> Dict:
+        if self.fast_path is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.fast_path.stats()}
+    
+    def guess_category(self, text: str) -> Optional[str]:
+        """Best local guess however unsure, for work that starts before classification ends"""
+        if self.fast_path is None:
+            return None
+        return self.fast_path.model.predict(text)[0]
+    
     def classify_with_vision_analysis(self, vision_analysis: str) -> Dict:
+        prompt = self._create_vision_classification_prompt(vision_analysis)
+        
+        try:
+            response = self.client.generate(prompt, generation_config=self._generation_config())
+            return self._build_vision_classification_result(response.text)
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    async def classify_with_vision_analysis_async(self, vision_analysis: str) -> Dict:
+        prompt = self._create_vision_classification_prompt(vision_analysis)
+        
+        try:
+            response = await self.client.generate_async(
+                prompt, generation_config=self._generation_config()
+            )
+            return self._build_vision_classification_result(response.text)
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _build_vision_classification_result(self, result: str) -> Dict:
+        category, confidence, reasoning = self._parse_classification_output(result)
+        
+        return {
+            'success': True,
+            'category': category,
+            'confidence': confidence,
+            'reasoning': reasoning,
+            'source': 'vision_analysis'
+        }
+    
+    def _create_vision_classification_prompt(self, vision_analysis: str) -> str:
         prompt = f"""You are an expert classifier that categorizes community problems into 
 three domains: Environment, Health, and Education. You provide accurate classifications with clear reasoning.
 
@@ -53,32 +178,24 @@ Classify the primary issue into one of these categories:
 - Environment
 - Health
 - Education
-
+"""
+        
+        if self.structured_output:
+            prompt += """
+Respond with a JSON object containing the primary category, your confidence
+(High, Medium or Low) and your reasoning for why this category fits best.
+"""
+        else:
+            prompt += """
 Provide:
 1. PRIMARY CATEGORY: [Your classification]
 2. CONFIDENCE: [High/Medium/Low]
 3. REASONING: [Why this category fits best]
-
-If multiple categories apply, choose the most dominant one."""
+"""
         
-        try:
-            response = self.model.generate_content(prompt)
-            result = response.text
-            category, confidence, reasoning = self._parse_classification(result)
-            
-            return {
-                'success': True,
-                'category': category,
-                'confidence': confidence,
-                'reasoning': reasoning,
-                'source': 'vision_analysis'
-            }
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
+        prompt += "\nIf multiple categories apply, choose the most dominant one."
+        
+        return prompt
     
     def _create_classification_prompt(self, problem_description: str, 
                                      use_reasoning: bool) -> str:
@@ -94,15 +211,22 @@ Categories and their scope:
 
 Problem to classify:
 "{problem_description}"
-
+"""
+        
+        if self.structured_output:
+            prompt += "\nRespond with a JSON object containing the category and your confidence"
+            prompt += (", and your reasoning for why this category is most appropriate.\n"
+                       if use_reasoning else ".\n")
+        else:
+            prompt += """
 Provide your response in this format:
 
 PRIMARY CATEGORY: [Choose: Environment, Health, or Education]
 CONFIDENCE: [High, Medium, or Low]
 """
-        
-        if use_reasoning:
-            prompt += "REASONING: [Explain why this category is most appropriate]\n"
+            
+            if use_reasoning:
+                prompt += "REASONING: [Explain why this category is most appropriate]\n"
         
         prompt += "\nChoose only ONE primary category, even if the problem touches multiple areas."
         
@@ -120,31 +244,46 @@ CONFIDENCE: [High, Medium, or Low]
         
         return '\n'.join(descriptions)
     
+    def _generation_config(self) -> Optional[Dict]:
+        if not self.structured_output:
+            return None
+        return json_generation_config(ClassificationOutput.schema(self.categories))
+    
+    def _parse_classification_output(self, response: str) -> tuple:
+        """Validate the JSON response, scraping headers only when that fails"""
+        if self.structured_output:
+            try:
+                output = ClassificationOutput.from_json(response, self.categories)
+                return output.category, output.confidence, output.reasoning
+            except StructuredOutputError:
+                pass
+        
+        return self._parse_classification(response)
+    
     def _parse_classification(self, response: str) -> tuple:
         category = None
         confidence = "Unknown"
         reasoning = ""
+        sections = CLASSIFICATION_SECTIONS.parse(response)
         
-        # Extract category
+        # Prefer the category named under the PRIMARY CATEGORY header
+        category_text = sections.get('category', '').lower()
         for cat in self.categories:
-            if cat.lower() in response.lower():
+            if cat.lower() in category_text:
                 category = cat
                 break
         
-        # If no exact match, try to extract from structured response
+        # Otherwise take the first category mentioned anywhere
         if not category:
-            if "PRIMARY CATEGORY:" in response or "Category:" in response:
-                lines = response.split('\n')
-                for line in lines:
-                    if "CATEGORY:" in line.upper():
-                        for cat in self.categories:
-                            if cat.lower() in line.lower():
-                                category = cat
-                                break
-        
-        # Default to first match in text if still not found
+            for cat in self.categories:
+                if cat.lower() in response.lower():
+                    category = cat
+                    break
+        
+        # A response naming no category is a failure, not a vote for the first one
         if not category:
-            category = self.categories[0]  # Default fallback
+            raise ValueError("Classification response names none of the categories: "
+                             f"{', '.join(self.categories)}")
         
         # Extract confidence
         confidence_keywords = {
@@ -153,31 +292,213 @@ CONFIDENCE: [High, Medium, or Low]
             'low': ['low', 'uncertain', 'possibly', 'might']
         }
         
-        response_lower = response.lower()
+        confidence_text = sections.get('confidence', response).lower()
         for level, keywords in confidence_keywords.items():
-            if any(keyword in response_lower for keyword in keywords):
+            if any(keyword in confidence_text for keyword in keywords):
                 confidence = level.capitalize()
                 break
         
         # Extract reasoning
-        reasoning_markers = ['REASONING:', 'Reasoning:', 'because', 'Because']
-        for marker in reasoning_markers:
-            if marker in response:
-                start_idx = response.find(marker)
-                reasoning = response[start_idx:].strip()
-                break
+        reasoning = sections.get('reasoning', '')
+        if not reasoning:
+            for marker in ['because', 'Because']:
+                if marker in response:
+                    reasoning = response[response.find(marker):].strip()
+                    break
         
         if not reasoning:
             reasoning = response
         
         return category, confidence, reasoning
     
-    def classify_batch(self, problem_descriptions: List[str]) -> List[Dict]:
-        results = []
-        for description in problem_descriptions:
-            result = self.classify_problem(description)
-            results.append(result)
+    def classify_batch(self, problem_descriptions: List[str],
+                       max_workers: Optional[int] = None,
+                       on_result: Optional[Callable[[int, Dict], None]] = None,
+                       packed: bool = False,
+                       token_budget: Optional[int] = None) -> List[Dict]:
+        if packed:
+            return self._classify_batch_packed(
+                problem_descriptions, max_workers, on_result, token_budget
+            )
+        
+        return run_concurrently(
+            self.classify_problem,
+            problem_descriptions,
+            max_workers=max_workers,
+            on_result=on_result,
+            error_result=lambda description, e: {
+                'success': False,
+                'error': str(e),
+                'problem_description': description
+            }
+        )
+    
+    def _classify_batch_packed(self, problem_descriptions: List[str],
+                               max_workers: Optional[int],
+                               on_result: Optional[Callable[[int, Dict], None]],
+                               token_budget: Optional[int]) -> List[Dict]:
+        """Classify many descriptions with several items per request"""
+        results = [None] * len(problem_descriptions)
+        
+        def finish(index, result):
+            results[index] = result
+            if on_result is not None:
+                on_result(index, result)
+        
+        remaining = []
+        for index, description in enumerate(problem_descriptions):
+            fast_result = self._classify_fast_path(description)
+            if fast_result is not None:
+                finish(index, fast_result)
+            else:
+                remaining.append(index)
+        
+        packs = self._split_into_packs(
+            [(index, problem_descriptions[index]) for index in remaining],
+            token_budget or Config.PACKED_PROMPT_TOKEN_BUDGET
+        )
+        
+        def report_pack(pack_index, pack_results):
+            for index, result in pack_results:
+                finish(index, result)
+        
+        run_concurrently(
+            self._classify_pack,
+            packs,
+            max_workers=max_workers,
+            on_result=report_pack,
+            error_result=lambda pack, e: [
+                (index, {
+                    'success': False,
+                    'error': str(e),
+                    'problem_description': description
+                })
+                for index, description in pack
+            ]
+        )
+        
         return results
+    
+    def _split_into_packs(self, items: List[Tuple[int, str]], 
+                          token_budget: int) -> List[List[Tuple[int, str]]]:
+        """Greedily group items so each packed prompt stays within the token budget"""
+        preamble_tokens = self._estimate_tokens(self._create_packed_prompt([]))
+        packs = []
+        current = []
+        current_tokens = preamble_tokens
+        
+        for index, description in items:
+            # Item text plus its ID line and the answer line it produces
+            item_tokens = self._estimate_tokens(description) + 20
+            if current and (current_tokens + item_tokens > token_budget
+                            or len(current) >= Config.PACKED_MAX_ITEMS):
+                packs.append(current)
+                current = []
+                current_tokens = preamble_tokens
+            current.append((index, description))
+            current_tokens += item_tokens
+        
+        if current:
+            packs.append(current)
+        return packs
+    
+    def _estimate_tokens(self, text: str) -> int:
+        # Roughly four characters per token for English text
+        return len(text) // 4 + 1
+    
+    def _classify_pack(self, pack: List[Tuple[int, str]]) -> List[Tuple[int, Dict]]:
+        """Classify one pack, re-asking only for items missing from a partial parse"""
+        descriptions = dict(pack)
+        resolved = {}
+        pending = list(pack)
+        last_error = 'Item missing from packed response'
+        
+        for attempt in range(Config.PACKED_MAX_RETRIES + 1):
+            if not pending:
+                break
+            
+            try:
+                # Retries bypass the cache so a bad response is not replayed
+                response = self.client.generate(
+                    self._create_packed_prompt(pending),
+                    use_cache=attempt == 0
+                )
+                parsed = self._parse_packed_response(response.text)
+            except Exception as e:
+                last_error = str(e)
+                continue
+            
+            for index, _ in pending:
+                if index in parsed:
+                    category, confidence = parsed[index]
+                    resolved[index] = self._build_packed_item_result(
+                        descriptions[index], category, confidence
+                    )
+            pending = [(index, description) for index, description in pending
+                       if index not in resolved]
+        
+        for index, description in pending:
+            resolved[index] = {
+                'success': False,
+                'error': last_error,
+                'problem_description': description
+            }
+        
+        return [(index, resolved[index]) for index, _ in pack]
+    
+    def _create_packed_prompt(self, items: List[Tuple[int, str]]) -> str:
+        categories_desc = self._get_category_descriptions()
+        items_text = '\n'.join(
+            f'[{index}] "{description}"' for index, description in items
+        )
+        
+        return f"""You are an expert classifier that categorizes community problems into three domains: 
+Environment, Health, and Education.
+
+Categories and their scope:
+{categories_desc}
+
+Classify EACH of the following problems into ONE category. Each problem has an ID in brackets.
+
+{items_text}
+
+Respond with exactly one line per problem, in this format and nothing else:
+ID | CATEGORY | CONFIDENCE
+
+where CATEGORY is one of {', '.join(self.categories)} and CONFIDENCE is High, Medium or Low."""
+    
+    def _parse_packed_response(self, response: str) -> Dict[int, Tuple[str, str]]:
+        parsed = {}
+        pattern = re.compile(
+            r'^\W*(\d+)\W*\|\s*\**\s*([A-Za-z]+)\s*\**\s*\|\s*\**\s*(High|Medium|Low)',
+            re.IGNORECASE | re.MULTILINE
+        )
+        
+        for match in pattern.finditer(response):
+            index = int(match.group(1))
+            category = next(
+                (cat for cat in self.categories if cat.lower() == match.group(2).lower()),
+                None
+            )
+            if category is not None:
+                parsed[index] = (category, match.group(3).capitalize())
+        
+        return parsed
+    
+    def _build_packed_item_result(self, problem_description: str, 
+                                  category: str, confidence: str) -> Dict:
+        self._record_label(problem_description, category, confidence)
+        
+        return {
+            'success': True,
+            'problem_description': problem_description,
+            'category': category,
+            'confidence': confidence,
+            'reasoning': '',
+            'all_categories': self.categories,
+            'full_response': '',
+            'source': 'llm_packed'
+        }
 
 
 # Convenience function
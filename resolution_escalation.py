@@ -0,0 +1,57 @@
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from structured_output import SEVERITY_LEVELS, CoarseIssuesOutput
+
+# Receives the low-resolution analysis and the requested domains; returns the
+# reason to re-run at full resolution, or None to accept the coarse result
+EscalationRule = Callable[[CoarseIssuesOutput, List[str]], Optional[str]]
+
+
+def default_escalation_rule(coarse: CoarseIssuesOutput, domains: List[str]) -> Optional[str]:
+    """Escalate on low confidence, an empty analysis or no clear primary domain"""
+    if coarse.confidence == 'Low':
+        return 'low_confidence'
+    if not coarse.issues:
+        return 'no_issues'
+
+    if any(issue['domain'] not in domains for issue in coarse.issues):
+        return 'conflicting_domains'
+    # The most severe issues decide the category downstream, so they must agree on one domain
+    top = max(SEVERITY_LEVELS.index(issue['severity']) for issue in coarse.issues)
+    top_domains = {issue['domain'] for issue in coarse.issues
+                   if SEVERITY_LEVELS.index(issue['severity']) == top}
+    if len(top_domains) > 1:
+        return 'conflicting_domains'
+    return None
+
+
+class ResolutionStats:
+    """Counts how often the low-resolution pass was enough and what each image cost to upload"""
+
+    def __init__(self):
+        self.images = 0
+        self.resolved_coarse = 0
+        self.bytes_uploaded = 0
+        self.reasons = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, bytes_uploaded: int, escalation_reason: Optional[str] = None):
+        with self._lock:
+            self.images += 1
+            self.bytes_uploaded += bytes_uploaded
+            if escalation_reason is None:
+                self.resolved_coarse += 1
+            else:
+                self.reasons[escalation_reason] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'images': self.images,
+                'resolved_coarse': self.resolved_coarse,
+                'escalated': self.images - self.resolved_coarse,
+                'coarse_share': self.resolved_coarse / self.images if self.images else 0.0,
+                'avg_bytes_per_image': self.bytes_uploaded / self.images if self.images else 0.0,
+                'escalation_reasons': dict(self.reasons)
+            }
@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from config import Config
+
+
+def make_cache_key(model_name: str, contents, generation_config: Optional[Dict] = None) -> str:
+    """Build a content-addressed key from the model name, prompt text and image bytes"""
+    hasher = hashlib.sha256()
+    hasher.update(model_name.encode('utf-8'))
+
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    for part in parts:
+        hasher.update(b'\x00')
+        hasher.update(_part_digest(part))
+
+    if generation_config:
+        hasher.update(b'\x01')
+        hasher.update(json.dumps(generation_config, sort_keys=True, default=str).encode('utf-8'))
+
+    return hasher.hexdigest()
+
+
+def _part_digest(part) -> bytes:
+    if isinstance(part, str):
+        return b'text:' + part.encode('utf-8')
+
+    if isinstance(part, (bytes, bytearray, memoryview)):
+        return b'bytes:' + hashlib.sha256(part).digest()
+
+    if isinstance(part, dict) and 'data' in part:
+        mime_type = str(part.get('mime_type', '')).encode('utf-8')
+        return b'blob:' + mime_type + hashlib.sha256(part['data']).digest()
+
+    # PIL images: hash the decoded pixels so re-encoded copies still match
+    if hasattr(part, 'tobytes') and hasattr(part, 'mode') and hasattr(part, 'size'):
+        header = f"{part.mode}:{part.size[0]}x{part.size[1]}".encode('utf-8')
+        return b'image:' + header + hashlib.sha256(part.tobytes()).digest()
+
+    return b'repr:' + repr(part).encode('utf-8')
+
+
+class MemoryCache:
+    """In-memory LRU tier with TTL expiry"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value, created_at) for a live entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, stored_at = entry
+            if self.ttl_seconds is not None and self._clock() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str, created_at: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (value, self._clock() if created_at is None else created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCache:
+    """On-disk tier backed by SQLite, evicting least recently used rows past a size budget"""
+
+    def __init__(self, db_path: str, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None, clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value, created_at) for a live row, marking it as recently used"""
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return value, created_at
+
+    def set(self, key: str, value: str, created_at: Optional[float] = None):
+        now = self._clock()
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now if created_at is None else created_at, now)
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now: float):
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+        if self.max_bytes is None:
+            return
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Tiered response cache checked in order, promoting lower-tier hits upwards"""
+
+    def __init__(self, tiers: List):
+        self.tiers = tiers
+        self.hits = 0
+        self.misses = 0
+        self.tier_hits = [0] * len(tiers)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        for index, tier in enumerate(self.tiers):
+            entry = tier.get_entry(key)
+            if entry is not None:
+                value, created_at = entry
+                # Promoted copies keep the original age so the TTL still counts from the first write
+                for upper in self.tiers[:index]:
+                    upper.set(key, value, created_at)
+                with self._lock:
+                    self.hits += 1
+                    self.tier_hits[index] += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'tiers': [
+                {
+                    'tier': type(tier).__name__,
+                    'hits': self.tier_hits[index],
+                    'entries': len(tier),
+                    'evictions': getattr(tier, 'evictions', 0)
+                }
+                for index, tier in enumerate(self.tiers)
+            ]
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[ResponseCache]:
+    """Return the process-wide cache built from Config, or None when caching is disabled"""
+    global _default_cache
+
+    if not Config.CACHE_ENABLED:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            tiers = [MemoryCache(Config.CACHE_MEMORY_ENTRIES, Config.CACHE_TTL_SECONDS)]
+            if Config.CACHE_DB_PATH:
+                tiers.append(SQLiteCache(
+                    Config.CACHE_DB_PATH,
+                    ttl_seconds=Config.CACHE_TTL_SECONDS,
+                    max_bytes=Config.CACHE_DISK_MAX_BYTES
+                ))
+            _default_cache = ResponseCache(tiers)
+        return _default_cache
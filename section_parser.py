@@ -0,0 +1,60 @@
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+
+class SectionSpan(NamedTuple):
+    key: str
+    header_start: int
+    start: int
+    end: int
+
+
+class SectionParser:
+    """Splits a response into header-delimited sections in a single regex pass"""
+
+    def __init__(self, sections: Dict[str, List[str]]):
+        self.sections = sections
+        self._header_keys = {}
+        for key, headers in sections.items():
+            for header in headers:
+                self._header_keys[header] = key
+
+        # Longest headers first so 'GOAL:' never shadows a longer header sharing its prefix
+        alternatives = sorted(self._header_keys, key=len, reverse=True)
+        self._pattern = re.compile('|'.join(re.escape(header) for header in alternatives))
+
+    def find_all(self, text: str) -> List[SectionSpan]:
+        """Return every header occurrence, each spanning up to the next header of another section"""
+        matches = [
+            (self._header_keys[match.group(0)], match.start(), match.end())
+            for match in self._pattern.finditer(text)
+        ]
+
+        spans = []
+        end = len(text)
+        next_key = None
+        next_start = len(text)
+        # Walk backwards: a header ends at the following header unless that one repeats
+        # the same section, in which case both share the same end
+        for key, header_start, start in reversed(matches):
+            if key != next_key:
+                end = next_start
+            spans.append(SectionSpan(key, header_start, start, end))
+            next_key, next_start = key, header_start
+
+        spans.reverse()
+        return spans
+
+    def parse(self, text: str) -> Dict[str, str]:
+        """Return the stripped content of the first occurrence of each section"""
+        parsed = {}
+        for span in self.find_all(text):
+            if span.key not in parsed:
+                parsed[span.key] = text[span.start:span.end].strip()
+        return parsed
+
+    def first(self, text: str, key: str) -> Optional[SectionSpan]:
+        for span in self.find_all(text):
+            if span.key == key:
+                return span
+        return None
@@ -0,0 +1,198 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from telemetry import stage_scope
+
+# Called with (stage name, stage result) as each stage finishes
+StageCallback = Callable[[str, Any], None]
+
+
+class Stage:
+    """One pipeline step; func receives its dependencies' results as keyword arguments"""
+
+    def __init__(self, name: str, func: Callable[..., Any], depends_on: Iterable[str] = (),
+                 optional: bool = False):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        # A failed optional stage does not stop the run. Dependents still receive a
+        # success=False result, but are skipped when the stage raised and left none
+        self.optional = optional
+
+
+class StageRun:
+    """Results, failures and timings of one pass through a StageGraph"""
+
+    def __init__(self, inputs: Dict[str, Any]):
+        self.results = dict(inputs)
+        self.errors = {}
+        self.failed_stage = None
+        self.skipped = []
+        self.timings = {}
+        self.started = time.perf_counter()
+        self.wall_seconds = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.failed_stage is None
+
+    def _finish(self, stage: Stage, value: Any, error: Optional[str], start: float, end: float,
+                cpu_seconds: Optional[float] = None):
+        self.timings[stage.name] = {
+            'start': start - self.started,
+            'seconds': end - start
+        }
+        if cpu_seconds is not None:
+            self.timings[stage.name]['cpu_seconds'] = cpu_seconds
+        if value is not None:
+            self.results[stage.name] = value
+
+        # Stages report failure like every other component: an exception or success=False
+        if error is None and isinstance(value, dict) and value.get('success') is False:
+            error = value.get('error', f"{stage.name} failed")
+        if error is not None:
+            self.errors[stage.name] = error
+            if not stage.optional and self.failed_stage is None:
+                self.failed_stage = stage.name
+
+
+class StageGraph:
+    """Runs stages as soon as their dependencies finish, independent stages concurrently
+
+    Stages must be added after the stages or inputs they depend on, so the graph
+    is acyclic by construction and insertion order is a valid topological order.
+    """
+
+    def __init__(self, inputs: Iterable[str] = (), stages: Iterable[Stage] = ()):
+        self.inputs = set(inputs)
+        self.stages = {}
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage: Stage) -> 'StageGraph':
+        if stage.name in self.stages or stage.name in self.inputs:
+            raise ValueError(f"Duplicate stage: {stage.name}")
+        for dependency in stage.depends_on:
+            if dependency not in self.stages and dependency not in self.inputs:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {dependency}")
+        self.stages[stage.name] = stage
+        return self
+
+    def _ready(self, run: StageRun, pending: Dict[str, Stage]) -> List[Stage]:
+        """Pop the stages whose dependencies have all finished, dropping unreachable ones"""
+        ready = []
+        for name, stage in list(pending.items()):
+            if any(dependency in run.skipped
+                   or (dependency in run.errors and dependency not in run.results)
+                   for dependency in stage.depends_on):
+                del pending[name]
+                run.skipped.append(name)
+            elif all(dependency in run.results for dependency in stage.depends_on):
+                del pending[name]
+                ready.append(stage)
+        return ready
+
+    def _missing_inputs(self, inputs: Dict[str, Any]):
+        missing = self.inputs - set(inputs)
+        if missing:
+            raise ValueError(f"Missing inputs: {', '.join(sorted(missing))}")
+
+    def run(self, inputs: Optional[Dict[str, Any]] = None,
+            max_workers: Optional[int] = None,
+            on_stage: Optional[StageCallback] = None) -> StageRun:
+        """Run every stage; on_stage is called from the calling thread, never a worker"""
+        inputs = inputs or {}
+        self._missing_inputs(inputs)
+        run = StageRun(inputs)
+        pending = dict(self.stages)
+
+        def call(stage, kwargs):
+            start = time.perf_counter()
+            # Each stage runs on one worker thread, so thread time is the stage's own CPU time
+            cpu_start = time.thread_time()
+            try:
+                with stage_scope(stage.name):
+                    value, error = stage.func(**kwargs), None
+            except Exception as e:
+                value, error = None, str(e)
+            return value, error, start, time.perf_counter(), time.thread_time() - cpu_start
+
+        with ThreadPoolExecutor(max_workers=max_workers or max(1, len(self.stages))) as executor:
+            running = {}
+            while True:
+                # After a required stage fails, in-flight stages finish but nothing new starts
+                if run.success:
+                    for stage in self._ready(run, pending):
+                        kwargs = {name: run.results[name] for name in stage.depends_on}
+                        # Worker threads see the caller's request trace
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, call, stage, kwargs)] = stage
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    run._finish(stage, *future.result())
+                    self._notify(run, stage, on_stage)
+
+        run.skipped.extend(pending)
+        run.wall_seconds = time.perf_counter() - run.started
+        return run
+
+    async def run_async(self, inputs: Optional[Dict[str, Any]] = None,
+                        on_stage: Optional[StageCallback] = None) -> StageRun:
+        """Coroutine stages are awaited; plain functions run in a worker thread"""
+        inputs = inputs or {}
+        self._missing_inputs(inputs)
+        run = StageRun(inputs)
+        pending = dict(self.stages)
+
+        def timed(stage, kwargs):
+            cpu_start = time.thread_time()
+            return stage.func(**kwargs), time.thread_time() - cpu_start
+
+        async def call(stage, kwargs):
+            start = time.perf_counter()
+            # Coroutines share the event loop thread, so their CPU time is not attributable
+            cpu_seconds = None
+            try:
+                # Each task runs in its own copy of the context, so the scope stays per stage
+                with stage_scope(stage.name):
+                    if asyncio.iscoroutinefunction(stage.func):
+                        value = await stage.func(**kwargs)
+                    else:
+                        value, cpu_seconds = await asyncio.to_thread(timed, stage, kwargs)
+                return value, None, start, time.perf_counter(), cpu_seconds
+            except Exception as e:
+                return None, str(e), start, time.perf_counter(), cpu_seconds
+
+        running = {}
+        while True:
+            if run.success:
+                for stage in self._ready(run, pending):
+                    kwargs = {name: run.results[name] for name in stage.depends_on}
+                    running[asyncio.ensure_future(call(stage, kwargs))] = stage
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stage = running.pop(task)
+                run._finish(stage, *task.result())
+                self._notify(run, stage, on_stage)
+
+        run.skipped.extend(pending)
+        run.wall_seconds = time.perf_counter() - run.started
+        return run
+
+    def _notify(self, run: StageRun, stage: Stage, on_stage: Optional[StageCallback]):
+        if on_stage is None or stage.name not in run.results:
+            return
+        try:
+            on_stage(stage.name, run.results[stage.name])
+        except Exception:
+            # A broken progress display must not abort the pipeline it reports on
+            pass
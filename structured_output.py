@@ -0,0 +1,398 @@
+import copy
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a JSON response does not match the expected schema"""
+
+
+CONFIDENCE_LEVELS = ['High', 'Medium', 'Low']
+SEVERITY_LEVELS = ['Low', 'Medium', 'High']
+
+
+def parse_json_object(text: str) -> Dict:
+    """Load the JSON object in a response, tolerating surrounding markdown fences"""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end < start:
+        raise StructuredOutputError("Response does not contain a JSON object")
+
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError as e:
+        raise StructuredOutputError(f"Invalid JSON in response: {e}")
+
+    if not isinstance(data, dict):
+        raise StructuredOutputError("Expected a JSON object")
+    return data
+
+
+def json_generation_config(schema: Dict) -> Dict:
+    return {
+        'response_mime_type': 'application/json',
+        'response_schema': schema
+    }
+
+
+def _string(data: Dict, key: str, required: bool = True) -> str:
+    value = data.get(key)
+    if value is None:
+        if required:
+            raise StructuredOutputError(f"Missing field '{key}'")
+        return ''
+    if not isinstance(value, (str, int, float)):
+        raise StructuredOutputError(f"Field '{key}' must be a string")
+    return str(value).strip()
+
+
+def _string_list(data: Dict, key: str, required: bool = True) -> List[str]:
+    value = data.get(key)
+    if value is None:
+        if required:
+            raise StructuredOutputError(f"Missing field '{key}'")
+        return []
+    if not isinstance(value, list):
+        raise StructuredOutputError(f"Field '{key}' must be a list")
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def _choice(value: str, choices: List[str], key: str) -> str:
+    for choice in choices:
+        if choice.lower() == value.strip().lower():
+            return choice
+    raise StructuredOutputError(f"Field '{key}' must be one of {', '.join(choices)}")
+
+
+@dataclass
+class ClassificationOutput:
+    category: str
+    confidence: str
+    reasoning: str = ''
+
+    @staticmethod
+    def schema(categories: List[str]) -> Dict:
+        return {
+            'type': 'object',
+            'properties': {
+                'category': {'type': 'string', 'enum': list(categories)},
+                'confidence': {'type': 'string', 'enum': CONFIDENCE_LEVELS},
+                'reasoning': {'type': 'string'}
+            },
+            'required': ['category', 'confidence']
+        }
+
+    @classmethod
+    def from_json(cls, text: str, categories: List[str]) -> 'ClassificationOutput':
+        data = parse_json_object(text)
+        return cls(
+            category=_choice(_string(data, 'category'), list(categories), 'category'),
+            confidence=_choice(_string(data, 'confidence'), CONFIDENCE_LEVELS, 'confidence'),
+            reasoning=_string(data, 'reasoning', required=False)
+        )
+
+
+@dataclass
+class MissionOutput:
+    mission_statement: str
+    problem_definition: str = ''
+    goal: str = ''
+    expected_impact: str = ''
+    action_steps: List[str] = field(default_factory=list)
+
+    SCHEMA = {
+        'type': 'object',
+        'properties': {
+            'mission_statement': {'type': 'string'},
+            'problem_definition': {'type': 'string'},
+            'goal': {'type': 'string'},
+            'expected_impact': {'type': 'string'},
+            'action_steps': {'type': 'array', 'items': {'type': 'string'}}
+        },
+        'required': ['mission_statement', 'problem_definition', 'goal',
+                     'expected_impact', 'action_steps']
+    }
+
+    @classmethod
+    def from_json(cls, text: str) -> 'MissionOutput':
+        data = parse_json_object(text)
+        mission_statement = _string(data, 'mission_statement')
+        if not mission_statement:
+            raise StructuredOutputError("Field 'mission_statement' is empty")
+        return cls(
+            mission_statement=mission_statement,
+            problem_definition=_string(data, 'problem_definition', required=False),
+            goal=_string(data, 'goal', required=False),
+            expected_impact=_string(data, 'expected_impact', required=False),
+            action_steps=_string_list(data, 'action_steps', required=False)
+        )
+
+
+@dataclass
+class SocraticOutput:
+    guiding_questions: List[str]
+    reflection_prompts: List[str] = field(default_factory=list)
+    challenge_points: List[str] = field(default_factory=list)
+    next_steps: List[str] = field(default_factory=list)
+
+    SCHEMA = {
+        'type': 'object',
+        'properties': {
+            'guiding_questions': {'type': 'array', 'items': {'type': 'string'}},
+            'reflection_prompts': {'type': 'array', 'items': {'type': 'string'}},
+            'challenge_points': {'type': 'array', 'items': {'type': 'string'}},
+            'next_steps': {'type': 'array', 'items': {'type': 'string'}}
+        },
+        'required': ['guiding_questions', 'reflection_prompts', 'challenge_points', 'next_steps']
+    }
+
+    @classmethod
+    def from_json(cls, text: str) -> 'SocraticOutput':
+        data = parse_json_object(text)
+        questions = _string_list(data, 'guiding_questions')
+        if not questions:
+            raise StructuredOutputError("Field 'guiding_questions' is empty")
+        return cls(
+            guiding_questions=questions,
+            reflection_prompts=_string_list(data, 'reflection_prompts', required=False),
+            challenge_points=_string_list(data, 'challenge_points', required=False),
+            next_steps=_string_list(data, 'next_steps', required=False)
+        )
+
+
+@dataclass
+class SolutionTemplateOutput:
+    sections: Dict[str, List[str]]
+    implementation_guide: str = ''
+    tips: List[str] = field(default_factory=list)
+
+    SCHEMA = {
+        'type': 'object',
+        'properties': {
+            'sections': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'title': {'type': 'string'},
+                        'items': {'type': 'array', 'items': {'type': 'string'}}
+                    },
+                    'required': ['title', 'items']
+                }
+            },
+            'implementation_guide': {'type': 'string'},
+            'tips': {'type': 'array', 'items': {'type': 'string'}}
+        },
+        'required': ['sections', 'implementation_guide', 'tips']
+    }
+
+    @classmethod
+    def from_json(cls, text: str) -> 'SolutionTemplateOutput':
+        data = parse_json_object(text)
+        raw_sections = data.get('sections')
+        if not isinstance(raw_sections, list) or not raw_sections:
+            raise StructuredOutputError("Field 'sections' must be a non-empty list")
+
+        sections = {}
+        for section in raw_sections:
+            if not isinstance(section, dict):
+                raise StructuredOutputError("Each section must be an object")
+            title = _string(section, 'title').rstrip(':').upper()
+            sections[title] = _string_list(section, 'items', required=False)
+
+        return cls(
+            sections=sections,
+            implementation_guide=_string(data, 'implementation_guide', required=False),
+            tips=_string_list(data, 'tips', required=False)
+        )
+
+
+@dataclass
+class TileIssuesOutput:
+    issues: List[Dict[str, str]]
+    visual_evidence: str = ''
+    recommendations: List[str] = field(default_factory=list)
+
+    SCHEMA = {
+        'type': 'object',
+        'properties': {
+            'issues': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'domain': {'type': 'string'},
+                        'issue': {'type': 'string'},
+                        'description': {'type': 'string'},
+                        'severity': {'type': 'string', 'enum': SEVERITY_LEVELS}
+                    },
+                    'required': ['domain', 'issue', 'description', 'severity']
+                }
+            },
+            'visual_evidence': {'type': 'string'},
+            'recommendations': {'type': 'array', 'items': {'type': 'string'}}
+        },
+        'required': ['issues', 'visual_evidence', 'recommendations']
+    }
+
+    @classmethod
+    def packed_schema(cls) -> Dict:
+        """Schema for one response covering several images, each tagged with its ID"""
+        item = copy.deepcopy(cls.SCHEMA)
+        item['properties']['id'] = {'type': 'integer'}
+        item['required'] = ['id'] + item['required']
+        return {
+            'type': 'object',
+            'properties': {'images': {'type': 'array', 'items': item}},
+            'required': ['images']
+        }
+
+    @classmethod
+    def from_json(cls, text: str) -> 'TileIssuesOutput':
+        return cls.from_dict(parse_json_object(text))
+
+    @classmethod
+    def from_packed_json(cls, text: str) -> Dict[int, 'TileIssuesOutput']:
+        """Parse a packed response by image ID, skipping entries that do not validate"""
+        images = parse_json_object(text).get('images')
+        if not isinstance(images, list):
+            raise StructuredOutputError("Field 'images' must be a list")
+
+        parsed = {}
+        for entry in images:
+            # One malformed entry must not discard the other images in the pack
+            if not isinstance(entry, dict):
+                continue
+            try:
+                image_id = int(entry['id'])
+                parsed[image_id] = cls.from_dict(entry)
+            except (KeyError, TypeError, ValueError):
+                continue
+        return parsed
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TileIssuesOutput':
+        raw_issues = data.get('issues')
+        if not isinstance(raw_issues, list):
+            raise StructuredOutputError("Field 'issues' must be a list")
+
+        issues = []
+        for issue in raw_issues:
+            if not isinstance(issue, dict):
+                raise StructuredOutputError("Each issue must be an object")
+            issues.append({
+                'domain': _string(issue, 'domain'),
+                'issue': _string(issue, 'issue'),
+                'description': _string(issue, 'description', required=False),
+                'severity': _choice(_string(issue, 'severity'), SEVERITY_LEVELS, 'severity')
+            })
+
+        return cls(
+            issues=issues,
+            visual_evidence=_string(data, 'visual_evidence', required=False),
+            recommendations=_string_list(data, 'recommendations', required=False)
+        )
+
+
+@dataclass
+class CoarseIssuesOutput(TileIssuesOutput):
+    confidence: str = 'Low'
+
+    SCHEMA = copy.deepcopy(TileIssuesOutput.SCHEMA)
+    SCHEMA['properties']['confidence'] = {'type': 'string', 'enum': CONFIDENCE_LEVELS}
+    SCHEMA['required'] = SCHEMA['required'] + ['confidence']
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CoarseIssuesOutput':
+        issues = TileIssuesOutput.from_dict(data)
+        return cls(
+            issues=issues.issues,
+            visual_evidence=issues.visual_evidence,
+            recommendations=issues.recommendations,
+            confidence=_choice(_string(data, 'confidence'), CONFIDENCE_LEVELS, 'confidence')
+        )
+
+
+@dataclass
+class FusedAnalysisOutput:
+    primary_category: str
+    confidence: str
+    mission_statement: str
+    detected_issues: List[Dict[str, str]] = field(default_factory=list)
+    visual_evidence: str = ''
+    recommendations: List[str] = field(default_factory=list)
+    reasoning: str = ''
+    problem_definition: str = ''
+    goal: str = ''
+    expected_impact: str = ''
+    action_steps: List[str] = field(default_factory=list)
+
+    @staticmethod
+    def schema(categories: List[str]) -> Dict:
+        return {
+            'type': 'object',
+            'properties': {
+                'detected_issues': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'domain': {'type': 'string'},
+                            'description': {'type': 'string'},
+                            'severity': {'type': 'string', 'enum': SEVERITY_LEVELS}
+                        },
+                        'required': ['domain', 'description', 'severity']
+                    }
+                },
+                'visual_evidence': {'type': 'string'},
+                'recommendations': {'type': 'array', 'items': {'type': 'string'}},
+                'primary_category': {'type': 'string', 'enum': list(categories)},
+                'confidence': {'type': 'string', 'enum': CONFIDENCE_LEVELS},
+                'reasoning': {'type': 'string'},
+                'mission_statement': {'type': 'string'},
+                'problem_definition': {'type': 'string'},
+                'goal': {'type': 'string'},
+                'expected_impact': {'type': 'string'},
+                'action_steps': {'type': 'array', 'items': {'type': 'string'}}
+            },
+            'required': ['detected_issues', 'visual_evidence', 'recommendations',
+                         'primary_category', 'confidence', 'reasoning', 'mission_statement',
+                         'problem_definition', 'goal', 'expected_impact', 'action_steps']
+        }
+
+    @classmethod
+    def from_json(cls, text: str, categories: List[str]) -> 'FusedAnalysisOutput':
+        data = parse_json_object(text)
+
+        raw_issues = data.get('detected_issues', [])
+        if not isinstance(raw_issues, list):
+            raise StructuredOutputError("Field 'detected_issues' must be a list")
+        issues = []
+        for issue in raw_issues:
+            if not isinstance(issue, dict):
+                raise StructuredOutputError("Each issue must be an object")
+            issues.append({
+                'domain': _string(issue, 'domain'),
+                'description': _string(issue, 'description', required=False),
+                'severity': _choice(_string(issue, 'severity'), SEVERITY_LEVELS, 'severity')
+            })
+
+        mission_statement = _string(data, 'mission_statement')
+        if not mission_statement:
+            raise StructuredOutputError("Field 'mission_statement' is empty")
+
+        return cls(
+            primary_category=_choice(_string(data, 'primary_category'), list(categories),
+                                     'primary_category'),
+            confidence=_choice(_string(data, 'confidence'), CONFIDENCE_LEVELS, 'confidence'),
+            mission_statement=mission_statement,
+            detected_issues=issues,
+            visual_evidence=_string(data, 'visual_evidence', required=False),
+            recommendations=_string_list(data, 'recommendations', required=False),
+            reasoning=_string(data, 'reasoning', required=False),
+            problem_definition=_string(data, 'problem_definition', required=False),
+            goal=_string(data, 'goal', required=False),
+            expected_impact=_string(data, 'expected_impact', required=False),
+            action_steps=_string_list(data, 'action_steps', required=False)
+        )
@@ -0,0 +1,400 @@
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from config import Config
+
+logger = logging.getLogger('telemetry')
+
+# Seconds; model calls range from cache hits to long vision requests
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_stage = contextvars.ContextVar('telemetry_stage', default=None)
+_current_trace = contextvars.ContextVar('telemetry_trace', default=None)
+
+
+class CallRecord(NamedTuple):
+    request_id: Optional[str]
+    stage: str
+    model: str
+    operation: str  # generate, generate_async or generate_stream
+    latency_seconds: float
+    prompt_tokens: Optional[int]  # None when the backend reports no usage
+    output_tokens: Optional[int]
+    cost_usd: Optional[float]
+    cache_hit: bool
+    error: Optional[str]
+    attempts: int = 1  # More than one after retries
+    hedged: bool = False
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append(('+Inf' if bound == float('inf') else repr(bound), total))
+        return pairs
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of observations"""
+        target = fraction * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= target:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """In-process counters and histograms, keyed by metric name and label values"""
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, labels: Dict[str, str], value: float = 1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Dict[str, str], value: float):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict:
+        """Plain-dict view for display: counters and histogram summaries per label set"""
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'mean': histogram.sum / histogram.count if histogram.count else 0.0,
+                    'p50_le': histogram.quantile(0.50),
+                    'p95_le': histogram.quantile(0.95),
+                    'p99_le': histogram.quantile(0.99)
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return {'counters': counters, 'histograms': histograms}
+
+    def render_prometheus(self) -> str:
+        """Text exposition format, version 0.0.4"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (('counter', self._counters), ('histogram', self._histograms)):
+                described = set()
+                for (name, labels), value in sorted(metrics.items()):
+                    if name not in described:
+                        described.add(name)
+                        if name in self._help:
+                            lines.append(f"# HELP {name} {self._help[name]}")
+                        lines.append(f"# TYPE {name} {kind}")
+                    if kind == 'counter':
+                        lines.append(f"{name}{_labels(labels)} {value:g}")
+                        continue
+                    for bound, total in value.cumulative():
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {total}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value.sum:g}")
+                    lines.append(f"{name}_count{_labels(labels)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+registry.describe('model_calls_total', 'Model calls by model, stage and outcome (ok, cached, error)')
+registry.describe('model_call_seconds', 'Model call latency, cache hits included')
+registry.describe('model_tokens_total', 'Tokens reported by the backend, by direction')
+registry.describe('model_cost_usd_total', 'Estimated spend from token usage and Config.MODEL_PRICES')
+registry.describe('pipeline_stage_seconds', 'Wall time of each pipeline stage')
+registry.describe('pipeline_request_seconds', 'Wall time of each traced request, by kind')
+
+
+class RequestTrace:
+    """Everything recorded while one request was being handled"""
+
+    def __init__(self, kind: str):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.wall_seconds = None
+        self.calls = []
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add_call(self, record: CallRecord):
+        with self._lock:
+            self.calls.append(record)
+
+    def add_stages(self, timings: Dict[str, Dict]):
+        with self._lock:
+            self.stages.update(timings)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            calls = list(self.calls)
+            stages = dict(self.stages)
+
+        def total(field):
+            values = [getattr(call, field) for call in calls if getattr(call, field) is not None]
+            return sum(values) if values else None
+
+        return {
+            'request_id': self.request_id,
+            'kind': self.kind,
+            'started_at': self.started_at,
+            'wall_seconds': (self.wall_seconds if self.wall_seconds is not None
+                             else time.perf_counter() - self.started),
+            'model_calls': len(calls),
+            'cache_hits': sum(1 for call in calls if call.cache_hit),
+            'errors': sum(1 for call in calls if call.error),
+            'prompt_tokens': total('prompt_tokens'),
+            'output_tokens': total('output_tokens'),
+            'cost_usd': total('cost_usd'),
+            'stages': stages,
+            'calls': [call._asdict() for call in calls]
+        }
+
+
+_recent = deque(maxlen=Config.TELEMETRY_RECENT_REQUESTS)
+_recent_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def trace_request(kind: str) -> Iterator[RequestTrace]:
+    """Attribute every model call made inside the block, on any thread, to one request"""
+    trace = RequestTrace(kind)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.wall_seconds = time.perf_counter() - trace.started
+        registry.observe('pipeline_request_seconds', {'kind': kind}, trace.wall_seconds)
+        summary = trace.summary()
+        with _recent_lock:
+            _recent.append(summary)
+        log_event('request', {key: value for key, value in summary.items() if key != 'calls'})
+
+
+@contextlib.contextmanager
+def stage_scope(stage: str) -> Iterator[None]:
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def recent_traces() -> List[Dict]:
+    """Summaries of the latest requests, newest first"""
+    with _recent_lock:
+        return list(reversed(_recent))
+
+
+def _usage(response) -> Tuple[Optional[int], Optional[int]]:
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return None, None
+    return (getattr(usage, 'prompt_token_count', None),
+            getattr(usage, 'candidates_token_count', None))
+
+
+def estimate_cost(model: str, prompt_tokens: Optional[int],
+                  output_tokens: Optional[int]) -> Optional[float]:
+    prices = Config.MODEL_PRICES.get(model)
+    if prices is None or prompt_tokens is None:
+        return None
+    input_price, output_price = prices
+    return (prompt_tokens * input_price + (output_tokens or 0) * output_price) / 1_000_000
+
+
+def record_call(model: str, operation: str, started: float, response=None,
+                cache_hit: bool = False, error: Optional[Exception] = None,
+                attempts: int = 1, hedged: bool = False) -> CallRecord:
+    """Record one model call started at perf_counter() time started"""
+    trace = _current_trace.get()
+    stage = _current_stage.get() or (trace.kind if trace is not None else 'unattributed')
+    prompt_tokens, output_tokens = (None, None) if cache_hit else _usage(response)
+    record = CallRecord(
+        request_id=trace.request_id if trace is not None else None,
+        stage=stage,
+        model=model,
+        operation=operation,
+        latency_seconds=time.perf_counter() - started,
+        prompt_tokens=prompt_tokens,
+        output_tokens=output_tokens,
+        cost_usd=estimate_cost(model, prompt_tokens, output_tokens),
+        cache_hit=cache_hit,
+        error=None if error is None else f"{type(error).__name__}: {error}",
+        attempts=attempts,
+        hedged=hedged
+    )
+
+    outcome = 'error' if error is not None else 'cached' if cache_hit else 'ok'
+    labels = {'model': model, 'stage': stage}
+    registry.inc('model_calls_total', {**labels, 'outcome': outcome})
+    registry.observe('model_call_seconds', labels, record.latency_seconds)
+    if prompt_tokens is not None:
+        registry.inc('model_tokens_total', {'model': model, 'direction': 'prompt'}, prompt_tokens)
+    if output_tokens is not None:
+        registry.inc('model_tokens_total', {'model': model, 'direction': 'output'}, output_tokens)
+    if record.cost_usd is not None:
+        registry.inc('model_cost_usd_total', {'model': model}, record.cost_usd)
+
+    if trace is not None:
+        trace.add_call(record)
+    log_event('model_call', record._asdict(),
+              level=logging.WARNING if error is not None else logging.DEBUG)
+    return record
+
+
+def record_stages(timings: Dict[str, Dict]):
+    """Add StageRun timings to the histograms and the current request"""
+    for stage, timing in timings.items():
+        registry.observe('pipeline_stage_seconds', {'stage': stage}, timing['seconds'])
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_stages(timings)
+
+
+def log_event(event: str, fields: Dict, level: int = logging.INFO):
+    logger.log(level, event, extra={'fields': fields})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; telemetry events carry their fields at the top level"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain messages, with telemetry fields appended as key=value pairs"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items()
+                                      if value is not None)
+        return message
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """Send application logs to stderr as text or JSON lines; safe to call repeatedly"""
+    root = logging.getLogger()
+    root.setLevel((level or Config.LOG_LEVEL).upper())
+    for handler in root.handlers:
+        if getattr(handler, '_telemetry', False):
+            root.removeHandler(handler)
+
+    handler = logging.StreamHandler()
+    handler._telemetry = True
+    if (fmt or Config.LOG_FORMAT).lower() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter('%(message)s'))
+    root.addHandler(handler)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the application log
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[int]:
+    """Serve /metrics in a background thread; returns the bound port, None when disabled"""
+    global _server
+
+    port = Config.METRICS_PORT if port is None else port
+    host = Config.METRICS_HOST if host is None else host
+    if port is None:
+        return None
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics-server',
+                             daemon=True).start()
+        return _server.server_address[1]
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Pipelines run against the offline fake backend and leave no caches behind
+os.environ.setdefault('MODEL_BACKEND', 'fake')
+os.environ.setdefault('GEMINI_CACHE_ENABLED', 'false')
+os.environ.setdefault('IMAGE_DEDUP_ENABLED', 'false')
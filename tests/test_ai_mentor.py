@@ -0,0 +1,80 @@
+import pytest
+
+from ai_mentor import AIMentor, SOLUTION_TEMPLATES
+from model_backends import FakeBackend
+
+
+@pytest.mark.parametrize('template_type', sorted(SOLUTION_TEMPLATES))
+def test_structured_prompts_carry_no_header_format(template_type):
+    mentor = AIMentor(structured_output=True)
+
+    critical = mentor._create_critical_thinking_prompt("Litter in the park")
+    solution = mentor._create_solution_template_prompt("Litter in the park", template_type)
+
+    assert 'GUIDING QUESTIONS:' not in critical
+    assert '"guiding_questions"' in critical
+    assert 'IMPLEMENTATION GUIDE:' not in solution
+    assert not any(f"{title}:\n" in solution for title, _ in SOLUTION_TEMPLATES[template_type][1])
+    assert '"sections"' in solution
+
+
+@pytest.mark.parametrize('template_type', sorted(SOLUTION_TEMPLATES))
+def test_plain_prompts_list_the_parsed_headers(template_type):
+    mentor = AIMentor(structured_output=False)
+
+    critical = mentor._create_critical_thinking_prompt("Litter in the park")
+    solution = mentor._create_solution_template_prompt("Litter in the park", template_type)
+
+    assert 'GUIDING QUESTIONS:' in critical and '{' not in critical
+    assert 'IMPLEMENTATION GUIDE:' in solution and 'PRACTICAL TIPS:' in solution
+    assert all(f"{title}:\n" in solution for title, _ in SOLUTION_TEMPLATES[template_type][1])
+
+
+class BrokenStreamBackend(FakeBackend):
+    """Streams the first chunk of the fake answer, then loses the connection"""
+
+    def generate_stream(self, *args, **kwargs):
+        yield next(super().generate_stream(*args, **kwargs))
+        raise ConnectionError("stream reset")
+
+
+@pytest.fixture
+def mentor(monkeypatch):
+    mentor = AIMentor(structured_output=False)
+    monkeypatch.setattr(mentor.client, 'backend', FakeBackend())
+    return mentor
+
+
+def test_stream_yields_chunks_then_the_parsed_result(mentor):
+    stream = mentor.critical_thinking_stream("Litter in the park")
+    chunks = []
+    for chunk in stream:
+        # Nothing is parsed until the last chunk has been shown
+        assert stream.result is None
+        chunks.append(chunk)
+
+    assert len(chunks) > 1
+    assert stream.result['success']
+    assert stream.result['full_response'] == ''.join(chunks)
+    assert stream.result['guiding_questions']
+    assert (stream.result['guiding_questions']
+            == mentor.critical_thinking_mode("Litter in the park")['guiding_questions'])
+
+
+def test_solution_stream_parses_the_template(mentor):
+    stream = mentor.solution_stream("Plan a budget for the clinic")
+    text = ''.join(stream)
+
+    assert stream.result['success']
+    assert stream.result['template_type'] == 'budget'
+    assert 'REVENUE/FUNDING SOURCES:' in text
+
+
+def test_stream_failure_after_the_first_chunk_sets_a_failed_result(mentor, monkeypatch):
+    monkeypatch.setattr(mentor.client, 'backend', BrokenStreamBackend())
+
+    stream = mentor.critical_thinking_stream("Litter in the park")
+    chunks = list(stream)
+
+    assert len(chunks) == 1
+    assert stream.result == {'success': False, 'error': 'stream reset', 'mode': 'Critical Thinking'}
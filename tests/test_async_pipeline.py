@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from PIL import Image
+
+from ai_mentor import AIMentor
+from integrated_system import AILearningPlatform
+from problem_classifier import ProblemClassifier
+
+PROBLEM = "Children sit on the floor because the school has no desks"
+
+
+@pytest.fixture
+def platform():
+    return AILearningPlatform(speculative=False, prefetch_mentor=False)
+
+
+def test_async_text_pipeline_matches_the_sync_one(platform):
+    sync_result = platform.process_text_description(PROBLEM)
+    async_result = asyncio.run(platform.process_text_description_async(PROBLEM))
+
+    assert async_result['success'] and sync_result['success']
+    assert async_result['classification']['category'] == sync_result['classification']['category']
+    assert (async_result['mission_statement']['mission_statement']
+            == sync_result['mission_statement']['mission_statement'])
+
+
+def test_async_image_pipeline_matches_the_sync_one(platform):
+    image = Image.new('RGB', (64, 64), 'brown')
+
+    sync_result = platform.process_image(image)
+    async_result = asyncio.run(platform.process_image_async(image))
+
+    assert async_result['success'] and sync_result['success']
+    assert async_result['vision_analysis'] == sync_result['vision_analysis']
+    assert async_result['classification']['category'] == sync_result['classification']['category']
+
+
+def test_async_pipeline_survives_a_classifier_that_raises(platform, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("classifier broke")
+
+    monkeypatch.setattr(platform.problem_classifier, 'classify_with_vision_analysis_async', broken)
+
+    result = asyncio.run(platform.process_image_async(Image.new('RGB', (64, 64), 'brown')))
+
+    assert result['success']
+    assert result['classification'] == {'success': False, 'error': 'classifier broke'}
+    assert result['mission_statement']['success'] is False
+
+
+def test_async_calls_can_be_gathered():
+    classifier = ProblemClassifier(fast_path=False)
+    descriptions = [PROBLEM, "The river is full of plastic", "No nurse at the clinic"]
+
+    async def classify_all():
+        return await asyncio.gather(*(classifier.classify_problem_async(d) for d in descriptions))
+
+    results = asyncio.run(classify_all())
+
+    assert [result['category'] for result in results] == [
+        classifier.classify_problem(description)['category'] for description in descriptions
+    ]
+
+
+def test_async_mentor_modes_match_the_sync_ones():
+    mentor = AIMentor()
+
+    guidance = asyncio.run(mentor.critical_thinking_mode_async(PROBLEM))
+    template = asyncio.run(mentor.solution_mode_async(PROBLEM))
+
+    assert guidance['success'] and template['success']
+    assert (guidance['guiding_questions']
+            == mentor.critical_thinking_mode(PROBLEM)['guiding_questions'])
+    assert template['template_type'] == mentor.solution_mode(PROBLEM)['template_type']
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.bench_pipelines import compare, percentile
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'benchmarks', 'bench_pipelines.py')
+
+
+def run_bench(*args):
+    return subprocess.run([sys.executable, SCRIPT, '--requests', '4', '--concurrency', '2',
+                           '--warmup', '0', '--batch-size', '2', '--alloc-requests', '1',
+                           '--latency-ms', '0', '--jitter-ms', '0', *args],
+                          capture_output=True, text=True, timeout=120)
+
+
+def test_percentile_uses_the_nearest_rank():
+    samples = [float(value) for value in range(1, 101)]
+
+    assert percentile(samples, 0.50) == 50.0
+    assert percentile(samples, 0.95) == 95.0
+    assert percentile(samples, 0.99) == 99.0
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([], 0.95) == 0.0
+
+
+def test_compare_flags_only_changes_beyond_the_tolerance(tmp_path):
+    def scenario(p95, rps, cpu):
+        return {'latency_ms': {'p50': p95, 'p95': p95, 'p99': p95},
+                'requests_per_second': rps, 'cpu_ms_per_request': cpu}
+
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({'meta': {'revision': 'abc'}, 'scenarios': {
+        'text': scenario(100, 10, 5), 'image': scenario(100, 10, 5), 'gone': scenario(1, 1, 1)
+    }}))
+    results = {'scenarios': {
+        'text': scenario(105, 9.8, 5.2),
+        'image': scenario(100, 8, 5),
+        'new': scenario(1, 1, 1)
+    }}
+
+    assert compare(results, str(baseline), 0.1) == ['image']
+
+
+def test_run_writes_results_and_passes_against_itself(tmp_path):
+    output = tmp_path / 'run.json'
+
+    first = run_bench('--scenarios', 'text', 'batch_classify', '--output', str(output))
+
+    assert first.returncode == 0, first.stderr
+    results = json.loads(output.read_text())
+    assert set(results['scenarios']) == {'text', 'batch_classify'}
+    text = results['scenarios']['text']
+    assert text['failures'] == 0
+    assert text['requests'] == 4
+    assert text['allocations']['traced_requests'] == 1
+    assert text['stages']
+
+    # Generous tolerance: only the exit status and report wiring are under test here
+    second = run_bench('--scenarios', 'text', '--output', str(tmp_path / 'again.json'),
+                       '--compare', str(output), '--tolerance', '100')
+    assert second.returncode == 0, second.stderr
+    assert 'REGRESSION' not in second.stdout
+
+
+def test_unknown_scenario_is_rejected(tmp_path):
+    result = run_bench('--scenarios', 'nonsense', '--output', str(tmp_path / 'run.json'))
+
+    assert result.returncode == 2
+    assert 'Unknown scenarios: nonsense' in result.stderr
@@ -0,0 +1,344 @@
+import asyncio
+import threading
+
+import pytest
+
+from call_policy import (HEDGE_MIN_SAMPLES, CallPolicy, CallStats, CallTimeoutError,
+                         CircuitBreaker, CircuitOpenError, is_retryable)
+
+
+class FakeClock:
+    """Monotonic clock that only moves when slept on or advanced"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class Unavailable(RuntimeError):
+    def __init__(self):
+        super().__init__("503 Service unavailable")
+
+
+def flaky(failures: int, result='ok'):
+    """A function that raises a retryable error failures times before answering"""
+    calls = []
+
+    def func(*args, **kwargs):
+        calls.append(kwargs)
+        if len(calls) <= failures:
+            raise Unavailable()
+        return result
+
+    func.calls = calls
+    return func
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_policy(clock, **settings):
+    settings.setdefault('breaker_failures', 100)
+    return CallPolicy('test', sleep=clock.sleep, clock=clock, seed=0, **settings)
+
+
+@pytest.mark.parametrize('error, expected', [
+    (Unavailable(), True),
+    (RuntimeError("429 Resource exhausted"), True),
+    (TimeoutError(), True),
+    (ConnectionError(), True),
+    (ValueError("400 Invalid argument"), False),
+    (KeyError('text'), False),
+    (CircuitOpenError("open"), False),
+])
+def test_is_retryable(error, expected):
+    assert is_retryable(error) is expected
+
+
+def test_retries_retryable_errors_with_backoff(clock):
+    policy = make_policy(clock, max_attempts=3, backoff_base=0.5, backoff_max=8)
+    func = flaky(2)
+    stats = CallStats()
+
+    assert policy.call(func, stats=stats) == 'ok'
+    assert stats.attempts == 3
+    assert len(clock.sleeps) == 2
+    # Full jitter: each delay is drawn below an exponentially growing ceiling
+    assert 0 <= clock.sleeps[0] <= 0.5
+    assert 0 <= clock.sleeps[1] <= 1.0
+
+
+def test_backoff_is_capped(clock):
+    policy = make_policy(clock, max_attempts=6, backoff_base=1, backoff_max=2)
+
+    policy.call(flaky(5))
+
+    assert len(clock.sleeps) == 5
+    assert max(clock.sleeps) <= 2
+
+
+def test_gives_up_after_max_attempts(clock):
+    policy = make_policy(clock, max_attempts=3)
+    func = flaky(10)
+    stats = CallStats()
+
+    with pytest.raises(Unavailable):
+        policy.call(func, stats=stats)
+    assert stats.attempts == 3
+    assert len(func.calls) == 3
+    assert len(clock.sleeps) == 2
+
+
+def test_final_errors_are_not_retried(clock):
+    policy = make_policy(clock)
+    stats = CallStats()
+
+    def invalid():
+        raise ValueError("400 Invalid argument")
+
+    with pytest.raises(ValueError):
+        policy.call(invalid, stats=stats)
+    assert stats.attempts == 1
+    assert clock.sleeps == []
+
+
+def test_no_retry_once_the_deadline_would_pass(clock):
+    policy = make_policy(clock, deadline=1.0, max_attempts=5)
+
+    def slow_failure(**kwargs):
+        clock.advance(2.0)
+        raise Unavailable()
+
+    stats = CallStats()
+    with pytest.raises(Unavailable):
+        policy.call(slow_failure, stats=stats)
+    assert stats.attempts == 1
+    assert clock.sleeps == []
+
+
+def test_passes_the_attempt_timeout_to_the_request(clock):
+    policy = make_policy(clock, timeout=5, deadline=3)
+    func = flaky(0)
+
+    policy.call(func, pass_timeout=True)
+
+    # The timeout never outlives the call's deadline
+    assert func.calls == [{'timeout': 3}]
+
+
+def test_request_still_running_at_the_deadline_is_abandoned_not_resent():
+    policy = CallPolicy('test', timeout=0.01, deadline=0.05, max_attempts=3)
+    release = threading.Event()
+    calls = []
+
+    def stuck():
+        calls.append(1)
+        release.wait(5)
+        return 'late'
+
+    stats = CallStats()
+    try:
+        with pytest.raises(CallTimeoutError):
+            policy.call(stuck, stats=stats)
+    finally:
+        release.set()
+    assert calls == [1]
+    assert stats.attempts == 1
+    assert policy.abandoned == 1
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    policy = make_policy(clock, max_attempts=1, breaker_failures=3, breaker_reset=30)
+    func = flaky(10)
+
+    for _ in range(3):
+        with pytest.raises(Unavailable):
+            policy.call(func)
+    assert policy.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        policy.call(func)
+    assert len(func.calls) == 3
+
+
+def test_breaker_half_opens_after_reset_and_closes_on_success(clock):
+    policy = make_policy(clock, max_attempts=1, breaker_failures=2, breaker_reset=30)
+    for _ in range(2):
+        with pytest.raises(Unavailable):
+            policy.call(flaky(1))
+
+    clock.advance(29)
+    with pytest.raises(CircuitOpenError):
+        policy.call(flaky(0))
+
+    clock.advance(1)
+    assert policy.call(flaky(0)) == 'ok'
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+    assert policy.breaker.failures == 0
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    policy = make_policy(clock, max_attempts=1, breaker_failures=2, breaker_reset=30)
+    for _ in range(2):
+        with pytest.raises(Unavailable):
+            policy.call(flaky(1))
+
+    clock.advance(30)
+    with pytest.raises(Unavailable):
+        policy.call(flaky(1))
+    assert policy.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        policy.call(flaky(0))
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+    breaker.record_failure()
+    clock.advance(10)
+
+    breaker.check('test')
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check('test')
+
+    breaker.release()
+    breaker.check('test')
+
+
+def test_final_errors_do_not_trip_the_breaker(clock):
+    policy = make_policy(clock, max_attempts=1, breaker_failures=2)
+
+    def invalid():
+        raise ValueError("400 Invalid argument")
+
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            policy.call(invalid)
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_hedges_a_slow_request_and_abandons_the_loser():
+    policy = CallPolicy('test', deadline=5, hedge_after=0.01)
+    release = threading.Event()
+    calls = []
+
+    def first_slow():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            return 'original'
+        return 'hedge'
+
+    stats = CallStats()
+    try:
+        assert policy.call(first_slow, stats=stats) == 'hedge'
+    finally:
+        release.set()
+    assert stats.hedged
+    assert stats.attempts == 1
+    assert len(calls) == 2
+    assert policy.abandoned == 1
+
+
+def test_fast_requests_are_not_hedged():
+    policy = CallPolicy('test', deadline=5, hedge_after=1)
+    func = flaky(0)
+    stats = CallStats()
+
+    assert policy.call(func, stats=stats) == 'ok'
+    assert not stats.hedged
+    assert len(func.calls) == 1
+
+
+def test_p95_hedge_delay_waits_for_enough_samples(clock):
+    policy = make_policy(clock, hedge_after='p95')
+    for index in range(HEDGE_MIN_SAMPLES - 1):
+        policy._succeeded(index / 100)
+    assert policy._hedge_delay() is None
+
+    policy._succeeded(1.0)
+    assert policy._hedge_delay() == pytest.approx(0.18)
+
+
+def test_async_hedge_cancels_the_loser():
+    policy = CallPolicy('test', timeout=5, hedge_after=0.01)
+    cancelled = []
+    calls = []
+
+    async def first_slow():
+        calls.append(1)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return 'original'
+        return 'hedge'
+
+    async def main():
+        stats = CallStats()
+        result = await policy.call_async(first_slow, stats=stats)
+        await asyncio.sleep(0)
+        return result, stats
+
+    result, stats = asyncio.run(main())
+    assert result == 'hedge'
+    assert stats.hedged
+    assert cancelled == [1]
+
+
+def test_async_retries_with_backoff(clock):
+    policy = make_policy(clock, backoff_base=0.001)
+    failures = flaky(1)
+
+    async def func():
+        return failures()
+
+    stats = CallStats()
+    assert asyncio.run(policy.call_async(func, stats=stats)) == 'ok'
+    assert stats.attempts == 2
+
+
+def test_stream_retries_before_the_first_chunk(clock):
+    policy = make_policy(clock)
+    attempts = []
+
+    def chunks():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise Unavailable()
+        yield from ['a', 'b']
+
+    stats = CallStats()
+    assert list(policy.stream(chunks, stats=stats)) == ['a', 'b']
+    assert stats.attempts == 2
+
+
+def test_stream_is_not_retried_after_the_first_chunk(clock):
+    policy = make_policy(clock)
+    attempts = []
+
+    def chunks():
+        attempts.append(1)
+        yield 'a'
+        raise Unavailable()
+
+    received = []
+    with pytest.raises(Unavailable):
+        for chunk in policy.stream(chunks):
+            received.append(chunk)
+    assert received == ['a']
+    assert attempts == [1]
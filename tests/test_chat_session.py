@@ -0,0 +1,101 @@
+import pytest
+
+from chat_session import MentorChatSession, estimate_tokens
+from config import Config
+from gemini_client import get_client
+from model_backends import FakeBackend
+
+SUMMARY_PROMPT = 'Update the running summary'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = get_client(Config.TEXT_MODEL, task='mentor')
+    monkeypatch.setattr(client, 'backend', FakeBackend(rules=[(SUMMARY_PROMPT, 'rolling summary')]))
+    return client
+
+
+def chat(session, turns, start=0):
+    for turn in range(start, start + turns):
+        contents = session.prepare(f"question {turn}")
+        session.record(f"question {turn}", f"answer {turn}", contents)
+
+
+def test_history_past_the_message_cap_is_folded_into_the_summary(client):
+    session = MentorChatSession(client, token_budget=10_000, max_messages=4)
+    chat(session, 3)
+
+    contents = session.prepare("question 3")
+
+    assert session.summary == 'rolling summary'
+    assert [message['parts'][0] for message in session.history] == ['question 2', 'answer 2']
+    assert contents[0]['parts'][0].endswith('rolling summary')
+    assert contents[-1] == {'role': 'user', 'parts': ['question 3']}
+
+
+def test_history_is_trimmed_to_the_token_budget(client):
+    session = MentorChatSession(client, token_budget=200, max_messages=100)
+    for turn in range(6):
+        contents = session.prepare(f"question {turn}")
+        session.record(f"question {turn}", 'long answer ' * 30, contents)
+
+    session.prepare("one more question")
+
+    assert session._history_tokens() + estimate_tokens("one more question") <= 200
+    assert session.summary
+    assert [message['role'] for message in session.history][:1] == ['user']
+    assert session.stats()['tokens_saved'] > 0
+
+
+def test_failed_summary_keeps_the_recent_transcript(client, monkeypatch):
+    def broken(prompt):
+        raise RuntimeError("summary call failed")
+
+    monkeypatch.setattr(client, 'backend', FakeBackend(rules=[(SUMMARY_PROMPT, broken)]))
+    session = MentorChatSession(client, token_budget=10_000, max_messages=2)
+    chat(session, 1)
+
+    session.prepare("question 1")
+
+    assert session.summary == "User: question 0\nMentor: answer 0"
+    assert len(session.history) == 0
+
+
+def test_summary_is_discarded_when_the_history_changed_meanwhile(client, monkeypatch):
+    session = MentorChatSession(client, token_budget=10_000, max_messages=4)
+    chat(session, 3)
+
+    def reset_during_summary(prompt):
+        session.reset()
+        return 'stale summary'
+
+    monkeypatch.setattr(client, 'backend',
+                        FakeBackend(rules=[(SUMMARY_PROMPT, reset_during_summary)]))
+
+    contents = session.prepare("question 3")
+
+    assert session.summary == ''
+    assert contents == [{'role': 'user', 'parts': ['question 3']}]
+
+
+def test_summary_is_recomputed_after_a_concurrent_summary_lands(client, monkeypatch):
+    session = MentorChatSession(client, token_budget=10_000, max_messages=4)
+    chat(session, 3)
+    prompts = []
+
+    def summarize(prompt):
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            # Another turn finished summarizing first
+            with session._lock:
+                session.summary = 'summary from another turn'
+            return 'lost summary'
+        return 'merged summary'
+
+    monkeypatch.setattr(client, 'backend', FakeBackend(rules=[(SUMMARY_PROMPT, summarize)]))
+
+    session.prepare("question 3")
+
+    assert session.summary == 'merged summary'
+    assert 'summary from another turn' in prompts[1]
+    assert [message['parts'][0] for message in session.history] == ['question 2', 'answer 2']
@@ -0,0 +1,68 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from concurrency import run_concurrently
+
+request = contextvars.ContextVar('request', default=None)
+
+
+def test_results_keep_input_order_whatever_finishes_first():
+    finished = []
+
+    def work(delay):
+        time.sleep(delay)
+        return {'success': True, 'delay': delay}
+
+    results = run_concurrently(work, [0.05, 0.0, 0.02], max_workers=3,
+                               on_result=lambda index, result: finished.append(index))
+
+    assert [result['delay'] for result in results] == [0.05, 0.0, 0.02]
+    assert sorted(finished) == [0, 1, 2]
+    assert finished[-1] == 0
+
+
+def test_at_most_max_workers_calls_are_in_flight():
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def work(item):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return {'success': True}
+
+    run_concurrently(work, range(12), max_workers=3)
+
+    assert 1 < peak <= 3
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_a_raising_item_becomes_an_error_result(max_workers):
+    def work(item):
+        if item == 'bad':
+            raise ValueError("cannot read item")
+        return {'success': True, 'item': item}
+
+    results = run_concurrently(work, ['a', 'bad', 'b'], max_workers=max_workers,
+                               error_result=lambda item, e: {'success': False, 'item': item,
+                                                             'error': str(e)})
+
+    assert [result['success'] for result in results] == [True, False, True]
+    assert results[1] == {'success': False, 'item': 'bad', 'error': 'cannot read item'}
+
+
+def test_workers_see_the_callers_context():
+    token = request.set('req-1')
+    try:
+        results = run_concurrently(lambda item: {'request': request.get()}, range(4), max_workers=4)
+    finally:
+        request.reset(token)
+
+    assert [result['request'] for result in results] == ['req-1'] * 4
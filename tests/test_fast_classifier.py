@@ -0,0 +1,60 @@
+import json
+
+from fast_classifier import FastPathRouter
+
+
+def make_router(tmp_path, **kwargs):
+    return FastPathRouter(labels_path=str(tmp_path / 'labels.jsonl'), **kwargs)
+
+
+def wait_for_refit(router):
+    thread = router._refit_thread
+    if thread is not None:
+        thread.join(timeout=30)
+
+
+def test_seed_phrases_take_the_fast_path(tmp_path):
+    router = make_router(tmp_path, threshold=0.5)
+
+    category, probability = router.route("Overflowing garbage and plastic waste everywhere")
+
+    assert category == 'Environment'
+    assert probability >= 0.5
+    assert router.stats()['fast_path'] == 1
+
+
+def test_labels_are_capped_and_persisted(tmp_path):
+    router = make_router(tmp_path, refit_every=1000, max_labels=3)
+
+    for number in range(5):
+        router.record_label(f"village report number {number}", 'Health')
+    router.record_label("village report number 4", 'Health')
+
+    assert [text for text, _ in router.labels] == [f"village report number {n}" for n in (2, 3, 4)]
+    assert "village report number 0" not in router._seen
+    assert router.stats()['training_examples'] == len(router.seeds) + 3
+    with open(tmp_path / 'labels.jsonl') as f:
+        assert len([json.loads(line) for line in f]) == 5
+
+
+def test_refit_runs_in_the_background_and_swaps_the_model(tmp_path):
+    router = make_router(tmp_path, refit_every=3)
+    old_model = router.model
+
+    for number in range(3):
+        router.record_label(f"zebra crossing faded near junction {number}", 'Education')
+    wait_for_refit(router)
+
+    assert router.model is not old_model
+    assert router._refit_thread is None
+    assert router._pending == 0
+    assert router.model.predict("zebra crossing faded near junction")[0] == 'Education'
+
+
+def test_unknown_categories_and_duplicates_are_ignored(tmp_path):
+    router = make_router(tmp_path)
+
+    router.record_label("Potholes on the main road", 'Transport')
+    router.record_label("overflowing garbage", 'Health')
+
+    assert len(router.labels) == 0
@@ -0,0 +1,46 @@
+from config import Config
+from gemini_client import clear_clients, get_client, set_backend
+from mission_generator import MissionStatementGenerator
+from model_backends import FakeBackend
+from problem_classifier import ProblemClassifier
+
+
+def test_clients_are_shared_per_model_and_task():
+    client = get_client(Config.TEXT_MODEL, task='classification')
+
+    assert get_client(Config.TEXT_MODEL, task='classification') is client
+    assert get_client(Config.TEXT_MODEL, task='mission') is not client
+    assert get_client('gemini-other', task='classification') is not client
+
+
+def test_module_instances_reuse_the_shared_clients():
+    assert ProblemClassifier(fast_path=False).client is ProblemClassifier(fast_path=False).client
+    assert MissionStatementGenerator().client is MissionStatementGenerator().client
+
+
+def test_all_clients_share_one_backend():
+    first = get_client(Config.TEXT_MODEL, task='classification')
+    second = get_client(Config.VISION_MODEL, task='vision')
+
+    assert first.backend is second.backend
+
+
+def test_clear_clients_builds_fresh_ones():
+    client = get_client(Config.TEXT_MODEL, task='classification')
+
+    clear_clients()
+
+    assert get_client(Config.TEXT_MODEL, task='classification') is not client
+
+
+def test_set_backend_routes_new_clients_until_reset():
+    backend = FakeBackend(rules=[('', 'overridden')])
+    set_backend(backend)
+    try:
+        client = get_client(Config.TEXT_MODEL, task='classification')
+        assert client.backend is backend
+        assert client.generate("Anything").text == 'overridden'
+    finally:
+        set_backend(None)
+
+    assert get_client(Config.TEXT_MODEL, task='classification').backend is not backend
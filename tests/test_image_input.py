@@ -0,0 +1,71 @@
+import io
+
+import pytest
+from PIL import Image
+
+from image_input import describe_source, image_part, read_image_bytes, sniff_mime_type
+from integrated_system import AILearningPlatform
+
+
+def encoded(format_name, size=(32, 24)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, format=format_name)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('format_name, mime_type', [
+    ('JPEG', 'image/jpeg'), ('PNG', 'image/png'), ('WEBP', 'image/webp'),
+    ('BMP', None), ('GIF', None)
+])
+def test_sniff_mime_type(format_name, mime_type):
+    assert sniff_mime_type(encoded(format_name)) == mime_type
+
+
+def test_accepted_formats_are_sent_as_uploaded():
+    data = encoded('JPEG')
+
+    part = image_part(io.BytesIO(data))
+
+    assert part == {'mime_type': 'image/jpeg', 'data': data}
+
+
+def test_other_formats_are_decoded_once():
+    part = image_part(encoded('BMP'))
+
+    assert part.size == (32, 24)
+
+
+def test_reading_a_file_object_leaves_its_position_alone():
+    class Upload:
+        """A file-like object without getvalue(), such as an open file"""
+
+        def __init__(self, data):
+            self._buffer = io.BytesIO(data)
+            self.read, self.seek, self.tell = self._buffer.read, self._buffer.seek, self._buffer.tell
+
+    data = encoded('PNG')
+    upload = Upload(data)
+    upload.seek(5)
+
+    assert read_image_bytes(upload) == data[5:]
+    assert upload.tell() == 5
+
+
+def test_describe_source_prefers_the_upload_name(tmp_path):
+    upload = io.BytesIO(encoded('PNG'))
+    upload.name = 'street.png'
+
+    assert describe_source(upload) == 'street.png'
+    assert describe_source(str(tmp_path / 'a.jpg')) == str(tmp_path / 'a.jpg')
+    assert describe_source(Image.new('RGB', (2, 2))) == '<image>'
+    assert describe_source(b'raw') == '<image bytes>'
+
+
+def test_platform_analyzes_an_in_memory_upload():
+    upload = io.BytesIO(encoded('JPEG', size=(128, 96)))
+    upload.name = 'market.jpg'
+
+    result = AILearningPlatform(speculative=False, prefetch_mentor=False).process_image(upload)
+
+    assert result['success']
+    assert result['image_path'] == 'market.jpg'
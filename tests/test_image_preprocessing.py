@@ -0,0 +1,69 @@
+import io
+
+import pytest
+from PIL import Image
+
+from image_preprocessing import ImagePreprocessor
+
+
+def jpeg(size, exif=None, quality=95):
+    buffer = io.BytesIO()
+    image = Image.effect_noise(size, 40).convert('RGB')
+    image.save(buffer, format='JPEG', quality=quality, **({'exif': exif.tobytes()} if exif else {}))
+    return buffer.getvalue()
+
+
+def decoded(part):
+    return Image.open(io.BytesIO(part['data']))
+
+
+def test_large_photo_is_downscaled_and_re_encoded():
+    data = jpeg((4000, 3000))
+
+    part, report = ImagePreprocessor(max_long_edge=1024).process(data)
+
+    assert part['mime_type'] == 'image/jpeg'
+    assert decoded(part).size == (1024, 768)
+    assert report['resized'] and report['re_encoded']
+    assert report['sent_bytes'] < report['original_bytes']
+
+
+def test_small_clean_upload_goes_out_untouched():
+    data = jpeg((640, 480))
+    preprocessor = ImagePreprocessor(max_long_edge=1024)
+
+    part, report = preprocessor.process(data)
+
+    assert part['data'] is data
+    assert not report['resized'] and not report['re_encoded']
+    assert preprocessor.stats()['bytes_saved'] == 0
+
+
+def test_exif_orientation_is_applied_and_metadata_dropped():
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = 'PhoneMaker'
+
+    part, report = ImagePreprocessor(max_long_edge=1024).process(jpeg((400, 300), exif=exif))
+
+    sent = decoded(part)
+    assert sent.size == (300, 400)
+    assert not sent.getexif()
+    assert report['re_encoded'] and not report['resized']
+
+
+@pytest.mark.parametrize('mode', ['RGBA', 'P'])
+def test_webp_output_keeps_transparency(mode):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (3000, 1000), (0, 128, 0, 100)).convert(mode).save(buffer, format='PNG')
+
+    part, _ = ImagePreprocessor(max_long_edge=600, output_format='webp').process(buffer.getvalue())
+
+    assert part['mime_type'] == 'image/webp'
+    assert decoded(part).size == (600, 200)
+    assert decoded(part).mode == 'RGBA'
+
+
+def test_unknown_output_format_is_rejected():
+    with pytest.raises(ValueError):
+        ImagePreprocessor(output_format='TIFF')
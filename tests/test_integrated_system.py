@@ -0,0 +1,129 @@
+import pytest
+from PIL import Image
+
+from integrated_system import AILearningPlatform
+from model_backends import FakeBackend
+
+
+@pytest.fixture
+def platform():
+    return AILearningPlatform(speculative=False, prefetch_mentor=False)
+
+
+@pytest.fixture
+def image():
+    return Image.new('RGB', (64, 64), 'green')
+
+
+def broken(*args, **kwargs):
+    raise RuntimeError("classifier broke")
+
+
+def test_image_analysis_survives_a_classifier_that_raises(platform, image, monkeypatch):
+    monkeypatch.setattr(platform.problem_classifier, 'classify_with_vision_analysis', broken)
+
+    result = platform.process_image(image)
+
+    assert result['success']
+    assert result['classification'] == {'success': False, 'error': 'classifier broke'}
+    # The mission depends on the classification, so it is reported as skipped
+    assert result['mission_statement']['success'] is False
+
+
+def test_image_analysis_survives_a_mission_generator_that_raises(platform, image, monkeypatch):
+    monkeypatch.setattr(platform.mission_generator, 'generate_mission_statement', broken)
+
+    result = platform.process_image(image)
+
+    assert result['success']
+    assert result['classification']['success']
+    assert result['mission_statement'] == {'success': False, 'error': 'classifier broke'}
+
+
+def test_image_analysis_carries_a_failed_mission_result(platform, image, monkeypatch):
+    monkeypatch.setattr(platform.mission_generator, 'generate_mission_statement',
+                        lambda *args, **kwargs: {'success': False, 'error': 'no mission'})
+
+    result = platform.process_image(image)
+
+    assert result['success']
+    assert result['mission_statement']['error'] == 'no mission'
+
+
+def test_text_analysis_fails_on_a_failed_mission(platform, monkeypatch):
+    monkeypatch.setattr(platform.mission_generator, 'generate_mission_statement',
+                        lambda *args, **kwargs: {'success': False, 'error': 'no mission'})
+
+    result = platform.process_text_description("Rubbish piles up by the school gate")
+
+    assert not result['success']
+    assert result['step'] == 'mission_generation'
+    assert result['classification']['success']
+
+
+def test_multiple_images_keep_input_order_and_isolate_failures(platform, monkeypatch):
+    images = [Image.new('RGB', (64, 64), colour) for colour in ('red', 'green', 'blue')]
+    original = platform.process_image
+
+    def process(image, *args, **kwargs):
+        if image is images[1]:
+            raise RuntimeError("unreadable upload")
+        return original(image, *args, **kwargs)
+
+    monkeypatch.setattr(platform, 'process_image', process)
+    finished = []
+
+    results = platform.process_multiple_images(
+        images, max_workers=3, on_result=lambda index, result: finished.append(index)
+    )
+
+    assert [result['success'] for result in results] == [True, False, True]
+    assert results[1]['step'] == 'vision_detection'
+    assert sorted(finished) == [0, 1, 2]
+
+
+def test_fused_mode_makes_one_call_and_reports_every_stage(platform, image):
+    stages = []
+
+    result = platform.process_image(image, fused=True,
+                                    on_stage=lambda stage, value: stages.append(stage))
+
+    assert result['success']
+    assert result['classification']['source'] == 'fused_vision_analysis'
+    assert result['mission_statement']['success']
+    assert result['telemetry']['model_calls'] == 1
+    assert stages == ['vision', 'classification', 'mission']
+
+
+def test_fused_mode_falls_back_to_separate_calls_on_invalid_json(platform, image, monkeypatch):
+    monkeypatch.setattr(platform.vision_detector.client, 'backend',
+                        FakeBackend(rules=[('"primary_category"', 'not json at all')]))
+
+    result = platform.process_image(image, fused=True)
+
+    assert result['success']
+    assert result['classification']['success']
+    assert result['classification'].get('source') != 'fused_vision_analysis'
+    assert result['telemetry']['model_calls'] > 1
+
+
+def test_image_stages_are_reported_as_they_finish(platform, image):
+    events = []
+
+    result = platform.process_image(image, on_stage=lambda stage, value: events.append(stage))
+
+    assert result['success']
+    assert events.index('vision') < events.index('classification') < events.index('mission')
+
+
+def test_text_stages_are_reported_as_they_finish(platform):
+    events = {}
+
+    result = platform.process_text_description(
+        "Rubbish piles up by the school gate",
+        on_stage=lambda stage, value: events.setdefault(stage, value)
+    )
+
+    assert result['success']
+    assert events['classification'] == result['classification']
+    assert events['mission'] == result['mission_statement']
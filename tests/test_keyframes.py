@@ -0,0 +1,90 @@
+import io
+
+import pytest
+from PIL import Image
+
+import keyframes
+from keyframes import KeyframeExtractor, is_animated, is_video
+from model_backends import FakeBackend
+from vision_detector import CommunityIssueDetector
+
+SCENES = ['red', 'red', 'red', 'blue', 'blue', 'white', 'white', 'white']
+
+
+def gif(colours, duration=500):
+    """An animated GIF with one frame per colour, each shown for duration ms"""
+    frames = [Image.new('RGB', (64, 48), colour) for colour in colours]
+    for index, frame in enumerate(frames):
+        # One marked pixel per frame, so the encoder does not merge repeated frames
+        frame.putpixel((index, 0), (0, 255, 0))
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format='GIF', save_all=True, append_images=frames[1:],
+                   duration=duration, loop=0)
+    return buffer.getvalue()
+
+
+def test_keyframes_are_kept_only_at_scene_changes():
+    extractor = KeyframeExtractor(sample_fps=10, threshold=0.1, max_keyframes=8)
+
+    frames, scanned = extractor.extract(gif(SCENES))
+
+    assert scanned == len(SCENES)
+    assert [frame.frame_index for frame in frames] == [0, 3, 5]
+    assert [frame.timestamp for frame in frames] == [0.0, 1.5, 2.5]
+    assert frames[0].score == 1.0
+
+
+def test_sampling_rate_skips_frames_between_samples():
+    extractor = KeyframeExtractor(sample_fps=1, threshold=0.1, max_keyframes=8)
+
+    # Frames every 0.5 s sampled once a second: only the even frames are scored
+    frames, scanned = extractor.extract(gif(SCENES))
+
+    assert scanned == 4
+    assert [frame.frame_index for frame in frames] == [0, 4, 6]
+
+
+def test_cap_keeps_the_opening_frame_and_the_sharpest_changes():
+    colours = ['black', (40, 40, 40), 'white', (200, 200, 200), (60, 60, 60)]
+    extractor = KeyframeExtractor(sample_fps=10, threshold=0.05, max_keyframes=3)
+
+    frames, _ = extractor.extract(gif(colours))
+
+    # black -> dark grey and white -> light grey are the weakest changes
+    assert [frame.frame_index for frame in frames] == [0, 2, 4]
+
+
+def test_input_type_detection():
+    upload = io.BytesIO(b'')
+    upload.name = 'walkthrough.MP4'
+
+    assert is_video(upload)
+    assert not is_video('street.jpg')
+    assert is_animated(gif(['red', 'blue']))
+    assert not is_animated(gif(['red']))
+
+
+@pytest.mark.skipif(keyframes.cv2 is not None, reason="OpenCV is installed")
+def test_video_without_opencv_fails_with_an_install_hint():
+    upload = io.BytesIO(b'not really a video')
+    upload.name = 'walkthrough.mp4'
+
+    result = CommunityIssueDetector().detect_issues_in_video(upload)
+
+    assert result['success'] is False
+    assert 'opencv' in result['error'].lower()
+
+
+def test_each_keyframe_is_analyzed_once(monkeypatch):
+    detector = CommunityIssueDetector(dedup=False, coarse_to_fine=False)
+    monkeypatch.setattr(detector, 'keyframe_extractor',
+                        KeyframeExtractor(sample_fps=10, threshold=0.1, max_keyframes=8))
+    backend = FakeBackend()
+    monkeypatch.setattr(detector.client, 'backend', backend)
+
+    result = detector.detect_issues_in_video(gif(SCENES))
+
+    assert result['success']
+    assert backend.calls == 3
+    assert result['frames_scanned'] == len(SCENES)
+    assert [frame['timestamp'] for frame in result['keyframes']] == [0.0, 1.5, 2.5]
@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from ai_mentor import AIMentor
+from mentor_prefetch import CRITICAL_THINKING, SOLUTION, MentorPrefetcher, session_scope
+from model_backends import FakeBackend
+from telemetry import trace_request
+
+PROBLEM = "Rubbish piles up beside the market every week"
+
+
+@pytest.fixture
+def mentor(monkeypatch):
+    mentor = AIMentor(structured_output=False)
+    monkeypatch.setattr(mentor.client, 'backend', FakeBackend())
+    return mentor
+
+
+def test_prefetched_guidance_is_served_and_counted(mentor):
+    prefetcher = MentorPrefetcher(mentor, budget_per_hour=10)
+
+    with session_scope('alice'):
+        assert prefetcher.prefetch(PROBLEM)
+        guidance = prefetcher.get(PROBLEM, CRITICAL_THINKING, timeout=10)
+        template = prefetcher.get(PROBLEM, SOLUTION, timeout=10)
+        stats = prefetcher.stats()
+
+    assert guidance['success'] and guidance['prefetched']
+    assert template['success'] and template['prefetched']
+    assert (stats['started'], stats['hits'], stats['budget_used']) == (1, 2, 2)
+
+
+def test_prefetched_calls_belong_to_the_request_trace(mentor):
+    prefetcher = MentorPrefetcher(mentor, budget_per_hour=10)
+
+    with session_scope('alice'), trace_request('image') as trace:
+        prefetcher.prefetch(PROBLEM)
+        prefetcher.get(PROBLEM, CRITICAL_THINKING, timeout=10)
+        prefetcher.get(PROBLEM, SOLUTION, timeout=10)
+
+    assert [call.stage for call in trace.calls] == ['mentor_prefetch', 'mentor_prefetch']
+
+
+def test_each_session_has_its_own_hourly_budget(mentor):
+    prefetcher = MentorPrefetcher(mentor, budget_per_hour=3)
+
+    with session_scope('alice'):
+        assert prefetcher.prefetch(PROBLEM)
+        assert not prefetcher.prefetch("The clinic has run out of malaria tests")
+        # An analysis already prefetched costs nothing more
+        assert prefetcher.prefetch(PROBLEM)
+    with session_scope('bob'):
+        assert prefetcher.prefetch("The clinic has run out of malaria tests")
+
+    assert prefetcher.over_budget == 1
+
+
+def test_sessions_only_see_and_cancel_their_own_prefetches(mentor):
+    prefetcher = MentorPrefetcher(mentor, budget_per_hour=10)
+
+    with session_scope('alice'):
+        prefetcher.prefetch(PROBLEM)
+    with session_scope('bob'):
+        assert prefetcher.get(PROBLEM, CRITICAL_THINKING, timeout=10) is None
+        assert not prefetcher.cancel(PROBLEM)
+        assert prefetcher.stats()['budget_used'] == 0
+    with session_scope('alice'):
+        assert prefetcher.get(PROBLEM, CRITICAL_THINKING, timeout=10)['prefetched']
+
+
+def test_cancel_discards_running_work_and_skips_queued_work(mentor, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(prompt):
+        started.set()
+        release.wait(timeout=10)
+        return "GUIDING QUESTIONS:\n- Who is affected?"
+
+    backend = FakeBackend(rules=[('', slow)])
+    monkeypatch.setattr(mentor.client, 'backend', backend)
+    prefetcher = MentorPrefetcher(mentor, max_workers=1, budget_per_hour=10)
+
+    with session_scope('alice'):
+        prefetcher.prefetch(PROBLEM)
+        assert started.wait(timeout=10)
+        assert prefetcher.cancel(PROBLEM)
+        release.set()
+        prefetcher._executor.submit(lambda: None).result(timeout=10)
+
+        assert prefetcher.get(PROBLEM, CRITICAL_THINKING, timeout=10) is None
+        assert prefetcher.get(PROBLEM, SOLUTION, timeout=10) is None
+
+    assert backend.calls == 1
+    assert prefetcher.cancelled == 1
+
+
+def test_oldest_sessions_are_forgotten_with_their_work(mentor):
+    prefetcher = MentorPrefetcher(mentor, budget_per_hour=10, max_sessions=2)
+
+    for session_id in ('alice', 'bob', 'carol'):
+        with session_scope(session_id):
+            prefetcher.prefetch(PROBLEM)
+
+    with session_scope('alice'):
+        assert prefetcher.get(PROBLEM, CRITICAL_THINKING, timeout=10) is None
+    assert prefetcher.stats()['sessions'] == 2
@@ -0,0 +1,15 @@
+from mission_generator import MissionStatementGenerator
+
+
+def test_structured_prompt_carries_no_header_format():
+    prompt = MissionStatementGenerator(structured_output=True)._create_mission_prompt("No clean water")
+
+    assert 'MISSION STATEMENT:' not in prompt
+    assert '"mission_statement"' in prompt
+
+
+def test_plain_prompt_lists_the_parsed_headers():
+    prompt = MissionStatementGenerator(structured_output=False)._create_mission_prompt("No clean water")
+
+    assert 'MISSION STATEMENT:' in prompt
+    assert 'ACTION STEPS:' in prompt
@@ -0,0 +1,140 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from config import Config
+from model_backends import (
+    FakeBackend, FaultInjectingBackend, GeminiBackend, InjectedError, RecordingBackend,
+    ReplayBackend, ReplayMissError, create_backend
+)
+from structured_output import ClassificationOutput, MissionOutput, json_generation_config
+
+
+class PartlessChunk:
+    parts = []
+
+    @property
+    def text(self):
+        raise ValueError("The `response.text` quick accessor requires a valid `Part`")
+
+
+def text_chunk(text):
+    return SimpleNamespace(parts=[SimpleNamespace(text=text)], text=text)
+
+
+def test_gemini_stream_skips_chunks_without_parts(monkeypatch):
+    backend = GeminiBackend(api_key='test-key')
+    chunks = [text_chunk("Hello "), PartlessChunk(), text_chunk("world"), PartlessChunk()]
+    model = SimpleNamespace(generate_content=lambda contents, **kwargs: iter(chunks))
+    monkeypatch.setattr(backend, '_model', lambda model_name, system_instruction: model)
+
+    assert list(backend.generate_stream('gemini-test', "Say hello")) == ["Hello ", "world"]
+
+
+def test_fake_answers_are_deterministic_and_follow_the_schema():
+    config = json_generation_config(ClassificationOutput.schema(Config.CATEGORIES))
+    prompt = "Classify: the clinic has no nurse"
+
+    first = FakeBackend().generate('model', prompt, config).text
+    second = FakeBackend().generate('model', prompt, config).text
+
+    assert first == second
+    assert ClassificationOutput.from_json(first, Config.CATEGORIES).category in Config.CATEGORIES
+    assert MissionOutput.from_json(
+        FakeBackend().generate('model', prompt, json_generation_config(MissionOutput.SCHEMA)).text
+    ).mission_statement
+
+
+def test_fake_answers_repeat_the_requested_headers():
+    text = FakeBackend().generate('model', "Answer with\nGOAL:\n[one goal]\n\nRISKS:\n[risks]").text
+
+    assert 'GOAL:' in text and 'RISKS:' in text
+
+
+def test_fake_rules_override_the_generated_answer():
+    backend = FakeBackend(rules=[('clinic', 'rule answer'), ('', lambda prompt: prompt.upper())])
+
+    assert backend.generate('model', "the clinic").text == 'rule answer'
+    assert backend.generate('model', "school").text == 'SCHOOL'
+    assert list(backend.generate_stream('model', "the clinic")) == ['rule answer']
+    assert backend.calls == 3
+
+
+def test_recorded_responses_replay_without_the_inner_backend(tmp_path):
+    path = str(tmp_path / 'recording.jsonl')
+    recorder = RecordingBackend(FakeBackend(seed=3), path)
+    live_text = recorder.generate('model', "Describe the river").text
+    streamed = ''.join(recorder.generate_stream('model', "Stream the river", None, 'Be brief'))
+
+    replay = ReplayBackend(path)
+
+    assert replay.generate('model', "Describe the river").text == live_text
+    assert ''.join(replay.generate_stream('model', "Stream the river", None, 'Be brief')) == streamed
+    assert asyncio.run(replay.generate_async('model', "Describe the river")).text == live_text
+    assert replay.hits == 3
+
+
+def test_replay_miss_fails_or_uses_the_fallback(tmp_path):
+    path = str(tmp_path / 'recording.jsonl')
+
+    with pytest.raises(ReplayMissError):
+        ReplayBackend(path).generate('model', "Never recorded")
+
+    replay = ReplayBackend(path, fallback=FakeBackend(rules=[('', 'from fallback')]))
+    assert replay.generate('model', "Never recorded").text == 'from fallback'
+    assert replay.misses == 1
+
+
+def test_fault_injection_waits_and_fails_at_the_configured_rate():
+    delays = []
+    backend = FaultInjectingBackend(FakeBackend(), latency_ms=50, jitter_ms=0, error_rate=0.25,
+                                    seed=1, sleep=delays.append)
+
+    failures = 0
+    for _ in range(400):
+        try:
+            backend.generate('model', "Anything")
+        except InjectedError as e:
+            assert str(e).startswith('503')
+            failures += 1
+
+    assert delays == [0.05] * 400
+    assert failures == backend.injected_errors
+    assert 70 <= failures <= 130
+
+
+def test_fault_injection_jitter_has_a_long_tail():
+    delays = []
+    backend = FaultInjectingBackend(FakeBackend(), latency_ms=0, jitter_ms=100, error_rate=0,
+                                    seed=2, sleep=delays.append)
+    for _ in range(2000):
+        backend.generate('model', "Anything")
+
+    delays.sort()
+    assert 0.08 < sum(delays) / len(delays) < 0.12
+    assert delays[int(len(delays) * 0.99)] > 3 * delays[len(delays) // 2]
+
+
+def test_fault_injection_times_out_instead_of_answering_late():
+    delays = []
+    backend = FaultInjectingBackend(FakeBackend(), latency_ms=5000, jitter_ms=0, error_rate=0,
+                                    sleep=delays.append)
+
+    with pytest.raises(InjectedError, match='504'):
+        backend.generate('model', "Anything", timeout=1.5)
+    assert delays == [1.5]
+
+
+def test_create_backend_by_name(monkeypatch):
+    monkeypatch.setattr(Config, 'BACKEND_LATENCY_MS', 0)
+    monkeypatch.setattr(Config, 'BACKEND_JITTER_MS', 0)
+    monkeypatch.setattr(Config, 'BACKEND_ERROR_RATE', 0.1)
+
+    backend = create_backend('fake')
+
+    assert isinstance(backend, FaultInjectingBackend)
+    assert isinstance(backend.inner, FakeBackend)
+    assert not backend.live and not backend.cacheable
+    with pytest.raises(ValueError):
+        create_backend('nonsense')
@@ -0,0 +1,87 @@
+import io
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from perceptual_hash import (
+    HASH_FUNCTIONS, ImageHashIndex, MultiIndexHash, group_near_duplicates, hamming_distance
+)
+
+
+def scene(size=(320, 240), seed=0):
+    """An asymmetric picture, so rotations change its hash"""
+    rng = random.Random(seed)
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.rectangle([x, y, x + 60, y + 30], fill=(rng.randrange(256), 0, rng.randrange(256)))
+    draw.rectangle([0, 0, size[0] // 3, size[1] // 2], fill='black')
+    return image
+
+
+def jpeg_bytes(image, orientation=None):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(buffer, format='JPEG', quality=90, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('method', sorted(HASH_FUNCTIONS))
+def test_exif_rotated_upload_hashes_like_the_upright_photo(method):
+    upright = scene()
+    hash_image = HASH_FUNCTIONS[method]
+
+    # Orientation 6 means the stored pixels must turn 90 degrees clockwise to display upright
+    stored_sideways = jpeg_bytes(upright.transpose(Image.Transpose.ROTATE_90), orientation=6)
+
+    assert hamming_distance(hash_image(stored_sideways), hash_image(jpeg_bytes(upright))) <= 6
+
+
+@pytest.mark.parametrize('method', sorted(HASH_FUNCTIONS))
+def test_recompressed_copy_is_near_and_other_scene_is_far(method):
+    hash_image = HASH_FUNCTIONS[method]
+    original = hash_image(jpeg_bytes(scene()))
+    smaller = hash_image(jpeg_bytes(scene().resize((160, 120))))
+    other = hash_image(jpeg_bytes(scene(seed=7)))
+
+    assert hamming_distance(original, smaller) <= 6
+    assert hamming_distance(original, other) > 6
+
+
+def test_multi_index_search_matches_a_linear_scan():
+    rng = random.Random(3)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    # Near copies of the first values, a few bits flipped
+    values += [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in values[:50]]
+    index = MultiIndexHash()
+    for position, value in enumerate(values):
+        index.add(value, position)
+
+    for query in values[:60]:
+        expected = sorted(p for p, v in enumerate(values) if hamming_distance(query, v) <= 6)
+        assert sorted(item for _, item in index.search(query, 6)) == expected
+
+
+def test_group_near_duplicates_keeps_unhashable_items_apart():
+    assert group_near_duplicates([0b1011, None, 0b1010, 1 << 40, None], 2) == [[0, 2], [1], [3], [4]]
+
+
+def test_index_finds_matches_only_in_the_same_scope_and_persists(tmp_path):
+    db_path = str(tmp_path / 'hashes.sqlite3')
+    index = ImageHashIndex(db_path=db_path, max_distance=6)
+    image_hash = index.hash_image(jpeg_bytes(scene()))
+    index.add(image_hash, 'detect:Health', 'street.jpg', {'success': True, 'raw_response': object()})
+
+    near = index.hash_image(jpeg_bytes(scene().resize((160, 120))))
+    distance, source, result = index.find(near, 'detect:Health')
+    assert source == 'street.jpg'
+    assert result == {'success': True}
+    assert index.find(near, 'detect:Education') is None
+
+    reopened = ImageHashIndex(db_path=db_path, max_distance=6)
+    assert len(reopened) == 1
+    assert reopened.find(image_hash, 'detect:Health')[0] == 0
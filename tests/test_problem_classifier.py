@@ -0,0 +1,116 @@
+import pytest
+
+from model_backends import FakeBackend
+from problem_classifier import ProblemClassifier
+
+
+def answering(monkeypatch, classifier, text):
+    """Route the classifier's model calls to a fake backend that always gives text"""
+    monkeypatch.setattr(classifier.client, 'backend', FakeBackend(rules=[('', text)]))
+
+
+@pytest.fixture
+def classifier():
+    return ProblemClassifier(fast_path=False, structured_output=False)
+
+
+def test_header_response_is_parsed(classifier, monkeypatch):
+    answering(monkeypatch, classifier,
+              "PRIMARY CATEGORY: Health\nCONFIDENCE: High\nREASONING: The clinic is short of staff.")
+
+    result = classifier.classify_problem("The clinic has one nurse", use_reasoning=True)
+
+    assert result['success']
+    assert result['category'] == 'Health'
+    assert result['confidence'] == 'High'
+    assert result['reasoning'] == 'The clinic is short of staff.'
+
+
+@pytest.mark.parametrize('structured', [False, True])
+def test_response_naming_no_category_fails(monkeypatch, structured):
+    classifier = ProblemClassifier(fast_path=False, structured_output=structured)
+    answering(monkeypatch, classifier, "I am not sure what this is about.")
+
+    assert classifier.classify_problem("Something odd")['success'] is False
+    assert classifier.classify_with_vision_analysis("Something odd")['success'] is False
+
+
+def test_empty_response_fails(classifier, monkeypatch):
+    answering(monkeypatch, classifier, "")
+
+    result = classifier.classify_with_vision_analysis("A flooded street")
+
+    assert result['success'] is False
+    assert 'none of the categories' in result['error']
+
+
+def test_batch_classification_isolates_failures(classifier, monkeypatch):
+    descriptions = ["Flooded street", "Clinic without nurses", "Broken desks"]
+    original = classifier.classify_problem
+
+    def classify(description, *args, **kwargs):
+        if description == "Clinic without nurses":
+            raise RuntimeError("model unavailable")
+        return original(description, *args, **kwargs)
+
+    monkeypatch.setattr(classifier, 'classify_problem', classify)
+
+    results = classifier.classify_batch(descriptions, max_workers=3)
+
+    assert [result['success'] for result in results] == [True, False, True]
+    assert results[1]['problem_description'] == "Clinic without nurses"
+
+
+def test_packed_response_lines_parse_in_any_order(classifier):
+    response = """Here you go:
+[2] | Health | low
+**0** | **Environment** | High
+1 | Transport | Medium
+3 |education| Medium"""
+
+    assert classifier._parse_packed_response(response) == {
+        2: ('Health', 'Low'),
+        0: ('Environment', 'High'),
+        3: ('Education', 'Medium')
+    }
+
+
+def test_packed_batch_re_asks_only_for_missing_items(classifier, monkeypatch):
+    prompts = []
+
+    def answer(prompt):
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            return "2 | Education | High\n0 | Environment | Medium"
+        return "1 | Health | Low"
+
+    answering(monkeypatch, classifier, answer)
+    descriptions = ["Flooded street", "Clinic without nurses", "Broken desks"]
+
+    results = classifier.classify_batch(descriptions, packed=True)
+
+    assert [result['category'] for result in results] == ['Environment', 'Health', 'Education']
+    assert all(result['source'] == 'llm_packed' for result in results)
+    assert len(prompts) == 2
+    assert '[1] "Clinic without nurses"' in prompts[1]
+    assert '[0]' not in prompts[1] and '[2]' not in prompts[1]
+
+
+def test_packed_items_never_answered_fail_alone(classifier, monkeypatch):
+    answering(monkeypatch, classifier, "0 | Environment | High")
+
+    results = classifier.classify_batch(["Flooded street", "Clinic without nurses"], packed=True)
+
+    assert results[0]['success'] and results[0]['category'] == 'Environment'
+    assert results[1]['success'] is False
+    assert results[1]['problem_description'] == "Clinic without nurses"
+
+
+def test_packs_respect_the_token_budget(classifier):
+    items = [(index, "word " * 40) for index in range(10)]
+    preamble = classifier._estimate_tokens(classifier._create_packed_prompt([]))
+
+    packs = classifier._split_into_packs(items, token_budget=preamble + 3 * 71)
+
+    assert [len(pack) for pack in packs] == [3, 3, 3, 1]
+    assert [index for pack in packs for index, _ in pack] == list(range(10))
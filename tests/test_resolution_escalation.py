@@ -0,0 +1,99 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from model_backends import FakeBackend
+from resolution_escalation import ResolutionStats, default_escalation_rule
+from structured_output import CoarseIssuesOutput
+from vision_detector import CommunityIssueDetector
+
+DOMAINS = ['Environment', 'Health', 'Education']
+COARSE_PROMPT = 'reduced-resolution preview'
+
+
+def coarse(confidence='High', issues=(('Environment', 'High'),)):
+    return {
+        'issues': [{'domain': domain, 'issue': f"{domain} issue", 'description': 'Seen',
+                    'severity': severity} for domain, severity in issues],
+        'visual_evidence': 'Rubbish by the road',
+        'recommendations': ['Clean up'],
+        'confidence': confidence
+    }
+
+
+@pytest.mark.parametrize('data, reason', [
+    (coarse(), None),
+    (coarse(issues=(('Environment', 'High'), ('Health', 'Low'))), None),
+    (coarse(confidence='Low'), 'low_confidence'),
+    (coarse(issues=()), 'no_issues'),
+    (coarse(issues=(('Transport', 'High'),)), 'conflicting_domains'),
+    (coarse(issues=(('Environment', 'High'), ('Health', 'High'))), 'conflicting_domains'),
+])
+def test_default_escalation_rule(data, reason):
+    assert default_escalation_rule(CoarseIssuesOutput.from_dict(data), DOMAINS) == reason
+
+
+def photo(size):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 40).convert('RGB').save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def detector_answering(monkeypatch, coarse_answer):
+    detector = CommunityIssueDetector(dedup=False, coarse_to_fine=True)
+    backend = FakeBackend(rules=[(COARSE_PROMPT, coarse_answer)])
+    monkeypatch.setattr(detector.client, 'backend', backend)
+    return detector, backend
+
+
+def test_confident_preview_is_enough(monkeypatch):
+    detector, backend = detector_answering(monkeypatch, json.dumps(coarse()))
+
+    result = detector.detect_issues(photo((2000, 1500)))
+
+    assert result['success']
+    assert result['resolution'] == 'coarse'
+    assert backend.calls == 1
+    assert detector.resolution_stats()['resolved_coarse'] == 1
+
+
+def test_unsure_preview_escalates_to_full_resolution(monkeypatch):
+    detector, backend = detector_answering(monkeypatch, json.dumps(coarse(confidence='Low')))
+
+    result = detector.detect_issues(photo((2000, 1500)))
+
+    assert result['success']
+    assert (result['resolution'], result['escalation_reason']) == ('full', 'low_confidence')
+    assert backend.calls == 2
+    assert detector.resolution_stats()['escalation_reasons'] == {'low_confidence': 1}
+
+
+def test_unparseable_preview_escalates(monkeypatch):
+    detector, backend = detector_answering(monkeypatch, 'I see a road.')
+
+    result = detector.detect_issues(photo((2000, 1500)))
+
+    assert result['escalation_reason'] == 'coarse_unparseable'
+    assert backend.calls == 2
+
+
+def test_small_photo_is_never_escalated(monkeypatch):
+    detector, backend = detector_answering(monkeypatch, json.dumps(coarse(confidence='Low')))
+
+    result = detector.detect_issues(photo((400, 300)))
+
+    assert result['resolution'] == 'coarse'
+    assert backend.calls == 1
+
+
+def test_stats_average_uploaded_bytes():
+    stats = ResolutionStats()
+    stats.record(1000)
+    stats.record(5000, 'no_issues')
+
+    assert stats.stats() == {
+        'images': 2, 'resolved_coarse': 1, 'escalated': 1, 'coarse_share': 0.5,
+        'avg_bytes_per_image': 3000.0, 'escalation_reasons': {'no_issues': 1}
+    }
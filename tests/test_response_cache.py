@@ -0,0 +1,151 @@
+import pytest
+
+from response_cache import MemoryCache, ResponseCache, SQLiteCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_cache_key_covers_model_contents_and_config():
+    key = make_cache_key('model-a', ['prompt', b'image'], {'temperature': 0})
+
+    assert key == make_cache_key('model-a', ['prompt', b'image'], {'temperature': 0})
+    assert key != make_cache_key('model-b', ['prompt', b'image'], {'temperature': 0})
+    assert key != make_cache_key('model-a', ['prompt', b'other'], {'temperature': 0})
+    assert key != make_cache_key('model-a', ['prompt', b'image'], {'temperature': 1})
+    # Part boundaries are part of the key
+    assert make_cache_key('m', ['ab', 'c']) != make_cache_key('m', ['a', 'bc'])
+
+
+def test_memory_entries_expire_after_ttl(clock):
+    cache = MemoryCache(ttl_seconds=60, clock=clock)
+    cache.set('key', 'value')
+
+    clock.advance(60)
+    assert cache.get('key') == 'value'
+
+    clock.advance(1)
+    assert cache.get('key') is None
+    assert cache.evictions == 1
+    assert len(cache) == 0
+
+
+def test_memory_evicts_least_recently_used(clock):
+    cache = MemoryCache(max_entries=2, clock=clock)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    cache.get('a')
+    cache.set('c', '3')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == '1'
+    assert cache.get('c') == '3'
+    assert cache.evictions == 1
+
+
+def test_memory_overwrite_refreshes_ttl(clock):
+    cache = MemoryCache(ttl_seconds=60, clock=clock)
+    cache.set('key', 'old')
+    clock.advance(50)
+    cache.set('key', 'new')
+    clock.advance(50)
+
+    assert cache.get('key') == 'new'
+
+
+def test_sqlite_entries_expire_after_ttl(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), ttl_seconds=60, clock=clock)
+    cache.set('key', 'value')
+
+    clock.advance(61)
+    assert cache.get('key') is None
+    assert cache.evictions == 1
+
+
+def test_sqlite_set_purges_expired_rows(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), ttl_seconds=60, clock=clock)
+    cache.set('old', 'value')
+    clock.advance(61)
+    cache.set('new', 'value')
+
+    assert len(cache) == 1
+    assert cache.evictions == 1
+
+
+def test_sqlite_evicts_least_recently_read_past_size_budget(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), max_bytes=10, clock=clock)
+    cache.set('a', 'xxxx')
+    clock.advance(1)
+    cache.set('b', 'xxxx')
+    clock.advance(1)
+    cache.get('a')
+    clock.advance(1)
+    cache.set('c', 'xxxx')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'xxxx'
+    assert cache.get('c') == 'xxxx'
+    assert cache.evictions == 1
+
+
+def test_sqlite_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'nested' / 'cache.db')
+    SQLiteCache(path).set('key', 'value')
+
+    assert SQLiteCache(path).get('key') == 'value'
+
+
+def test_tiered_cache_promotes_lower_tier_hits(tmp_path, clock):
+    memory = MemoryCache(clock=clock)
+    disk = SQLiteCache(str(tmp_path / 'cache.db'), clock=clock)
+    cache = ResponseCache([memory, disk])
+    disk.set('key', 'value')
+
+    assert cache.get('key') == 'value'
+    assert memory.get('key') == 'value'
+    assert cache.get('key') == 'value'
+    assert cache.get('missing') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+    assert [tier['hits'] for tier in stats['tiers']] == [1, 1]
+
+
+def test_promoted_entries_keep_their_original_age(tmp_path, clock):
+    memory = MemoryCache(ttl_seconds=100, clock=clock)
+    disk = SQLiteCache(str(tmp_path / 'cache.db'), ttl_seconds=100, clock=clock)
+    cache = ResponseCache([memory, disk])
+    disk.set('key', 'value')
+
+    clock.advance(90)
+    assert cache.get('key') == 'value'
+    assert memory.get_entry('key') == ('value', 1000.0)
+
+    clock.advance(20)
+    assert memory.get('key') is None
+    assert cache.get('key') is None
+
+
+def test_tiered_cache_writes_and_clears_every_tier(tmp_path, clock):
+    memory = MemoryCache(clock=clock)
+    disk = SQLiteCache(str(tmp_path / 'cache.db'), clock=clock)
+    cache = ResponseCache([memory, disk])
+
+    cache.set('key', 'value')
+    assert memory.get('key') == disk.get('key') == 'value'
+
+    cache.clear()
+    assert len(memory) == len(disk) == 0
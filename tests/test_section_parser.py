@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from ai_mentor import SOCRATIC_SECTIONS
+from benchmarks.bench_section_parser import legacy_parse, synthetic_response
+from integrated_system import DETECTION_SECTIONS
+from mission_generator import MISSION_SECTIONS
+from section_parser import SectionParser
+
+WORDS = ['drain', 'clinic', 'pupils', 'litter', 'nurse', 'desk', 'river', 'smoke']
+
+
+def random_response(parser, rng):
+    """Some of the parser's sections in shuffled order, one header variant each, with filler"""
+    keys = rng.sample(list(parser.sections), rng.randint(1, len(parser.sections)))
+    parts = [' '.join(rng.choice(WORDS) for _ in range(5))]
+    for key in keys:
+        header = rng.choice(parser.sections[key])
+        lines = [' '.join(rng.choice(WORDS) for _ in range(6)) for _ in range(rng.randint(0, 3))]
+        parts.append(header + rng.choice([' ', '\n']) + '\n'.join(lines))
+    return '\n\n'.join(parts)
+
+
+@pytest.mark.parametrize('parser', [MISSION_SECTIONS, SOCRATIC_SECTIONS, DETECTION_SECTIONS],
+                         ids=['mission', 'socratic', 'detection'])
+def test_single_pass_parse_matches_the_old_parser(parser):
+    rng = random.Random(8)
+    for _ in range(200):
+        response = random_response(parser, rng)
+        assert parser.parse(response) == legacy_parse(response, parser.sections), response
+
+
+def test_large_responses_match_the_old_parser():
+    response = synthetic_response(50, random.Random(0))
+
+    assert MISSION_SECTIONS.parse(response) == legacy_parse(response, MISSION_SECTIONS.sections)
+
+
+def test_repeated_header_extends_to_the_next_other_section():
+    parser = SectionParser({'goal': ['GOAL:'], 'impact': ['IMPACT:']})
+    text = "GOAL: first\nGOAL: second\nIMPACT: wide"
+
+    assert parser.parse(text) == {'goal': 'first\nGOAL: second', 'impact': 'wide'}
+    assert [span.key for span in parser.find_all(text)] == ['goal', 'goal', 'impact']
+    assert parser.first(text, 'impact').start == text.index(' wide')
+
+
+def test_longer_header_wins_over_its_suffix():
+    parser = SectionParser({'category': ['CATEGORY:'], 'primary': ['PRIMARY CATEGORY:']})
+
+    assert parser.parse("PRIMARY CATEGORY: Health") == {'primary': 'Health'}
@@ -0,0 +1,213 @@
+import asyncio
+import threading
+
+import pytest
+
+from stage_graph import Stage, StageGraph
+from telemetry import _current_stage
+
+
+def fail(**kwargs):
+    raise RuntimeError("stage broke")
+
+
+def test_stages_receive_dependency_results():
+    graph = StageGraph(inputs=['text'], stages=[
+        Stage('upper', lambda text: text.upper(), depends_on=['text']),
+        Stage('length', lambda upper: len(upper), depends_on=['upper'])
+    ])
+
+    run = graph.run({'text': 'abc'})
+
+    assert run.success
+    assert run.results['upper'] == 'ABC'
+    assert run.results['length'] == 3
+    assert set(run.timings) == {'upper', 'length'}
+
+
+def test_independent_stages_run_concurrently():
+    both_started = threading.Barrier(2, timeout=5)
+
+    def meet():
+        both_started.wait()
+        return True
+
+    graph = StageGraph(stages=[Stage('a', meet), Stage('b', meet)])
+
+    assert graph.run().success
+
+
+def test_required_failure_stops_new_stages_and_skips_dependents():
+    graph = StageGraph(stages=[
+        Stage('first', fail),
+        Stage('second', lambda first: first, depends_on=['first']),
+        Stage('third', lambda second: second, depends_on=['second'])
+    ])
+
+    run = graph.run()
+
+    assert not run.success
+    assert run.failed_stage == 'first'
+    assert run.errors == {'first': 'stage broke'}
+    assert sorted(run.skipped) == ['second', 'third']
+
+
+def test_success_false_result_counts_as_failure():
+    graph = StageGraph(stages=[
+        Stage('classify', lambda: {'success': False, 'error': 'no category'})
+    ])
+
+    run = graph.run()
+
+    assert run.failed_stage == 'classify'
+    assert run.errors['classify'] == 'no category'
+    # The failed result is still kept for callers that report it
+    assert run.results['classify']['success'] is False
+
+
+def test_optional_failure_only_skips_its_dependents():
+    graph = StageGraph(stages=[
+        Stage('extra', fail, optional=True),
+        Stage('uses_extra', lambda extra: extra, depends_on=['extra']),
+        Stage('main', lambda: 'done')
+    ])
+
+    run = graph.run()
+
+    assert run.success
+    assert run.results['main'] == 'done'
+    assert run.errors == {'extra': 'stage broke'}
+    assert run.skipped == ['uses_extra']
+
+
+def test_failed_optional_result_is_passed_to_dependents():
+    graph = StageGraph(stages=[
+        Stage('classify', lambda: {'success': False, 'error': 'no category'}, optional=True),
+        Stage('mission', lambda classify: classify.get('category', 'none'),
+              depends_on=['classify'])
+    ])
+
+    run = graph.run()
+
+    assert run.success
+    assert run.errors == {'classify': 'no category'}
+    assert run.results['mission'] == 'none'
+
+
+def test_in_flight_stages_finish_after_a_failure():
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 'finished'
+
+    def fail_then_release():
+        release.set()
+        raise RuntimeError("stage broke")
+
+    graph = StageGraph(stages=[
+        Stage('slow', slow),
+        Stage('broken', fail_then_release),
+        Stage('after_slow', lambda slow: slow, depends_on=['slow'])
+    ])
+
+    run = graph.run()
+
+    assert run.failed_stage == 'broken'
+    assert run.results['slow'] == 'finished'
+    assert run.skipped == ['after_slow']
+
+
+def test_stage_scope_is_set_in_each_worker():
+    graph = StageGraph(stages=[Stage('a', _current_stage.get), Stage('b', _current_stage.get)])
+
+    run = graph.run()
+
+    assert run.results['a'] == 'a'
+    assert run.results['b'] == 'b'
+
+
+def test_on_stage_errors_do_not_abort_the_run():
+    seen = []
+
+    def on_stage(name, result):
+        seen.append(name)
+        raise RuntimeError("display broke")
+
+    graph = StageGraph(stages=[
+        Stage('a', lambda: 1),
+        Stage('b', lambda a: a + 1, depends_on=['a'])
+    ])
+
+    run = graph.run(on_stage=on_stage)
+
+    assert run.success
+    assert seen == ['a', 'b']
+
+
+def test_graph_rejects_unknown_dependencies_and_missing_inputs():
+    graph = StageGraph(inputs=['text'])
+    with pytest.raises(ValueError):
+        graph.add(Stage('a', lambda missing: missing, depends_on=['missing']))
+    with pytest.raises(ValueError):
+        graph.add(Stage('text', lambda: None))
+    with pytest.raises(ValueError):
+        graph.run({})
+
+
+def test_async_run_propagates_failures():
+    async def classify(text):
+        return text.upper()
+
+    async def broken(classify):
+        raise RuntimeError("stage broke")
+
+    graph = StageGraph(inputs=['text'], stages=[
+        Stage('classify', classify, depends_on=['text']),
+        Stage('mission', broken, depends_on=['classify']),
+        Stage('mentor', lambda mission: mission, depends_on=['mission']),
+        Stage('thread', lambda classify: len(classify), depends_on=['classify'], optional=True)
+    ])
+
+    run = asyncio.run(graph.run_async({'text': 'abc'}))
+
+    assert run.failed_stage == 'mission'
+    assert run.errors == {'mission': 'stage broke'}
+    assert run.results['classify'] == 'ABC'
+    assert 'mentor' in run.skipped
+
+
+def test_on_stage_reports_each_stage_on_the_calling_thread_as_it_finishes():
+    release_slow = threading.Event()
+    events = []
+
+    def on_stage(name, result):
+        events.append((name, threading.current_thread() is threading.main_thread()))
+        if name == 'fast':
+            # The slow stage is still running when the fast one is shown
+            release_slow.set()
+
+    graph = StageGraph(stages=[
+        Stage('fast', lambda: 'fast'),
+        Stage('slow', lambda: release_slow.wait(timeout=5)),
+        Stage('after_fast', lambda fast: fast + '!', depends_on=['fast'])
+    ])
+
+    run = graph.run(on_stage=on_stage)
+
+    assert run.results['slow'] is True
+    assert events[0] == ('fast', True)
+    assert sorted(events) == [('after_fast', True), ('fast', True), ('slow', True)]
+
+
+def test_on_stage_skips_stages_that_left_no_result():
+    seen = []
+
+    graph = StageGraph(stages=[
+        Stage('a', fail, optional=True),
+        Stage('b', lambda: {'success': False, 'error': 'no answer'}, optional=True)
+    ])
+
+    graph.run(on_stage=lambda name, result: seen.append((name, result)))
+
+    assert seen == [('b', {'success': False, 'error': 'no answer'})]
@@ -0,0 +1,144 @@
+import json
+import logging
+import time
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+from config import Config
+from model_backends import TextResponse, Usage
+from telemetry import (
+    Histogram, JsonFormatter, MetricsRegistry, estimate_cost, record_call, recent_traces,
+    registry, stage_scope, start_metrics_server, trace_request
+)
+
+
+@pytest.fixture
+def priced(monkeypatch):
+    monkeypatch.setitem(Config.MODEL_PRICES, 'test-model', (1.0, 4.0))
+    return 'test-model'
+
+
+def test_prometheus_text_has_help_type_and_cumulative_buckets():
+    metrics = MetricsRegistry()
+    metrics.describe('calls_total', 'Calls made')
+    metrics.inc('calls_total', {'stage': 'classify'})
+    metrics.inc('calls_total', {'stage': 'classify'}, 2)
+    for seconds in (0.02, 0.3, 0.3, 100):
+        metrics.observe('call_seconds', {'stage': 'classify'}, seconds)
+
+    lines = metrics.render_prometheus().splitlines()
+
+    assert lines[:3] == ['# HELP calls_total Calls made', '# TYPE calls_total counter',
+                         'calls_total{stage="classify"} 3']
+    assert '# TYPE call_seconds histogram' in lines
+    assert not any(line.startswith('# HELP call_seconds') for line in lines)
+    assert 'call_seconds_bucket{stage="classify",le="0.01"} 0' in lines
+    assert 'call_seconds_bucket{stage="classify",le="0.05"} 1' in lines
+    assert 'call_seconds_bucket{stage="classify",le="0.5"} 3' in lines
+    assert 'call_seconds_bucket{stage="classify",le="60.0"} 3' in lines
+    assert 'call_seconds_bucket{stage="classify",le="+Inf"} 4' in lines
+    assert 'call_seconds_sum{stage="classify"} 100.62' in lines
+    assert 'call_seconds_count{stage="classify"} 4' in lines
+
+
+def test_prometheus_label_values_are_escaped():
+    metrics = MetricsRegistry()
+    metrics.inc('errors_total', {'error': 'bad "quote"\\path\nnext'})
+
+    assert 'errors_total{error="bad \\"quote\\"\\\\path\\nnext"} 1' in metrics.render_prometheus()
+
+
+def test_histogram_quantile_reports_the_bucket_bound():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(seconds)
+
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(0.99) == float('inf')
+
+
+def test_cost_comes_from_the_model_price(priced):
+    assert estimate_cost(priced, 1_000_000, 500_000) == pytest.approx(3.0)
+    assert estimate_cost(priced, 1000, None) == pytest.approx(0.001)
+    assert estimate_cost(priced, None, 10) is None
+    assert estimate_cost('unpriced-model', 1000, 10) is None
+
+
+def test_trace_attributes_calls_to_the_request_and_stage(priced):
+    response = TextResponse('answer', Usage(2000, 500))
+
+    with trace_request('text') as trace:
+        with stage_scope('classify'):
+            record_call(priced, 'generate', time.perf_counter(), response)
+        record_call(priced, 'generate', time.perf_counter(), cache_hit=True)
+        record_call(priced, 'generate', time.perf_counter(), error=ValueError('boom'), attempts=3)
+
+    summary = recent_traces()[0]
+    assert summary['request_id'] == trace.request_id
+    assert summary['model_calls'] == 3
+    assert summary['cache_hits'] == 1
+    assert summary['errors'] == 1
+    assert summary['prompt_tokens'] == 2000
+    assert summary['output_tokens'] == 500
+    assert summary['cost_usd'] == pytest.approx(0.004)
+    assert [call['stage'] for call in summary['calls']] == ['classify', 'text', 'text']
+    assert summary['calls'][2]['error'] == 'ValueError: boom'
+    assert summary['calls'][2]['attempts'] == 3
+
+    text = registry.render_prometheus()
+    assert 'model_calls_total{model="test-model",outcome="ok",stage="classify"}' in text
+    assert 'model_tokens_total{direction="prompt",model="test-model"}' in text
+
+
+def test_recent_traces_are_newest_first():
+    with trace_request('first'):
+        pass
+    with trace_request('second'):
+        pass
+
+    assert [summary['kind'] for summary in recent_traces()[:2]] == ['second', 'first']
+
+
+def test_calls_outside_a_request_are_unattributed(priced):
+    record = record_call(priced, 'generate', time.perf_counter(), SimpleNamespace())
+
+    assert record.request_id is None
+    assert record.stage == 'unattributed'
+    assert record.prompt_tokens is None and record.cost_usd is None
+
+
+def test_pipeline_requests_carry_their_trace():
+    from integrated_system import AILearningPlatform
+
+    result = AILearningPlatform().process_text_description("The school roof leaks")
+
+    telemetry = result['telemetry']
+    assert telemetry['request_id'] == recent_traces()[0]['request_id']
+    assert telemetry['prompt_tokens'] > 0 and telemetry['output_tokens'] > 0
+    assert telemetry['cost_usd'] > 0
+
+
+def test_json_formatter_puts_event_fields_at_the_top_level():
+    record = logging.LogRecord('telemetry', logging.INFO, __file__, 1, 'model_call', None, None)
+    record.fields = {'stage': 'classify', 'prompt_tokens': 12}
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['message'] == 'model_call'
+    assert entry['level'] == 'INFO'
+    assert entry['stage'] == 'classify'
+    assert entry['prompt_tokens'] == 12
+
+
+def test_metrics_server_serves_the_registry():
+    port = start_metrics_server(port=0)
+
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+        body = response.read().decode('utf-8')
+        content_type = response.headers['Content-Type']
+
+    assert content_type.startswith('text/plain; version=0.0.4')
+    assert '# TYPE pipeline_request_seconds histogram' in body
@@ -0,0 +1,205 @@
+import io
+import json
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from config import Config
+from model_backends import FakeBackend
+from perceptual_hash import ImageHashIndex
+from structured_output import TileIssuesOutput
+from vision_detector import CommunityIssueDetector
+
+
+class LiveFakeBackend(FakeBackend):
+    """Fake answers treated as real model output, so they may be stored for reuse"""
+
+    live = True
+
+
+def scene(seed=0, size=(320, 240)):
+    rng = random.Random(seed)
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.rectangle([x, y, x + 60, y + 30], fill=(rng.randrange(256), 0, rng.randrange(256)))
+    return image
+
+
+def jpeg(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def detector(monkeypatch, tmp_path):
+    detector = CommunityIssueDetector(dedup=False, coarse_to_fine=False)
+    monkeypatch.setattr(detector, 'hash_index',
+                        ImageHashIndex(db_path=str(tmp_path / 'hashes.sqlite3')))
+    backend = LiveFakeBackend()
+    monkeypatch.setattr(detector.client, 'backend', backend)
+    return detector
+
+
+def test_near_identical_photo_reuses_the_stored_analysis(detector):
+    first = detector.detect_issues(jpeg(scene()))
+    second = detector.detect_issues(jpeg(scene().resize((240, 180))))
+
+    assert first['success'] and second['success']
+    assert second['analysis'] == first['analysis']
+    assert second['duplicate_of']['distance'] <= detector.hash_index.max_distance
+    assert detector.client.backend.calls == 1
+
+
+def test_different_photo_and_different_domains_are_analyzed(detector):
+    detector.detect_issues(jpeg(scene()))
+    detector.detect_issues(jpeg(scene(seed=5)))
+    detector.detect_issues(jpeg(scene()), domains=['Health'])
+
+    assert detector.client.backend.calls == 3
+
+
+def test_offline_answers_are_never_stored(detector, monkeypatch):
+    monkeypatch.setattr(detector.client, 'backend', FakeBackend())
+
+    detector.detect_issues(jpeg(scene()))
+
+    assert len(detector.hash_index) == 0
+
+
+def test_bursts_of_near_identical_shots_are_analyzed_once(detector):
+    images = [jpeg(scene()), jpeg(scene(seed=5)), jpeg(scene().resize((300, 225)))]
+
+    results = detector.detect_multiple_images(images, max_workers=2)
+
+    assert [result['success'] for result in results] == [True, True, True]
+    assert 'duplicate_of' not in results[0]
+    assert results[2]['duplicate_of']['distance'] <= detector.hash_index.max_distance
+    assert detector.client.backend.calls == 2
+
+
+@pytest.mark.parametrize('size, max_tiles', [((4000, 3000), 9), ((6000, 1500), 4), ((3000, 1000), 2)])
+def test_tiles_cover_the_image_with_overlap_within_the_cap(detector, size, max_tiles):
+    boxes = detector._tile_boxes(size, max_tiles)
+
+    assert 1 < len(boxes) <= max_tiles
+    lefts, rights = sorted({box[0] for box in boxes}), sorted({box[2] for box in boxes})
+    tops, bottoms = sorted({box[1] for box in boxes}), sorted({box[3] for box in boxes})
+    assert (lefts[0], tops[0], rights[-1], bottoms[-1]) == (0, 0, size[0], size[1])
+    # Neighbouring tiles overlap, so nothing on a seam is cut in half in every tile
+    assert all(left < right for left, right in zip(lefts[1:], rights))
+    assert all(top < bottom for top, bottom in zip(tops[1:], bottoms))
+
+
+def test_small_image_is_analyzed_as_one(detector):
+    result = detector.detect_issues_tiled(jpeg(scene()))
+
+    assert result['success']
+    assert 'tiles' not in result
+    assert detector.client.backend.calls == 1
+
+
+def test_tile_findings_are_merged_at_their_highest_severity(detector, monkeypatch):
+    severities = iter(['Low', 'High', 'Medium', 'Low', 'Low', 'Medium'])
+
+    def tile_answer(prompt):
+        return json.dumps({
+            'issues': [{'domain': 'Environment', 'issue': 'Blocked drain',
+                        'description': 'Rubbish in the gutter', 'severity': next(severities)}],
+            'visual_evidence': 'Plastic bags in the drain',
+            'recommendations': ['Clear the drain']
+        })
+
+    backend = LiveFakeBackend(rules=[('one tile cut from a larger', tile_answer)])
+    monkeypatch.setattr(detector.client, 'backend', backend)
+
+    result = detector.detect_issues_tiled(Image.new('RGB', (2400, 1200), 'grey'), max_workers=1)
+
+    assert result['success']
+    assert result['tiles'] == backend.calls == 6
+    assert len(result['issues']) == 1
+    assert result['issues'][0]['severity'] == 'High'
+    assert len(result['issues'][0]['seen_in']) == 6
+
+
+@pytest.fixture
+def packing_detector(monkeypatch):
+    detector = CommunityIssueDetector(dedup=False, coarse_to_fine=False)
+    monkeypatch.setattr(detector.client, 'backend', FakeBackend())
+    return detector
+
+
+def packed_answer(ids, severity='Medium'):
+    return json.dumps({'images': [
+        {'id': image_id,
+         'issues': [{'domain': 'Health', 'issue': f"Issue {image_id}",
+                     'description': 'Visible problem', 'severity': severity}],
+         'visual_evidence': 'Seen in the photo', 'recommendations': []}
+        for image_id in ids
+    ]})
+
+
+def test_packed_response_is_read_by_image_id():
+    text = json.dumps({'images': [
+        {'id': 2, 'issues': [], 'visual_evidence': 'none', 'recommendations': []},
+        'not an entry',
+        {'id': 'x', 'issues': [], 'visual_evidence': '', 'recommendations': []},
+        {'id': 0, 'issues': 'broken', 'visual_evidence': '', 'recommendations': []},
+        {'id': 1, 'issues': [], 'visual_evidence': 'clean', 'recommendations': ['none']}
+    ]})
+
+    parsed = TileIssuesOutput.from_packed_json(text)
+
+    assert sorted(parsed) == [1, 2]
+    assert parsed[1].visual_evidence == 'clean'
+
+
+def test_packed_batch_sends_several_images_per_request(packing_detector):
+    images = [jpeg(scene(seed)) for seed in range(3)]
+
+    results = packing_detector.detect_multiple_images(images, packed=True)
+
+    assert [result['success'] for result in results] == [True, True, True]
+    assert packing_detector.client.backend.calls == 1
+
+
+def test_packed_batch_re_asks_only_for_missing_images(packing_detector, monkeypatch):
+    requests = []
+
+    def answer(prompt):
+        requests.append(prompt)
+        return packed_answer([2, 0] if len(requests) == 1 else [1])
+
+    monkeypatch.setattr(packing_detector.client, 'backend',
+                        FakeBackend(rules=[('separate images', answer)]))
+    images = [jpeg(scene(seed)) for seed in range(3)]
+
+    results = packing_detector.detect_multiple_images(images, packed=True)
+
+    assert [result['issues'][0]['issue'] for result in results] == ['Issue 0', 'Issue 1', 'Issue 2']
+    assert len(requests) == 2
+    assert 'You will receive 1 separate images' in requests[1]
+
+
+def test_images_never_answered_fail_alone(packing_detector, monkeypatch):
+    monkeypatch.setattr(packing_detector.client, 'backend',
+                        FakeBackend(rules=[('separate images', packed_answer([0]))]))
+
+    results = packing_detector.detect_multiple_images([jpeg(scene(0)), jpeg(scene(1))],
+                                                      packed=True)
+
+    assert results[0]['success']
+    assert results[1]['success'] is False
+
+
+def test_image_packs_respect_the_count_and_byte_budget(packing_detector):
+    parts = [(index, {'mime_type': 'image/jpeg', 'data': b'x' * 400}) for index in range(8)]
+
+    by_bytes = packing_detector._split_image_packs(parts, byte_budget=1000)
+    by_count = packing_detector._split_image_packs(parts, byte_budget=10 ** 9)
+
+    assert [len(pack) for pack in by_bytes] == [2, 2, 2, 2]
+    assert [len(pack) for pack in by_count] == [Config.PACKED_MAX_IMAGES, 8 - Config.PACKED_MAX_IMAGES]
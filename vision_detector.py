@@ -1,45 +1,128 @@
+import asyncio
 import base64
+import io
+import math
 import os
-from typing import Dict, List, Optional
-import google.generativeai as genai
+import re
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional
 from config import Config
+from gemini_client import get_client
+from concurrency import run_concurrently
+from structured_output import (
+    SEVERITY_LEVELS, CoarseIssuesOutput, FusedAnalysisOutput, StructuredOutputError,
+    TileIssuesOutput, json_generation_config
+)
+from image_input import ImageSource, describe_source, image_part, is_pil_image, read_image_bytes
+from image_preprocessing import ImagePreprocessor
+from keyframes import Keyframe, KeyframeExtractor
+from perceptual_hash import get_default_hash_index, group_near_duplicates, hamming_distance
+from resolution_escalation import EscalationRule, ResolutionStats, default_escalation_rule
+
+
+TILE_VIEW = ("one tile cut from a larger, high-resolution photo. Examine it closely for small "
+             "details")
+KEYFRAME_VIEW = "a keyframe from a video walkthrough of a site"
 
 
 class CommunityIssueDetector:
     """Detects community issues in images using Gemini Vision"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, preprocess: Optional[bool] = None,
+                 dedup: Optional[bool] = None, coarse_to_fine: Optional[bool] = None,
+                 escalation_rule: Optional[EscalationRule] = None):
         self.api_key = api_key or Config.GEMINI_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(Config.VISION_MODEL)
+        self.client = get_client(Config.VISION_MODEL, self.api_key, task='vision')
+        
+        use_preprocessing = Config.IMAGE_PREPROCESS_ENABLED if preprocess is None else preprocess
+        self.preprocessor = ImagePreprocessor() if use_preprocessing else None
+        
+        use_dedup = Config.IMAGE_DEDUP_ENABLED if dedup is None else dedup
+        self.hash_index = get_default_hash_index() if use_dedup else None
+        self.keyframe_extractor = KeyframeExtractor()
         
-    def encode_image(self, image_path: str) -> str:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        use_coarse = Config.COARSE_TO_FINE_ENABLED if coarse_to_fine is None else coarse_to_fine
+        self.coarse_preprocessor = (
+            ImagePreprocessor(max_long_edge=Config.COARSE_LONG_EDGE) if use_coarse else None
+        )
+        self.escalation_rule = escalation_rule or default_escalation_rule
+        self.resolution = ResolutionStats()
+        
+    def encode_image(self, image: ImageSource) -> str:
+        return base64.b64encode(read_image_bytes(image)).decode('utf-8')
     
-    def detect_issues(self, image_path: str, domains: Optional[List[str]] = None) -> Dict:
+    def detect_issues(self, image: ImageSource, domains: Optional[List[str]] = None) -> Dict:
         domains = domains or Config.CATEGORIES
         
         # Create the prompt
         prompt = self._create_detection_prompt(domains)
         
         try:
-            # Read and prepare the image
-            from PIL import Image
-            img = Image.open(image_path)
+            # Reuse the analysis of a near-identical image when there is one
+            image_hash, duplicate = self._find_duplicate(image, 'detect', domains)
+            if duplicate is not None:
+                return duplicate
+            
+            # Try a cheap low-resolution pass before paying for the full image
+            coarse_result, reason, coarse_bytes = None, None, 0
+            if self.coarse_preprocessor is not None:
+                coarse_result, reason, coarse_bytes = self._detect_coarse(image, domains)
             
-            # Call Gemini Vision API
-            response = self.model.generate_content([prompt, img])
+            if coarse_result is not None:
+                result = coarse_result
+            else:
+                # Read and prepare the image
+                img, image_report = self._prepare_image(image)
+                
+                # Call Gemini Vision API
+                response = self.client.generate([prompt, img])
+                
+                result = self._build_detection_result(response, domains, image_report)
+                if self.coarse_preprocessor is not None:
+                    self._record_escalation(result, img, coarse_bytes, reason)
             
-            # Parse the response
-            analysis = response.text
+            self._remember(image_hash, 'detect', domains, image, result)
+            return result
             
+        except Exception as e:
             return {
-                'success': True,
-                'analysis': analysis,
-                'raw_response': response,
+                'success': False,
+                'error': str(e),
                 'domains_analyzed': domains
             }
+    
+    async def detect_issues_async(self, image: ImageSource, 
+                                  domains: Optional[List[str]] = None) -> Dict:
+        domains = domains or Config.CATEGORIES
+        prompt = self._create_detection_prompt(domains)
+        
+        try:
+            # Hashing and re-encoding are CPU-bound, so keep them off the event loop
+            image_hash, duplicate = await asyncio.to_thread(
+                self._find_duplicate, image, 'detect', domains
+            )
+            if duplicate is not None:
+                return duplicate
+            
+            coarse_result, reason, coarse_bytes = None, None, 0
+            if self.coarse_preprocessor is not None:
+                coarse_result, reason, coarse_bytes = await self._detect_coarse_async(
+                    image, domains
+                )
+            
+            if coarse_result is not None:
+                result = coarse_result
+            else:
+                img, image_report = await asyncio.to_thread(self._prepare_image, image)
+                
+                response = await self.client.generate_async([prompt, img])
+                
+                result = self._build_detection_result(response, domains, image_report)
+                if self.coarse_preprocessor is not None:
+                    self._record_escalation(result, img, coarse_bytes, reason)
+            
+            self._remember(image_hash, 'detect', domains, image, result)
+            return result
             
         except Exception as e:
             return {
@@ -48,14 +131,559 @@ class CommunityIssueDetector:
                 'domains_analyzed': domains
             }
     
-    def _create_detection_prompt(self, domains: List[str]) -> str:
+    def _detect_coarse(self, image: ImageSource, domains: List[str]):
+        """Return (result or None when escalating, escalation reason, bytes uploaded)"""
+        part, report = self.coarse_preprocessor.process(image)
+        try:
+            response = self.client.generate(
+                [self._create_coarse_prompt(domains), part],
+                generation_config=json_generation_config(CoarseIssuesOutput.SCHEMA)
+            )
+        except Exception:
+            # The full-resolution pass reports its own error if the API is down
+            return None, 'coarse_failed', 0
+        return self._judge_coarse(response, domains, report)
+    
+    async def _detect_coarse_async(self, image: ImageSource, domains: List[str]):
+        part, report = await asyncio.to_thread(self.coarse_preprocessor.process, image)
+        try:
+            response = await self.client.generate_async(
+                [self._create_coarse_prompt(domains), part],
+                generation_config=json_generation_config(CoarseIssuesOutput.SCHEMA)
+            )
+        except Exception:
+            return None, 'coarse_failed', 0
+        return self._judge_coarse(response, domains, report)
+    
+    def _judge_coarse(self, response, domains: List[str], report: Dict):
+        try:
+            coarse = CoarseIssuesOutput.from_json(response.text)
+        except ValueError:
+            return None, 'coarse_unparseable', report['sent_bytes']
+        
+        # An image already at or below the coarse size has nothing more to show
+        reason = self.escalation_rule(coarse, domains) if report['resized'] else None
+        if reason is not None:
+            return None, reason, report['sent_bytes']
+        
+        self.resolution.record(report['sent_bytes'])
+        issues = sorted(coarse.issues,
+                        key=lambda issue: SEVERITY_LEVELS.index(issue['severity']), reverse=True)
+        return {
+            'success': True,
+            'analysis': self._format_issues_analysis(
+                issues, coarse.visual_evidence, coarse.recommendations
+            ),
+            'issues': issues,
+            'raw_response': response,
+            'domains_analyzed': domains,
+            'image_report': report,
+            'resolution': 'coarse',
+            'confidence': coarse.confidence
+        }, None, report['sent_bytes']
+    
+    def _record_escalation(self, result: Dict, part, coarse_bytes: int, reason: str):
+        self.resolution.record(coarse_bytes + self._part_bytes(part), reason)
+        result['resolution'] = 'full'
+        result['escalation_reason'] = reason
+    
+    def resolution_stats(self) -> Dict:
+        if self.coarse_preprocessor is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.resolution.stats()}
+    
+    def _prepare_image(self, image: ImageSource):
+        """Return (request part, preprocessing report or None)"""
+        if self.preprocessor is None:
+            return image_part(image), None
+        return self.preprocessor.process(image)
+    
+    def preprocessing_stats(self) -> Dict:
+        if self.preprocessor is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.preprocessor.stats()}
+    
+    def _find_duplicate(self, image: ImageSource, kind: str, domains: List[str]):
+        """Return (perceptual hash, reused result or None); the hash is None when dedup is off"""
+        if self.hash_index is None:
+            return None, None
+        
+        image_hash = self.hash_index.hash_image(image)
+        match = self.hash_index.find(image_hash, self._dedup_scope(kind, domains))
+        if match is None:
+            return image_hash, None
+        
+        distance, source, result = match
+        return image_hash, self._as_duplicate(result, source, distance)
+    
+    def _remember(self, image_hash: Optional[int], kind: str, domains: List[str],
+                  image: ImageSource, result: Dict):
+        # The index is persistent, so only real model output is stored for reuse
+        if image_hash is not None and result['success'] and self.client.live:
+            self.hash_index.add(image_hash, self._dedup_scope(kind, domains),
+                                describe_source(image), result)
+    
+    def _dedup_scope(self, kind: str, domains: List[str]) -> str:
+        # Results are only interchangeable for the same request type and domain list
+        return f"{kind}:{','.join(domains)}"
+    
+    def _as_duplicate(self, result: Dict, source: str, distance: int) -> Dict:
+        return {
+            **result,
+            'raw_response': None,
+            'image_report': None,
+            'duplicate_of': {'image_path': source, 'distance': distance}
+        }
+    
+    def dedup_stats(self) -> Dict:
+        if self.hash_index is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.hash_index.stats()}
+    
+    def _build_detection_result(self, response, domains: List[str],
+                                image_report: Optional[Dict] = None) -> Dict:
+        return {
+            'success': True,
+            'analysis': response.text,
+            'raw_response': response,
+            'domains_analyzed': domains,
+            'image_report': image_report
+        }
+    
+    def detect_issues_fused(self, image: ImageSource, 
+                            domains: Optional[List[str]] = None) -> Dict:
+        """Detect, classify and draft a mission statement in a single vision call"""
+        domains = domains or Config.CATEGORIES
+        prompt = self._create_fused_prompt(domains)
+        
+        try:
+            image_hash, duplicate = self._find_duplicate(image, 'fused', domains)
+            if duplicate is not None:
+                return duplicate
+            
+            img, image_report = self._prepare_image(image)
+            
+            response = self.client.generate(
+                [prompt, img],
+                generation_config=self._fused_generation_config()
+            )
+            
+            result = self._build_fused_result(response, domains, image_report)
+            self._remember(image_hash, 'fused', domains, image, result)
+            return result
+            
+        except StructuredOutputError as e:
+            return self._invalid_fused_result(e, domains)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'domains_analyzed': domains
+            }
+    
+    async def detect_issues_fused_async(self, image: ImageSource, 
+                                        domains: Optional[List[str]] = None) -> Dict:
+        domains = domains or Config.CATEGORIES
+        prompt = self._create_fused_prompt(domains)
+        
+        try:
+            image_hash, duplicate = await asyncio.to_thread(
+                self._find_duplicate, image, 'fused', domains
+            )
+            if duplicate is not None:
+                return duplicate
+            
+            img, image_report = await asyncio.to_thread(self._prepare_image, image)
+            
+            response = await self.client.generate_async(
+                [prompt, img],
+                generation_config=self._fused_generation_config()
+            )
+            
+            result = self._build_fused_result(response, domains, image_report)
+            self._remember(image_hash, 'fused', domains, image, result)
+            return result
+            
+        except StructuredOutputError as e:
+            return self._invalid_fused_result(e, domains)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'domains_analyzed': domains
+            }
+    
+    def _build_fused_result(self, response, domains: List[str],
+                            image_report: Optional[Dict] = None) -> Dict:
+        output = FusedAnalysisOutput.from_json(response.text, Config.CATEGORIES)
+        
+        analysis = self._format_fused_analysis(asdict(output))
+        
+        classification = {
+            'success': True,
+            'category': output.primary_category,
+            'confidence': output.confidence,
+            'reasoning': output.reasoning,
+            'source': 'fused_vision_analysis'
+        }
+        
+        mission = {
+            'success': True,
+            'original_description': output.problem_definition,
+            'mission_statement': output.mission_statement,
+            'problem_definition': output.problem_definition,
+            'goal': output.goal,
+            'expected_impact': output.expected_impact,
+            'action_steps': output.action_steps,
+            'full_response': response.text
+        }
+        
+        return {
+            'success': True,
+            'analysis': analysis,
+            'classification': classification,
+            'mission': mission,
+            'raw_response': response,
+            'domains_analyzed': domains,
+            'image_report': image_report
+        }
+    
+    def _fused_generation_config(self) -> Dict:
+        return json_generation_config(FusedAnalysisOutput.schema(Config.CATEGORIES))
+    
+    def _invalid_fused_result(self, error: StructuredOutputError, domains: List[str]) -> Dict:
+        # Callers fall back to the staged pipeline instead of guessing at a category
+        return {
+            'success': False,
+            'error': f"Invalid fused analysis response: {error}",
+            'invalid_response': True,
+            'domains_analyzed': domains
+        }
+    
+    def _format_fused_analysis(self, data: Dict) -> str:
+        """Render the fused JSON back into the standard detection report layout"""
+        issue_lines = []
+        for issue in data.get('detected_issues', []):
+            issue_lines.append(
+                f"- **{issue.get('domain', 'Unknown')}** ({issue.get('severity', 'Unknown')}): "
+                f"{issue.get('description', '')}"
+            )
+        
+        recommendations = data.get('recommendations', [])
+        if isinstance(recommendations, list):
+            recommendations = '\n'.join(f"- {item}" for item in recommendations)
+        
+        return f"""DETECTED ISSUES:
+{chr(10).join(issue_lines) or 'No issues detected.'}
+
+VISUAL EVIDENCE:
+{data.get('visual_evidence', '')}
+
+RECOMMENDATIONS:
+{recommendations}"""
+    
+    def detect_issues_tiled(self, image: ImageSource, domains: Optional[List[str]] = None,
+                            max_tiles: Optional[int] = None,
+                            max_workers: Optional[int] = None) -> Dict:
+        """Analyze overlapping tiles of a large image concurrently and merge their issues"""
+        domains = domains or Config.CATEGORIES
+        
+        try:
+            image_hash, duplicate = self._find_duplicate(image, 'tiled', domains)
+            if duplicate is not None:
+                return duplicate
+            
+            img, boxes = self._prepare_tiles(image, max_tiles)
+            if len(boxes) == 1:
+                return self.detect_issues(image, domains)
+            
+            prompt = self._create_partial_prompt(domains, TILE_VIEW)
+            
+            def analyze_tile(box):
+                part, report = self._prepare_image(img.crop(box))
+                response = self.client.generate(
+                    [prompt, part],
+                    generation_config=json_generation_config(TileIssuesOutput.SCHEMA)
+                )
+                return self._build_partial_result(
+                    response, self._tile_position(box, img.size), report
+                )
+            
+            tile_results = run_concurrently(
+                analyze_tile,
+                boxes,
+                max_workers=min(max_workers or Config.TILED_MAX_CONCURRENCY, len(boxes))
+            )
+            
+            result = self._build_tiled_result(tile_results, domains)
+            self._remember(image_hash, 'tiled', domains, image, result)
+            return result
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'domains_analyzed': domains
+            }
+    
+    async def detect_issues_tiled_async(self, image: ImageSource,
+                                        domains: Optional[List[str]] = None,
+                                        max_tiles: Optional[int] = None,
+                                        max_workers: Optional[int] = None) -> Dict:
+        domains = domains or Config.CATEGORIES
+        
+        try:
+            image_hash, duplicate = await asyncio.to_thread(
+                self._find_duplicate, image, 'tiled', domains
+            )
+            if duplicate is not None:
+                return duplicate
+            
+            img, boxes = await asyncio.to_thread(self._prepare_tiles, image, max_tiles)
+            if len(boxes) == 1:
+                return await self.detect_issues_async(image, domains)
+            
+            prompt = self._create_partial_prompt(domains, TILE_VIEW)
+            semaphore = asyncio.Semaphore(max_workers or Config.TILED_MAX_CONCURRENCY)
+            
+            async def analyze_tile(box):
+                async with semaphore:
+                    try:
+                        part, report = await asyncio.to_thread(
+                            self._prepare_image, img.crop(box)
+                        )
+                        response = await self.client.generate_async(
+                            [prompt, part],
+                            generation_config=json_generation_config(TileIssuesOutput.SCHEMA)
+                        )
+                        return self._build_partial_result(
+                            response, self._tile_position(box, img.size), report
+                        )
+                    except Exception as e:
+                        return {'success': False, 'error': str(e)}
+            
+            tile_results = await asyncio.gather(*(analyze_tile(box) for box in boxes))
+            
+            result = self._build_tiled_result(list(tile_results), domains)
+            self._remember(image_hash, 'tiled', domains, image, result)
+            return result
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'domains_analyzed': domains
+            }
+    
+    def detect_issues_in_video(self, source: ImageSource, domains: Optional[List[str]] = None,
+                               max_workers: Optional[int] = None) -> Dict:
+        """Analyze the distinct keyframes of a video or animated image and merge their issues"""
+        domains = domains or Config.CATEGORIES
+        
+        try:
+            keyframes, scanned = self.keyframe_extractor.extract(source)
+            if not keyframes:
+                raise ValueError("No frames could be read from the input")
+            
+            prompt = self._create_partial_prompt(domains, KEYFRAME_VIEW)
+            
+            def analyze_keyframe(keyframe):
+                part, report = self._prepare_image(keyframe.image)
+                response = self.client.generate(
+                    [prompt, part],
+                    generation_config=json_generation_config(TileIssuesOutput.SCHEMA)
+                )
+                return self._build_partial_result(response, f"{keyframe.timestamp:.1f}s", report)
+            
+            frame_results = run_concurrently(analyze_keyframe, keyframes, max_workers=max_workers)
+            
+            return self._build_keyframe_result(frame_results, keyframes, scanned, domains)
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'domains_analyzed': domains
+            }
+    
+    async def detect_issues_in_video_async(self, source: ImageSource,
+                                           domains: Optional[List[str]] = None,
+                                           max_workers: Optional[int] = None) -> Dict:
+        domains = domains or Config.CATEGORIES
+        
+        try:
+            keyframes, scanned = await asyncio.to_thread(self.keyframe_extractor.extract, source)
+            if not keyframes:
+                raise ValueError("No frames could be read from the input")
+            
+            prompt = self._create_partial_prompt(domains, KEYFRAME_VIEW)
+            semaphore = asyncio.Semaphore(max_workers or Config.MAX_CONCURRENT_REQUESTS)
+            
+            async def analyze_keyframe(keyframe):
+                async with semaphore:
+                    try:
+                        part, report = await asyncio.to_thread(self._prepare_image, keyframe.image)
+                        response = await self.client.generate_async(
+                            [prompt, part],
+                            generation_config=json_generation_config(TileIssuesOutput.SCHEMA)
+                        )
+                        return self._build_partial_result(
+                            response, f"{keyframe.timestamp:.1f}s", report
+                        )
+                    except Exception as e:
+                        return {'success': False, 'error': str(e)}
+            
+            frame_results = await asyncio.gather(*(analyze_keyframe(frame) for frame in keyframes))
+            
+            return self._build_keyframe_result(list(frame_results), keyframes, scanned, domains)
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'domains_analyzed': domains
+            }
+    
+    def _build_keyframe_result(self, frame_results: List[Dict], keyframes: List[Keyframe],
+                               frames_scanned: int, domains: List[str]) -> Dict:
+        result = self._merge_partial_results(frame_results, domains)
+        if result['success']:
+            result['frames_scanned'] = frames_scanned
+            result['keyframes'] = [
+                {'frame_index': keyframe.frame_index, 'timestamp': keyframe.timestamp,
+                 'score': round(keyframe.score, 3)}
+                for keyframe in keyframes
+            ]
+        return result
+    
+    def _prepare_tiles(self, image: ImageSource, max_tiles: Optional[int] = None):
+        """Return the upright decoded image and its tile boxes"""
+        from PIL import Image, ImageOps
+        
+        img = image if is_pil_image(image) else Image.open(io.BytesIO(read_image_bytes(image)))
+        img = ImageOps.exif_transpose(img)
+        # Decode once up front so concurrent crops only read pixels
+        img.load()
+        
+        return img, self._tile_boxes(img.size, max_tiles or Config.TILED_MAX_TILES)
+    
+    def _tile_boxes(self, size, max_tiles: int) -> List[tuple]:
+        """Overlapping (left, top, right, bottom) boxes covering the image, at most max_tiles"""
+        tile_size = Config.TILE_SIZE
+        while True:
+            columns = self._tile_spans(size[0], tile_size)
+            rows = self._tile_spans(size[1], tile_size)
+            if len(columns) * len(rows) <= max_tiles:
+                break
+            # Too many tiles: cover more of the image per tile instead of adding calls
+            tile_size = int(tile_size * 1.25)
+        
+        return [(left, top, right, bottom) for top, bottom in rows for left, right in columns]
+    
+    def _tile_spans(self, length: int, tile_size: int) -> List[tuple]:
+        if length <= tile_size:
+            return [(0, length)]
+        
+        stride = tile_size * (1 - Config.TILE_OVERLAP)
+        count = math.ceil((length - tile_size) / stride) + 1
+        step = (length - tile_size) / (count - 1)
+        return [(round(index * step), round(index * step) + tile_size) for index in range(count)]
+    
+    def _build_partial_result(self, response, label: str, image_report: Optional[Dict]) -> Dict:
+        """Parse the findings for one tile or keyframe of a larger input"""
+        output = TileIssuesOutput.from_json(response.text)
+        return {
+            'success': True,
+            'label': label,
+            'issues': output.issues,
+            'visual_evidence': output.visual_evidence,
+            'recommendations': output.recommendations,
+            'image_report': image_report
+        }
+    
+    def _merge_partial_results(self, partial_results: List[Dict], domains: List[str]) -> Dict:
+        """Combine per-tile or per-frame findings, keeping each issue once at its highest severity"""
+        succeeded = [partial for partial in partial_results if partial['success']]
+        if not succeeded:
+            return {
+                'success': False,
+                'error': partial_results[0].get('error', 'All vision calls failed'),
+                'domains_analyzed': domains
+            }
+        
+        merged = {}
+        evidence = []
+        recommendations = {}
+        for partial in succeeded:
+            for issue in partial['issues']:
+                key = (issue['domain'].lower(), ' '.join(re.findall(r'[a-z0-9]+', issue['issue'].lower())))
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = {**issue, 'seen_in': [partial['label']]}
+                    continue
+                
+                current['seen_in'].append(partial['label'])
+                if SEVERITY_LEVELS.index(issue['severity']) > SEVERITY_LEVELS.index(current['severity']):
+                    current.update(severity=issue['severity'], description=issue['description'])
+            
+            if partial['visual_evidence']:
+                evidence.append(f"[{partial['label']}] {partial['visual_evidence']}")
+            for recommendation in partial['recommendations']:
+                recommendations.setdefault(recommendation.strip().lower(), recommendation)
+        
+        issues = sorted(merged.values(),
+                        key=lambda issue: SEVERITY_LEVELS.index(issue['severity']), reverse=True)
+        analysis = self._format_issues_analysis(
+            issues, '\n'.join(evidence), list(recommendations.values())
+        )
+        
+        return {
+            'success': True,
+            'analysis': analysis,
+            'issues': issues,
+            'failed_parts': len(partial_results) - len(succeeded),
+            'raw_response': None,
+            'domains_analyzed': domains,
+            'image_report': None
+        }
+    
+    def _format_issues_analysis(self, issues: List[Dict], visual_evidence: str,
+                                recommendations: List[str]) -> str:
+        return self._format_fused_analysis({
+            'detected_issues': [
+                {**issue, 'description': f"{issue['issue']} - {issue['description']}"}
+                for issue in issues
+            ],
+            'visual_evidence': visual_evidence,
+            'recommendations': recommendations
+        })
+    
+    def _build_tiled_result(self, tile_results: List[Dict], domains: List[str]) -> Dict:
+        result = self._merge_partial_results(tile_results, domains)
+        if result['success']:
+            result['tiles'] = len(tile_results)
+            result['tile_reports'] = [tile.get('image_report') for tile in tile_results
+                                      if tile['success']]
+        return result
+    
+    def _tile_position(self, box: tuple, size) -> str:
+        center_x = (box[0] + box[2]) / 2 / size[0]
+        center_y = (box[1] + box[3]) / 2 / size[1]
+        vertical = 'top' if center_y < 1 / 3 else 'bottom' if center_y > 2 / 3 else 'middle'
+        horizontal = 'left' if center_x < 1 / 3 else 'right' if center_x > 2 / 3 else 'center'
+        return f"{vertical} {horizontal}"
+    
+    def _create_domain_examples(self, domains: List[str]) -> str:
         domain_examples = []
         for domain in domains:
             if domain in Config.DOMAIN_ISSUES:
                 issues = ', '.join(Config.DOMAIN_ISSUES[domain][:3])
                 domain_examples.append(f"- {domain}: {issues}, etc.")
         
-        examples_text = '\n'.join(domain_examples)
+        return '\n'.join(domain_examples)
+    
+    def _create_detection_prompt(self, domains: List[str]) -> str:
+        examples_text = self._create_domain_examples(domains)
         
         prompt = f"""You are an AI assistant specialized in identifying community issues in images.
 
@@ -87,18 +715,322 @@ Be specific and objective in your analysis."""
         
         return prompt
     
-    def detect_multiple_images(self, image_paths: List[str], 
-                              domains: Optional[List[str]] = None) -> List[Dict]:
-        results = []
-        for image_path in image_paths:
-            result = self.detect_issues(image_path, domains)
-            result['image_path'] = image_path
-            results.append(result)
+    def _create_partial_prompt(self, domains: List[str], view: str) -> str:
+        """Prompt for one tile or keyframe; view says what the image is part of"""
+        examples_text = self._create_domain_examples(domains)
+        
+        prompt = f"""You are an AI assistant specialized in identifying community issues in images.
+
+This image is {view}. Look for community problems in the following domains:
+{', '.join(domains)}
+
+For each domain, look for issues such as:
+{examples_text}
+
+Respond with a single JSON object:
+- "issues": every visible issue, each with "domain" (one of {', '.join(domains)}), a short
+  "issue" name, a one-sentence "description" and a "severity" of Low, Medium or High
+- "visual_evidence": what you see in this image that indicates these problems
+- "recommendations": brief suggestions for addressing the issues
+
+Return an empty "issues" list if this image shows no problems. Be specific and objective."""
+        
+        return prompt
+    
+    def _create_coarse_prompt(self, domains: List[str]) -> str:
+        examples_text = self._create_domain_examples(domains)
+        
+        return f"""You are an AI assistant specialized in identifying community issues in images.
+
+This is a reduced-resolution preview of a photo. Identify any visible community problems
+in the following domains:
+{', '.join(domains)}
+
+For each domain, look for issues such as:
+{examples_text}
+
+Respond in JSON with:
+- "issues": every visible issue, each with "domain" (one of {', '.join(domains)}), a short
+  "issue" name, a one-sentence "description" and a "severity" of Low, Medium or High
+- "visual_evidence": what you see in the image that indicates these problems
+- "recommendations": brief suggestions for addressing the issues
+- "confidence": High, Medium or Low. Use Low whenever small details you cannot make out at
+  this resolution could change the analysis
+
+Be specific and objective."""
+    
+    def _create_fused_prompt(self, domains: List[str]) -> str:
+        examples_text = self._create_domain_examples(domains)
+        
+        prompt = f"""You are an AI assistant specialized in identifying community issues in images
+and turning them into actionable learning missions.
+
+Analyze this image and identify any visible community problems in the following domains:
+{', '.join(domains)}
+
+For each domain, look for issues such as:
+{examples_text}
+
+Then classify the primary issue into exactly one of: {', '.join(Config.CATEGORIES)},
+and convert it into a formalized, project-oriented mission statement.
+
+Respond with a single JSON object with these fields:
+{{
+  "detected_issues": [{{"domain": "...", "description": "...", "severity": "Low|Medium|High"}}],
+  "visual_evidence": "What you see that indicates these problems",
+  "recommendations": ["Brief suggestions for addressing the issues"],
+  "primary_category": "One of {', '.join(Config.CATEGORIES)}",
+  "confidence": "High|Medium|Low",
+  "reasoning": "Why this category fits best",
+  "mission_statement": "A clear, inspiring statement (2-3 sentences)",
+  "problem_definition": "A precise definition of the issue (1-2 sentences)",
+  "goal": "The specific, measurable outcome we're working toward",
+  "expected_impact": "How this will benefit the community",
+  "action_steps": ["3-5 key steps to address this problem"]
+}}
+
+Be specific and objective in your analysis."""
+        
+        return prompt
+    
+    def detect_multiple_images(self, images: List[ImageSource], 
+                              domains: Optional[List[str]] = None,
+                              max_workers: Optional[int] = None,
+                              on_result: Optional[Callable[[int, Dict], None]] = None,
+                              packed: bool = False,
+                              byte_budget: Optional[int] = None) -> List[Dict]:
+        def detect_one(image):
+            result = self.detect_issues(image, domains)
+            result['image_path'] = describe_source(image)
+            return result
+        
+        def error_result(image, e):
+            return {
+                'success': False,
+                'error': str(e),
+                'image_path': describe_source(image),
+                'domains_analyzed': domains or Config.CATEGORIES
+            }
+        
+        if self.hash_index is None and not packed:
+            return run_concurrently(detect_one, images, max_workers=max_workers,
+                                    on_result=on_result, error_result=error_result)
+        
+        # Analyze one image per burst of near-identical shots and share its result
+        if self.hash_index is not None:
+            groups = self._group_images(images)
+        else:
+            groups = [[(index, 0)] for index in range(len(images))]
+        representatives = [images[group[0][0]] for group in groups]
+        results = [None] * len(images)
+        
+        def fan_out(group_index, result):
+            group = groups[group_index]
+            for index, distance in group:
+                item = result
+                if index != group[0][0]:
+                    item = self._as_duplicate(result, result.get('image_path'), distance)
+                    item['image_path'] = describe_source(images[index])
+                results[index] = item
+                if on_result is not None:
+                    on_result(index, item)
+        
+        if packed:
+            self._detect_packed(representatives, domains or Config.CATEGORIES,
+                                max_workers, fan_out, byte_budget)
+        else:
+            run_concurrently(detect_one, representatives, max_workers=max_workers,
+                             on_result=fan_out, error_result=error_result)
         return results
+    
+    def _detect_packed(self, images: List[ImageSource], domains: List[str],
+                       max_workers: Optional[int], on_result: Callable[[int, Dict], None],
+                       byte_budget: Optional[int]):
+        """Detect issues in many images with several images per request"""
+        def prepare(image):
+            image_hash, duplicate = self._find_duplicate(image, 'detect', domains)
+            if duplicate is not None:
+                return {'duplicate': duplicate}
+            part, report = self._prepare_image(image)
+            return {'hash': image_hash, 'part': part, 'report': report}
+        
+        # Preprocessing is CPU-bound but PIL releases the GIL, so prepare in parallel
+        prepared = run_concurrently(prepare, images, max_workers=max_workers)
+        
+        pending = []
+        for index, item in enumerate(prepared):
+            if 'duplicate' in item:
+                on_result(index, {**item['duplicate'], 'image_path': describe_source(images[index])})
+            elif 'part' in item:
+                pending.append(index)
+            else:
+                on_result(index, {
+                    'success': False,
+                    'error': item.get('error', 'Image could not be prepared'),
+                    'image_path': describe_source(images[index]),
+                    'domains_analyzed': domains
+                })
+        
+        packs = self._split_image_packs(
+            [(index, prepared[index]['part']) for index in pending],
+            byte_budget or Config.PACKED_IMAGE_BYTE_BUDGET
+        )
+        
+        def report_pack(pack_index, pack_results):
+            for index, result in pack_results:
+                if result['success']:
+                    self._remember(prepared[index]['hash'], 'detect', domains,
+                                   images[index], result)
+                on_result(index, result)
+        
+        run_concurrently(
+            lambda pack: self._detect_pack(pack, images, prepared, domains),
+            packs,
+            max_workers=max_workers,
+            on_result=report_pack,
+            error_result=lambda pack, e: [
+                (index, {
+                    'success': False,
+                    'error': str(e),
+                    'image_path': describe_source(images[index]),
+                    'domains_analyzed': domains
+                })
+                for index, _ in pack
+            ]
+        )
+    
+    def _split_image_packs(self, items: List[tuple], byte_budget: int) -> List[List[tuple]]:
+        """Greedily group (index, part) pairs under the per-request image count and byte budget"""
+        packs = []
+        current = []
+        current_bytes = 0
+        
+        for index, part in items:
+            size = self._part_bytes(part)
+            if current and (current_bytes + size > byte_budget
+                            or len(current) >= Config.PACKED_MAX_IMAGES):
+                packs.append(current)
+                current = []
+                current_bytes = 0
+            current.append((index, part))
+            current_bytes += size
+        
+        if current:
+            packs.append(current)
+        return packs
+    
+    def _part_bytes(self, part) -> int:
+        if isinstance(part, dict):
+            return len(part['data'])
+        # PIL images are encoded by the SDK; assume roughly 10:1 compression
+        return part.size[0] * part.size[1] * 3 // 10
+    
+    def _detect_pack(self, pack: List[tuple], images: List[ImageSource],
+                     prepared: List[Dict], domains: List[str]) -> List[tuple]:
+        """Analyze one pack, re-asking only for images missing from a partial parse"""
+        resolved = {}
+        pending = list(pack)
+        last_error = 'Image missing from packed response'
+        
+        for attempt in range(Config.PACKED_MAX_RETRIES + 1):
+            if not pending:
+                break
+            
+            try:
+                # Retries bypass the cache so a bad response is not replayed
+                response = self.client.generate(
+                    self._create_packed_contents(pending, domains),
+                    generation_config=json_generation_config(TileIssuesOutput.packed_schema()),
+                    use_cache=attempt == 0
+                )
+                parsed = TileIssuesOutput.from_packed_json(response.text)
+            except Exception as e:
+                last_error = str(e)
+                continue
+            
+            for index, _ in pending:
+                if index in parsed:
+                    resolved[index] = self._build_packed_item_result(
+                        parsed[index], images[index], prepared[index]['report'], domains
+                    )
+            pending = [(index, part) for index, part in pending if index not in resolved]
+        
+        for index, _ in pending:
+            resolved[index] = {
+                'success': False,
+                'error': last_error,
+                'image_path': describe_source(images[index]),
+                'domains_analyzed': domains
+            }
+        
+        return [(index, resolved[index]) for index, _ in pack]
+    
+    def _create_packed_contents(self, items: List[tuple], domains: List[str]) -> List:
+        """One shared prompt followed by each image behind its ID label"""
+        examples_text = self._create_domain_examples(domains)
+        
+        contents = [f"""You are an AI assistant specialized in identifying community issues in images.
+
+You will receive {len(items)} separate images, each preceded by its ID in brackets.
+Analyze EACH image on its own and identify any visible community problems in the
+following domains:
+{', '.join(domains)}
+
+For each domain, look for issues such as:
+{examples_text}
+
+Respond with a single JSON object with an "images" list containing exactly one entry
+per image:
+- "id": the image ID
+- "issues": every visible issue, each with "domain" (one of {', '.join(domains)}), a short
+  "issue" name, a one-sentence "description" and a "severity" of Low, Medium or High
+- "visual_evidence": what you see in that image that indicates these problems
+- "recommendations": brief suggestions for addressing the issues
+
+Use an empty "issues" list for images that show no problems. Be specific and objective."""]
+        
+        for index, part in items:
+            contents.append(f"Image [{index}]:")
+            contents.append(part)
+        return contents
+    
+    def _build_packed_item_result(self, output: TileIssuesOutput, image: ImageSource,
+                                  image_report: Optional[Dict], domains: List[str]) -> Dict:
+        issues = sorted(output.issues,
+                        key=lambda issue: SEVERITY_LEVELS.index(issue['severity']), reverse=True)
+        return {
+            'success': True,
+            'analysis': self._format_issues_analysis(
+                issues, output.visual_evidence, output.recommendations
+            ),
+            'issues': issues,
+            'raw_response': None,
+            'domains_analyzed': domains,
+            'image_report': image_report,
+            'image_path': describe_source(image),
+            'source': 'packed'
+        }
+    
+    def _group_images(self, images: List[ImageSource]) -> List[List]:
+        """Group near-identical images as lists of (index, distance to the group's first image)"""
+        hashes = []
+        for image in images:
+            try:
+                hashes.append(self.hash_index.hash_image(image))
+            except Exception:
+                # Undecodable images stay on their own and fail in detect_issues
+                hashes.append(None)
+        
+        groups = group_near_duplicates(hashes, self.hash_index.max_distance)
+        return [
+            [(index, hamming_distance(hashes[index], hashes[group[0]]) if index != group[0] else 0)
+             for index in group]
+            for group in groups
+        ]
 
 
 # Convenience function
-def detect_community_issue(image_path: str, 
+def detect_community_issue(image: ImageSource, 
                           domains: Optional[List[str]] = None) -> Dict:
     detector = CommunityIssueDetector()
-    return detector.detect_issues(image_path, domains)
+    return detector.detect_issues(image, domains)